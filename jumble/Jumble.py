@@ -17,17 +17,100 @@
 import importlib.util
 import sys
 import inspect
+import json
+import locale
 import logging
 import os
+import threading
 
 from .IPlugin import IPlugin
 
 logger = logging.getLogger("variety")
 
 
+def _qualified_name(cls):
+    return "%s.%s" % (cls.__module__, cls.__qualname__)
+
+
+class PluginEntry(dict):
+    """
+    A plugin hash as returned by Jumble.get_plugins: {"plugin": plugin, "class": plugin_class, "info": info}.
+    Entries restored from the manifest import their module and instantiate the plugin only when
+    "plugin" or "class" is first accessed.
+    """
+
+    def __init__(self, jumble, path, class_name, bases, info):
+        super(PluginEntry, self).__init__(info=info)
+        self.jumble = jumble
+        self.path = path
+        self.class_name = class_name
+        self.bases = set(bases)
+
+    def __getitem__(self, key):
+        if key in ("plugin", "class") and not self.is_loaded():
+            self.load()
+        return super(PluginEntry, self).__getitem__(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def is_loaded(self):
+        return dict.__contains__(self, "plugin")
+
+    def set_loaded(self, cls, plugin):
+        dict.__setitem__(self, "class", cls)
+        dict.__setitem__(self, "plugin", plugin)
+
+    def load(self):
+        with self.jumble.lock:
+            if self.is_loaded():
+                return
+            logger.info(
+                lambda: "Jumble lazily loading plugin %s from %s" % (self.class_name, self.path)
+            )
+            module = self.jumble.get_module(self.path)
+            cls = getattr(module, self.class_name)
+            self.set_loaded(cls, self.jumble.instantiate(cls, self.path))
+            for listener in self.jumble.load_listeners:
+                try:
+                    listener(self)
+                except Exception:
+                    logger.exception("Jumble: plugin load listener failed for %s" % self.class_name)
+
+    def is_subclass(self, clazz):
+        if self.is_loaded():
+            return issubclass(self["class"], clazz)
+        return _qualified_name(clazz) in self.bases
+
+    def is_active(self):
+        return self.is_loaded() and self["plugin"].is_active()
+
+
 class Jumble:
-    def __init__(self, folders):
+    MANIFEST_VERSION = 1
+
+    def __init__(self, folders, manifest_file=None):
+        """
+        :param folders: the plugin folders to load plugins from
+        :param manifest_file: optional; if given, the discovered plugin classes and their get_info() are cached
+        there, and on later loads plugin modules whose files did not change are imported only when needed
+        """
         self.folders = folders
+        self.manifest_file = manifest_file
+        self.modules = {}
+        self.lock = threading.RLock()
+        self.load_listeners = []
+
+    def add_load_listener(self, listener):
+        """
+        listener(entry) is called with the PluginEntry whenever a plugin restored from the manifest
+        is loaded on first use. It runs with the lock held, so registering a listener while holding
+        the lock and then going through the loaded plugins sees every plugin exactly once.
+        """
+        self.load_listeners.append(listener)
 
     def _walk_python_files(self):
         for folder in self.folders:
@@ -36,41 +119,72 @@ class Jumble:
                     if f.endswith(".py"):
                         yield location, f
 
-    def _walk_modules(self):
-        for location, f in self._walk_python_files():
-            path = os.path.join(location, f)
-            name = os.path.splitext(f)[0]
-            if (spec := importlib.util.spec_from_file_location(name, path)) is not None:
-                try:
-                    module = importlib.util.module_from_spec(spec)
-                    logger.info(lambda: "Jumble loading module in %s from %s" % (name, path))
-                    sys.modules[name] = module
-                    spec.loader.exec_module(module)
-                    yield module, path
-                except Exception:
-                    logger.exception("Could not load plugin module %s" % path)
-                    continue
+    def get_module(self, path):
+        with self.lock:
+            if path not in self.modules:
+                name = os.path.splitext(os.path.basename(path))[0]
+                spec = importlib.util.spec_from_file_location(name, path)
+                if spec is None:
+                    raise ImportError("Cannot load plugin module %s" % path)
+                module = importlib.util.module_from_spec(spec)
+                logger.info(lambda: "Jumble loading module in %s from %s" % (name, path))
+                sys.modules[name] = module
+                spec.loader.exec_module(module)
+                self.modules[path] = module
+            return self.modules[path]
 
-    def _walk_plugin_classes(self):
-        for module, path in self._walk_modules():
+    @staticmethod
+    def _plugin_classes(module):
+        def is_plugin(cls):
+            return (
+                inspect.isclass(cls)
+                and issubclass(cls, IPlugin)
+                and cls.__module__ == module.__name__
+            )
 
-            def is_plugin(cls):
-                return (
-                    inspect.isclass(cls)
-                    and issubclass(cls, IPlugin)
-                    and cls.__module__ == module.__name__
-                )
+        return [cls for name, cls in inspect.getmembers(module, is_plugin)]
 
-            for name, cls in inspect.getmembers(module, is_plugin):
-                yield cls, path
+    def instantiate(self, cls, path):
+        plugin = cls()
+        plugin.jumble = self
+        plugin.path = os.path.realpath(path)
+        plugin.folder = os.path.dirname(plugin.path)
+        return plugin
 
-    def load(self):
-        """
-        Loads all plugins from the plugin folders, without activating them
-        """
-        logger.info(lambda: "Jumble loading")
-        self.plugins = []
-        for cls, path in self._walk_plugin_classes():
+    def _read_manifest(self):
+        if not self.manifest_file:
+            return {}
+        try:
+            with open(self.manifest_file, encoding="utf8") as f:
+                manifest = json.load(f)
+            if manifest["signature"] == self._manifest_signature():
+                return manifest["files"]
+        except Exception:
+            logger.info(lambda: "Jumble: no usable plugin manifest, loading all plugins")
+        return {}
+
+    def _write_manifest(self, files):
+        try:
+            with open(self.manifest_file + ".partial", "w", encoding="utf8") as f:
+                json.dump({"signature": self._manifest_signature(), "files": files}, f)
+            os.rename(self.manifest_file + ".partial", self.manifest_file)
+        except Exception:
+            logger.exception("Jumble: could not write plugin manifest %s" % self.manifest_file)
+
+    def _manifest_signature(self):
+        # get_info() results may be translated, so the manifest is only valid for the same locale
+        return [Jumble.MANIFEST_VERSION, str(locale.getlocale(locale.LC_MESSAGES))]
+
+    def _load_file(self, path):
+        """Imports the module at path and instantiates its plugins, returns the manifest entries for them"""
+        try:
+            module = self.get_module(path)
+        except Exception:
+            logger.exception("Could not load plugin module %s" % path)
+            return None
+
+        classes = []
+        for cls in Jumble._plugin_classes(module):
             try:
                 info = cls.get_info()
             except Exception:
@@ -82,20 +196,53 @@ class Jumble:
                 continue
 
             try:
-                plugin = cls()
+                plugin = self.instantiate(cls, path)
                 logger.info(lambda: "Jumble found plugin class: %s: %s" % (str(cls), str(info)))
-
-                plugin.jumble = self
-                plugin.path = os.path.realpath(path)
-                plugin.folder = os.path.dirname(plugin.path)
-                self.plugins.append({"plugin": plugin, "class": cls, "info": info})
             except Exception:
                 logger.exception("Jumble: could not instantiate plugin class: %s" % str(cls))
                 continue
 
+            bases = [_qualified_name(c) for c in cls.__mro__]
+            entry = PluginEntry(self, path, cls.__name__, bases, info)
+            entry.set_loaded(cls, plugin)
+            self.plugins.append(entry)
+            classes.append({"name": cls.__name__, "bases": bases, "info": info})
+        return classes
+
+    def load(self):
+        """
+        Loads all plugins from the plugin folders, without activating them.
+        With a manifest, plugins from unchanged files are only registered, and loaded on first use.
+        """
+        logger.info(lambda: "Jumble loading")
+        self.plugins = []
+        manifest = self._read_manifest()
+        files = {}
+        for location, f in self._walk_python_files():
+            path = os.path.join(location, f)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+
+            known = manifest.get(path)
+            if known and known["mtime"] == stat.st_mtime and known["size"] == stat.st_size:
+                for c in known["classes"]:
+                    self.plugins.append(PluginEntry(self, path, c["name"], c["bases"], c["info"]))
+                files[path] = known
+                continue
+
+            classes = self._load_file(path)
+            if classes is not None:
+                files[path] = {"mtime": stat.st_mtime, "size": stat.st_size, "classes": classes}
+
+        if self.manifest_file and files != manifest:
+            self._write_manifest(files)
+
     def get_plugins(self, clazz=None, typename=None, name=None, active=None):
         """
         Searches for plugins that match the given criteria. If no criteria are given, all loaded plugins are returned.
+        Plugins that have not been loaded yet are inactive, and searching does not load them.
 
         :param clazz: parent plugin class; optional
         :param typename: plugin type name; optional
@@ -108,10 +255,10 @@ class Jumble:
             [
                 p
                 for p in self.plugins
-                if (not clazz or issubclass(p["class"], clazz))
-                and (not typename or p["class"].__name__ == typename)
+                if (not clazz or p.is_subclass(clazz))
+                and (not typename or p.class_name == typename)
                 and (not name or p["info"]["name"] == name)
-                and (active is None or p["plugin"].is_active() == active)
+                and (active is None or p.is_active() == active)
             ],
             key=lambda p: p["info"]["name"],
         )
@@ -0,0 +1,83 @@
+#!/usr/bin/python3
+# -*- Mode: Python; coding: utf-8; indent-tabs-mode: nil; tab-width: 4 -*-
+### BEGIN LICENSE
+# Copyright (c) 2012, Peter Levi <peterlevi@peterlevi.com>
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 3, as published
+# by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranties of
+# MERCHANTABILITY, SATISFACTORY QUALITY, or FITNESS FOR A PARTICULAR
+# PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+### END LICENSE
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from variety.AlbumIndex import AlbumIndex
+
+
+class TestAlbumIndex(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.folder, "sub"))
+        for i, name in enumerate(["c.jpg", "a.jpg", "sub/b.jpg", "notes.txt"]):
+            path = os.path.join(self.folder, name)
+            with open(path, "w"):
+                pass
+            os.utime(path, (1000 + i, 1000 + i))
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_by_filename(self):
+        album = AlbumIndex(self.folder, AlbumIndex.BY_FILENAME)
+        self.assertEqual(
+            ["a.jpg", "c.jpg", "sub/b.jpg"],
+            [os.path.relpath(f, self.folder) for f in album.get_images()],
+        )
+        self.assertEqual(os.path.join(self.folder, "a.jpg"), album.first())
+        self.assertEqual(
+            os.path.join(self.folder, "c.jpg"),
+            album.next_after(os.path.join(self.folder, "a.jpg")),
+        )
+        self.assertIsNone(album.next_after(os.path.join(self.folder, "sub", "b.jpg")))
+        self.assertIsNone(album.next_after("/not/in/album.jpg"))
+
+    def test_by_date(self):
+        album = AlbumIndex(self.folder, AlbumIndex.BY_DATE)
+        self.assertEqual(
+            ["c.jpg", "a.jpg", "sub/b.jpg"],
+            [os.path.relpath(f, self.folder) for f in album.get_images()],
+        )
+
+    def test_rebuilt_on_folder_change(self):
+        album = AlbumIndex(self.folder, AlbumIndex.BY_FILENAME)
+        self.assertEqual(3, len(album.get_images()))
+        sub = os.path.join(self.folder, "sub")
+        with open(os.path.join(sub, "d.jpg"), "w"):
+            pass
+        os.utime(sub, (2000, 2000))
+        album.validated_at = 0
+        self.assertEqual(4, len(album.get_images()))
+
+    def test_contains_path(self):
+        album = AlbumIndex(self.folder, AlbumIndex.BY_FILENAME)
+        self.assertTrue(album.contains_path(os.path.join(self.folder, "sub", "b.jpg")))
+        self.assertFalse(album.contains_path(self.folder + "2/a.jpg"))
+
+    def test_shared_per_path(self):
+        album = AlbumIndex.get(self.folder, AlbumIndex.BY_DATE)
+        self.assertIs(album, AlbumIndex.get(self.folder + "/", AlbumIndex.BY_DATE))
+        self.assertIsNot(album, AlbumIndex.get(self.folder, AlbumIndex.BY_FILENAME))
+        AlbumIndex.retain_only([])
+
+
+if __name__ == "__main__":
+    unittest.main()
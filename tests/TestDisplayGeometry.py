@@ -0,0 +1,65 @@
+#!/usr/bin/python3
+# -*- Mode: Python; coding: utf-8; indent-tabs-mode: nil; tab-width: 4 -*-
+### BEGIN LICENSE
+# Copyright (c) 2012, Peter Levi <peterlevi@peterlevi.com>
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 3, as published
+# by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranties of
+# MERCHANTABILITY, SATISFACTORY QUALITY, or FITNESS FOR A PARTICULAR
+# PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+### END LICENSE
+
+import unittest
+from unittest.mock import patch
+
+from variety.DisplayGeometry import DisplayGeometry, Layout, Monitor
+
+SINGLE = Layout((Monitor(0, 0, 1920, 1080, 2, True),), 1920, 1080)
+DUAL = Layout(
+    (Monitor(0, 0, 1280, 1024, 1, False), Monitor(1280, 0, 1920, 1080, 1, True)), 3200, 1080
+)
+
+
+class TestDisplayGeometry(unittest.TestCase):
+    def watching(self, layout):
+        geometry = DisplayGeometry()
+        geometry.layout = layout
+        geometry.watching = True
+        return geometry
+
+    def test_sizes(self):
+        geometry = self.watching(SINGLE)
+        self.assertEqual((3840, 2160), geometry.get_primary_size())
+        self.assertEqual((1920, 1080), geometry.get_primary_size(hidpi_scaled=False))
+
+        geometry = self.watching(DUAL)
+        self.assertEqual((1920, 1080), geometry.get_primary_size())
+        self.assertEqual((3200, 1080), geometry.get_total_size())
+
+    def test_no_primary(self):
+        self.assertEqual(DUAL.monitors[0], Layout(DUAL.monitors[:1], 1280, 1024).get_primary())
+        geometry = self.watching(Layout((), 1024, 768))
+        self.assertEqual((1024, 768), geometry.get_primary_size())
+
+    def test_listeners_only_called_on_change(self):
+        geometry = self.watching(SINGLE)
+        changes = []
+        geometry.add_listener(changes.append)
+        with patch.object(DisplayGeometry, "read_layout", return_value=SINGLE):
+            geometry._on_changed()
+        self.assertEqual([], changes)
+        with patch.object(DisplayGeometry, "read_layout", return_value=DUAL):
+            geometry._on_changed()
+            geometry._on_changed()
+        self.assertEqual([DUAL], changes)
+        self.assertEqual((3200, 1080), geometry.get_total_size())
+
+
+if __name__ == "__main__":
+    unittest.main()
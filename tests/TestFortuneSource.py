@@ -0,0 +1,160 @@
+#!/usr/bin/python3
+# -*- Mode: Python; coding: utf-8; indent-tabs-mode: nil; tab-width: 4 -*-
+### BEGIN LICENSE
+# Copyright (c) 2012, Peter Levi <peterlevi@peterlevi.com>
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 3, as published
+# by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranties of
+# MERCHANTABILITY, SATISFACTORY QUALITY, or FITNESS FOR A PARTICULAR
+# PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+### END LICENSE
+
+import codecs
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+
+from variety.plugins.builtin.quotes.FortuneSource import (
+    STR_ROTATED,
+    STRFILE_HEADER,
+    FortuneSource,
+)
+
+
+def write_strfile(folder, name, fortunes, delim="%", rotated=False, order=None, flags=0):
+    """
+    Writes a fortune file and the .dat index strfile(8) would generate for it.
+    :param order: the order of the entries in the offset table, like strfile -r or -o produce
+    """
+    text = b""
+    offsets = []
+    for fortune in fortunes:
+        offsets.append(len(text))
+        if rotated:
+            fortune = codecs.encode(fortune, "rot13")
+        text += ("%s\n%s\n" % (fortune, delim)).encode("utf-8")
+    lengths = [end - start for start, end in zip(offsets, offsets[1:] + [len(text)])] or [0]
+    if order:
+        offsets = [offsets[i] for i in order]
+    offsets.append(len(text))
+
+    header = STRFILE_HEADER.pack(
+        2,
+        len(fortunes),
+        max(lengths),
+        min(lengths),
+        flags | (STR_ROTATED if rotated else 0),
+        delim.encode("latin-1") + b"\0\0\0",
+    )
+    path = os.path.join(folder, name)
+    with open(path, "wb") as f:
+        f.write(text)
+    with open(path + ".dat", "wb") as f:
+        f.write(header + struct.pack(">%dI" % len(offsets), *offsets))
+    return path
+
+
+class TestFortuneSource(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.folder = os.path.join(self.tmp, "fortunes")
+        os.makedirs(self.folder)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_find_databases(self):
+        write_strfile(self.folder, "b", ["Second"])
+        write_strfile(self.folder, "a", ["One", "Two"], delim="#", rotated=True)
+        write_strfile(self.folder, "empty", [])
+        # an index without its text file, a text file without an index, and a broken index
+        os.unlink(write_strfile(self.folder, "orphan", ["Orphan"]))
+        with open(os.path.join(self.folder, "unindexed"), "w") as f:
+            f.write("Unindexed\n%\n")
+        with open(os.path.join(self.folder, "broken.dat"), "wb") as f:
+            f.write(b"\0\0")
+        with open(os.path.join(self.folder, "broken"), "w") as f:
+            f.write("Broken\n%\n")
+
+        databases = FortuneSource.find_databases([os.path.join(self.tmp, "missing"), self.folder])
+        self.assertEqual(
+            [
+                {
+                    "dat": os.path.join(self.folder, "a.dat"),
+                    "text": os.path.join(self.folder, "a"),
+                    "count": 2,
+                    "rotated": True,
+                    "delim": "#",
+                },
+                {
+                    "dat": os.path.join(self.folder, "b.dat"),
+                    "text": os.path.join(self.folder, "b"),
+                    "count": 1,
+                    "rotated": False,
+                    "delim": "%",
+                },
+            ],
+            databases,
+        )
+
+    def test_find_databases_first_folder_wins(self):
+        other = os.path.join(self.tmp, "other")
+        os.makedirs(other)
+        write_strfile(other, "other", ["Other"])
+        self.assertEqual([], FortuneSource.find_databases([self.folder]))
+        self.assertEqual(1, len(FortuneSource.find_databases([self.folder, other])))
+
+        write_strfile(self.folder, "first", ["First"])
+        databases = FortuneSource.find_databases([self.folder, other])
+        self.assertEqual([os.path.join(self.folder, "first")], [db["text"] for db in databases])
+
+    def test_read_fortune(self):
+        fortunes = ["One line", "Several\n  lines\n\n-- Author", "Last ünicode"]
+        write_strfile(self.folder, "plain", fortunes)
+        db = FortuneSource.find_databases([self.folder])[0]
+        self.assertEqual(fortunes, [FortuneSource.read_fortune(db, i) for i in range(3)])
+
+    def test_read_fortune_rotated(self):
+        fortunes = ["Hello, World!", "Vg jbexf -- ROT13"]
+        write_strfile(self.folder, "rotated", fortunes, delim="#", rotated=True)
+        db = FortuneSource.find_databases([self.folder])[0]
+        self.assertEqual(fortunes, [FortuneSource.read_fortune(db, i) for i in range(2)])
+
+    def test_read_fortune_out_of_order(self):
+        fortunes = ["Zebra\n-- Z", "Apple", "Mango\n\n-- M", "Banana"]
+        # shuffled like strfile -r does (STR_RANDOM), then sorted like strfile -o (STR_ORDERED)
+        for order, flags in (([2, 0, 3, 1], 0x1), ([1, 3, 2, 0], 0x2)):
+            write_strfile(self.folder, "fruits", fortunes, order=order, flags=flags)
+            db = FortuneSource.find_databases([self.folder])[0]
+            self.assertEqual(
+                [fortunes[i] for i in order],
+                [FortuneSource.read_fortune(db, i) for i in range(len(fortunes))],
+            )
+
+    def test_to_quote(self):
+        q = FortuneSource.to_quote("\x1b[1mBold\x1b[0m statement\n\t-- Somebody\n")
+        self.assertEqual("Bold statement", q["quote"])
+        self.assertEqual("Somebody", q["author"])
+        self.assertIsNone(FortuneSource.to_quote("No author")["author"])
+
+    def test_get_random(self):
+        write_strfile(self.folder, "a", ["Alpha -- A", "Beta -- B"])
+        write_strfile(self.folder, "b", ["Gamma -- C"], rotated=True)
+        source = FortuneSource()
+        source.databases = FortuneSource.find_databases([self.folder])
+        quotes = source.get_random()
+        self.assertEqual(FortuneSource.BATCH_SIZE, len(quotes))
+        self.assertTrue(set(q["quote"] for q in quotes) <= {"Alpha", "Beta", "Gamma"})
+        self.assertTrue(set(q["author"] for q in quotes) <= {"A", "B", "C"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+#!/usr/bin/python3
+# -*- Mode: Python; coding: utf-8; indent-tabs-mode: nil; tab-width: 4 -*-
+### BEGIN LICENSE
+# Copyright (c) 2012, Peter Levi <peterlevi@peterlevi.com>
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 3, as published
+# by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranties of
+# MERCHANTABILITY, SATISFACTORY QUALITY, or FITNESS FOR A PARTICULAR
+# PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+### END LICENSE
+
+import os
+import unittest
+
+from variety.ImageLoader import ImageLoader
+
+
+class TestImageLoader(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # Chdir to the tests directory so that we can find our test images
+        curdir = os.path.dirname(os.path.abspath(__file__))
+        if curdir:
+            os.chdir(curdir)
+
+    def test_get_size(self):
+        self.assertEqual((32, 32), ImageLoader.get_size("test.jpg"))
+        self.assertRaises(Exception, lambda: ImageLoader.get_size("fake_image.jpg"))
+
+    def test_open_reduced(self):
+        img = ImageLoader.open_reduced("test.jpg", (8, 8))
+        self.assertGreaterEqual(img.size[0], 8)
+        self.assertGreaterEqual(img.size[1], 8)
+        self.assertLessEqual(img.size[0], 32)
+
+    def test_open_at_size(self):
+        img = ImageLoader.open_at_size("test.jpg", (8, 12))
+        self.assertEqual((8, 12), img.size)
+        self.assertEqual((32, 32), ImageLoader.open_at_size("test.jpg", (32, 32)).size)
+
+    def test_load_thumbnail_pixbuf(self):
+        pixbuf = ImageLoader.load_thumbnail_pixbuf("test.jpg", 16, 16)
+        self.assertEqual((16, 16), (pixbuf.get_width(), pixbuf.get_height()))
+
+    def test_count_gif_frames(self):
+        self.assertEqual(1, ImageLoader.count_gif_frames("not-animated.gif"))
+        self.assertEqual(2, ImageLoader.count_gif_frames("animated.gif", stop_at=2))
+        self.assertRaises(ValueError, lambda: ImageLoader.count_gif_frames("test.jpg"))
+
+    def test_is_animated_gif(self):
+        self.assertFalse(ImageLoader.is_animated_gif("test.jpg"))
+        self.assertTrue(ImageLoader.is_animated_gif("animated.gif"))
+        self.assertFalse(ImageLoader.is_animated_gif("not-animated.gif"))
+
+
+if __name__ == "__main__":
+    unittest.main()
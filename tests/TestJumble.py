@@ -15,9 +15,14 @@
 # with this program.  If not, see <http://www.gnu.org/licenses/>.
 ### END LICENSE
 
+import locale
 import os.path
+import shutil
 import sys
+import tempfile
+import time
 import unittest
+from unittest import mock
 
 from jumble.IPlugin import IPlugin
 from jumble.Jumble import Jumble
@@ -34,10 +39,102 @@ class P2(IQuoteSource):
     pass
 
 
+PLUGIN_SOURCE = """
+from jumble.IPlugin import IPlugin
+
+
+class ManifestPlugin(IPlugin):
+    @classmethod
+    def get_info(cls):
+        return {"name": "Manifest plugin", "description": "%s", "version": "1.0"}
+"""
+
+
 class TestJumble(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.plugin_file = os.path.join(self.folder, "jumble_manifest_plugin.py")
+        self.manifest_file = os.path.join(self.folder, "manifest.json")
+        self.write_plugin("first")
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def write_plugin(self, description, mtime=None):
+        with open(self.plugin_file, "w") as f:
+            f.write(PLUGIN_SOURCE % description)
+        mtime = mtime or time.time()
+        os.utime(self.plugin_file, (mtime, mtime))
+
+    def load_with_manifest(self):
+        jumble = Jumble([self.folder], manifest_file=self.manifest_file)
+        jumble.load()
+        self.assertEqual(1, len(jumble.plugins))
+        return jumble, jumble.plugins[0]
+
     def test_load(self):
         p = Jumble(["variety/plugins/builtin"])
         p.load()
         self.assertEqual(18, len(p.get_plugins()))
         self.assertEqual(18, len(p.get_plugins(IPlugin)))
         self.assertEqual(1, len(p.get_plugins(name="Goodreads")))
+
+    def test_manifest_lazy_load(self):
+        _, entry = self.load_with_manifest()
+        self.assertTrue(entry.is_loaded())
+        self.assertTrue(os.path.exists(self.manifest_file))
+
+        jumble, entry = self.load_with_manifest()
+        self.assertFalse(entry.is_loaded())
+        self.assertEqual("first", entry["info"]["description"])
+        self.assertTrue(entry.is_subclass(IPlugin))
+        self.assertFalse(entry.is_subclass(IQuoteSource))
+        self.assertEqual([entry], jumble.get_plugins(active=False))
+        self.assertFalse(entry.is_loaded())
+
+        loaded = []
+        jumble.add_load_listener(loaded.append)
+        plugin = entry["plugin"]
+        self.assertTrue(entry.is_loaded())
+        self.assertEqual("ManifestPlugin", type(plugin).__name__)
+        self.assertEqual(os.path.realpath(self.folder), plugin.folder)
+        self.assertIs(jumble, plugin.jumble)
+        self.assertEqual([entry], loaded)
+
+        entry["plugin"]
+        self.assertEqual([entry], loaded)
+
+    def test_manifest_stale_file(self):
+        mtime = time.time() - 100
+        self.write_plugin("first", mtime)
+        self.load_with_manifest()
+
+        # same size, different modification time
+        self.write_plugin("other", mtime + 10)
+        _, entry = self.load_with_manifest()
+        self.assertTrue(entry.is_loaded())
+        self.assertEqual("other", entry["info"]["description"])
+
+        # same modification time, different size
+        self.write_plugin("changed", mtime + 10)
+        _, entry = self.load_with_manifest()
+        self.assertTrue(entry.is_loaded())
+        self.assertEqual("changed", entry["info"]["description"])
+
+        _, entry = self.load_with_manifest()
+        self.assertFalse(entry.is_loaded())
+
+    def test_manifest_locale_change(self):
+        self.load_with_manifest()
+        _, entry = self.load_with_manifest()
+        self.assertFalse(entry.is_loaded())
+
+        # get_info() may be translated, so a manifest written in another locale is not used
+        with mock.patch.object(locale, "getlocale", return_value=("xx_XX", "UTF-8")):
+            _, entry = self.load_with_manifest()
+            self.assertTrue(entry.is_loaded())
+            _, entry = self.load_with_manifest()
+            self.assertFalse(entry.is_loaded())
+
+        _, entry = self.load_with_manifest()
+        self.assertTrue(entry.is_loaded())
@@ -0,0 +1,156 @@
+#!/usr/bin/python3
+# -*- Mode: Python; coding: utf-8; indent-tabs-mode: nil; tab-width: 4 -*-
+### BEGIN LICENSE
+# Copyright (c) 2012, Peter Levi <peterlevi@peterlevi.com>
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 3, as published
+# by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranties of
+# MERCHANTABILITY, SATISFACTORY QUALITY, or FITNESS FOR A PARTICULAR
+# PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+### END LICENSE
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from variety.plugins.builtin.quotes.LocalFilesSource import (
+    LocalFilesSource,
+    QuoteCorpus,
+    QuoteIndex,
+)
+
+
+class TestLocalFilesSource(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.index = QuoteIndex()
+        self.index.add(0, "Love is all you need")
+        self.index.add(1, "A lovely day, all day long")
+        self.index.add(2, "Need for speed")
+        self.index.add(3, None)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_search_exact(self):
+        self.assertEqual([0], self.index.search("love"))
+        self.assertEqual([0, 1], self.index.search("ALL"))
+        self.assertEqual([], self.index.search("lov"))
+        self.assertEqual([], self.index.search("missing"))
+
+    def test_search_prefix(self):
+        self.assertEqual([0, 1], self.index.search("love", prefix=True))
+        self.assertEqual([0, 1], self.index.search("lov", prefix=True))
+        self.assertEqual([1], self.index.search("lovel", prefix=True))
+        self.assertEqual([], self.index.search("lovers", prefix=True))
+
+        # tokens added after a prefix search are found too
+        self.index.add(4, "Lovecraft")
+        self.assertEqual([0, 1, 4], self.index.search("lov", prefix=True))
+
+    def test_search_all_words(self):
+        self.assertEqual([0], self.index.search("need love"))
+        self.assertEqual([0, 2], self.index.search("need"))
+        self.assertEqual([1], self.index.search("day, all!"))
+        self.assertEqual([], self.index.search("love speed"))
+        self.assertEqual([0], self.index.search("lov nee", prefix=True))
+
+    def test_search_empty_query(self):
+        self.assertEqual([], self.index.search(""))
+        self.assertEqual([], self.index.search(None))
+        self.assertEqual([], self.index.search(" ... ", prefix=True))
+        self.assertEqual([], QuoteIndex().search("love"))
+
+    def test_corpus_round_trip(self):
+        path = os.path.join(self.tmp, "corpus.bin")
+        quotes = [
+            {"quote": "Love is all you need", "author": "The Beatles", "sourceName": "a.txt"},
+            {"quote": "Anonymous \u201cquote\u201d", "author": None, "sourceName": "b.txt"},
+            {"quote": "No source", "author": "Someone", "sourceName": None},
+        ]
+        self.assertEqual(3, QuoteCorpus.write(path, iter(quotes)))
+        corpus = QuoteCorpus(path)
+        try:
+            self.assertEqual(3, len(corpus))
+            self.assertEqual(quotes[:2], [corpus[0], corpus[1]])
+            self.assertEqual("", corpus[2]["sourceName"])
+            self.assertRaises(IndexError, lambda: corpus[3])
+            self.assertRaises(IndexError, lambda: corpus[-1])
+        finally:
+            corpus.close()
+
+    def test_empty_corpus(self):
+        path = os.path.join(self.tmp, "corpus.bin")
+        self.assertEqual(0, QuoteCorpus.write(path, []))
+        corpus = QuoteCorpus(path)
+        try:
+            self.assertEqual(0, len(corpus))
+            self.assertFalse(corpus)
+            self.assertRaises(IndexError, lambda: corpus[0])
+        finally:
+            corpus.close()
+
+    def test_corpus_per_folder(self):
+        source = LocalFilesSource()
+        source.config_folder = os.path.join(self.tmp, "config")
+        source.folder = os.path.join(self.tmp, "defaults")
+        os.makedirs(source.config_folder)
+        os.makedirs(source.folder)
+        # a pluginconfig file without any usable quotes, so the defaults are used
+        with open(os.path.join(source.config_folder, "empty.txt"), "w") as f:
+            f.write("hi\n")
+        with open(os.path.join(source.folder, "quotes.txt"), "w") as f:
+            f.write("Love is all you need -- The Beatles\n.\nNeed for speed\n")
+        # the single corpus and index of older versions
+        legacy = [
+            os.path.join(source.config_folder, LocalFilesSource.CORPUS_FILE),
+            os.path.join(source.config_folder, LocalFilesSource.INDEX_FILE),
+        ]
+        for path in legacy:
+            with open(path, "w") as f:
+                f.write("old")
+
+        source.load_quotes()
+        self.assertEqual(2, len(source.quotes))
+        self.assertEqual([source.quotes[0]], source.get_for_author("beatles"))
+        self.assertFalse(any(os.path.exists(path) for path in legacy))
+        source.deactivate()
+
+        corpora = []
+        original_init = QuoteCorpus.__init__
+
+        def init(corpus, path):
+            original_init(corpus, path)
+            corpora.append(corpus)
+
+        with mock.patch.object(LocalFilesSource, "build_corpus") as build_corpus, mock.patch.object(
+            QuoteCorpus, "__init__", init
+        ):
+            source.load_quotes()
+            build_corpus.assert_not_called()
+        self.assertEqual(2, len(source.quotes))
+        self.assertEqual("The Beatles", source.quotes[0]["author"])
+        self.assertEqual([source.quotes[1]], source.get_for_keyword("speed"))
+
+        # the empty pluginconfig corpus was replaced by the defaults, and closed
+        self.assertEqual(2, len(corpora))
+        self.assertTrue(corpora[0].mm.closed)
+        self.assertIs(corpora[1], source.quotes)
+
+        # readers that still hold the corpus can use it after deactivation
+        quotes = source.quotes
+        source.deactivate()
+        self.assertEqual([], source.quotes)
+        self.assertEqual("Need for speed", quotes[1]["quote"].strip())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+#!/usr/bin/python3
+# -*- Mode: Python; coding: utf-8; indent-tabs-mode: nil; tab-width: 4 -*-
+### BEGIN LICENSE
+# Copyright (c) 2012, Peter Levi <peterlevi@peterlevi.com>
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 3, as published
+# by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranties of
+# MERCHANTABILITY, SATISFACTORY QUALITY, or FITNESS FOR A PARTICULAR
+# PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+### END LICENSE
+
+import json
+import unittest
+
+from variety.Metrics import Histogram, Metrics
+
+
+class TestMetrics(unittest.TestCase):
+    def test_counters_and_hit_rates(self):
+        metrics = Metrics()
+        metrics.inc("downloads", label="wallhaven")
+        metrics.inc("downloads", 2, label="wallhaven")
+        metrics.cache_access("cache", True)
+        metrics.cache_access("cache", True)
+        metrics.cache_access("cache", False)
+        snapshot = metrics.snapshot()
+        self.assertEqual(3, snapshot["counters"]["downloads[wallhaven]"])
+        self.assertEqual(0.667, snapshot["cache_hit_rates"]["cache"])
+
+    def test_gauges(self):
+        metrics = Metrics()
+        metrics.register_gauge("prepared", lambda: 3)
+        metrics.register_gauge("broken", lambda: 1 / 0)
+        gauges = metrics.snapshot()["gauges"]
+        self.assertEqual({"prepared": 3}, gauges)
+
+    def test_histogram(self):
+        histogram = Histogram()
+        for ms in [1, 3, 3, 40, 700]:
+            histogram.observe(ms)
+        result = histogram.to_dict()
+        self.assertEqual(5, result["count"])
+        self.assertEqual(5, result["p50_ms"])
+        self.assertEqual(1000, result["p95_ms"])
+        self.assertEqual(700, result["max_ms"])
+
+    def test_json_format(self):
+        metrics = Metrics()
+        metrics.observe("find_images", 0.02)
+        parsed = json.loads(metrics.format(as_json=True))
+        self.assertEqual(1, parsed["latencies"]["find_images"]["count"])
+
+
+if __name__ == "__main__":
+    unittest.main()
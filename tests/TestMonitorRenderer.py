@@ -0,0 +1,79 @@
+#!/usr/bin/python3
+# -*- Mode: Python; coding: utf-8; indent-tabs-mode: nil; tab-width: 4 -*-
+### BEGIN LICENSE
+# Copyright (c) 2012, Peter Levi <peterlevi@peterlevi.com>
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 3, as published
+# by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranties of
+# MERCHANTABILITY, SATISFACTORY QUALITY, or FITNESS FOR A PARTICULAR
+# PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+### END LICENSE
+
+import unittest
+from unittest import mock
+
+from variety.DisplayGeometry import Layout, Monitor
+from variety.MonitorRenderer import get_outputs, render_per_monitor
+
+
+class TestMonitorRenderer(unittest.TestCase):
+    def test_get_outputs(self):
+        layout = Layout(
+            (Monitor(1920, 0, 1920, 1080, 1, True), Monitor(0, 0, 1080, 1920, 1, False)),
+            3840,
+            1920,
+        )
+        self.assertEqual(
+            (3840, 1920, [(1920, 0, 1920, 1080), (0, 0, 1080, 1920)]), get_outputs(layout)
+        )
+
+    def test_get_outputs_scaled(self):
+        layout = Layout((Monitor(0, 0, 1920, 1080, 2, True),), 1920, 1080)
+        self.assertEqual((3840, 2160, [(0, 0, 3840, 2160)]), get_outputs(layout))
+
+    def render(self, layout):
+        with mock.patch("variety.MonitorRenderer.subprocess.Popen") as popen:
+            popen.return_value.wait.return_value = 0
+            result = render_per_monitor(
+                "image.jpg", layout, "out.jpg", lambda w, h: "-scale %dx%d^" % (w, h), "-quality 90"
+            )
+        self.assertTrue(result)
+        return [call[0][0] for call in popen.call_args_list]
+
+    def test_render_per_monitor_single(self):
+        cmds = self.render(Layout((Monitor(0, 0, 1920, 1080, 1, True),), 1920, 1080))
+        self.assertEqual(1, len(cmds))
+        self.assertEqual(["convert", "image.jpg", "-scale", "1920x1080^"], cmds[0][:4])
+        self.assertEqual(["-quality", "90", "out.jpg"], cmds[0][-3:])
+
+    def test_render_per_monitor_stitched(self):
+        layout = Layout(
+            (
+                Monitor(0, 0, 1920, 1080, 1, True),
+                Monitor(1920, 0, 1920, 1080, 1, False),
+                Monitor(3840, 0, 1080, 1920, 1, False),
+            ),
+            4920,
+            1920,
+        )
+        cmds = self.render(layout)
+        # one render per distinct monitor size, then the stitching
+        self.assertEqual(3, len(cmds))
+        parts = sorted(cmd[-1] for cmd in cmds[:2])
+        self.assertTrue(parts[0].endswith("1080x1920.miff"))
+        self.assertTrue(parts[1].endswith("1920x1080.miff"))
+        stitch = cmds[2]
+        self.assertEqual(["convert", "-size", "4920x1920", "xc:black"], stitch[:4])
+        self.assertEqual(3, stitch.count("-composite"))
+        self.assertIn("+3840+0", stitch)
+        self.assertEqual(["-quality", "90", "out.jpg"], stitch[-3:])
+
+
+if __name__ == "__main__":
+    unittest.main()
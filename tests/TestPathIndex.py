@@ -0,0 +1,54 @@
+#!/usr/bin/python3
+# -*- Mode: Python; coding: utf-8; indent-tabs-mode: nil; tab-width: 4 -*-
+### BEGIN LICENSE
+# Copyright (c) 2012, Peter Levi <peterlevi@peterlevi.com>
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 3, as published
+# by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranties of
+# MERCHANTABILITY, SATISFACTORY QUALITY, or FITNESS FOR A PARTICULAR
+# PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+### END LICENSE
+
+import unittest
+
+from variety.PathIndex import PathIndex
+
+
+class TestPathIndex(unittest.TestCase):
+    def test_lookup(self):
+        index = PathIndex()
+        index.add("/home/user/Pictures", "pictures", 1)
+        index.add("/home/user/Pictures/wallpaper.jpg", "image", 0, exact=True)
+        index.add("/home/user/Pictures/Downloaded/", "downloaded", 2)
+        index.add("/home/user/Pictures/Downloaded/Flickr", "flickr", 0)
+
+        self.assertEqual("image", index.lookup("/home/user/Pictures/wallpaper.jpg"))
+        self.assertEqual("pictures", index.lookup("/home/user/Pictures/other.jpg"))
+        self.assertEqual("pictures", index.lookup("/home/user/Pictures/Downloaded/a.jpg"))
+        self.assertEqual("flickr", index.lookup("/home/user/Pictures/Downloaded/Flickr/a.jpg"))
+        self.assertEqual("pictures", index.lookup("/home/user/Pictures/./x/../b.jpg"))
+        self.assertIsNone(index.lookup("/home/user/Pictures"))
+        self.assertIsNone(index.lookup("/home/user/Pictures2/a.jpg"))
+
+    def test_first_added_wins_on_equal_priority(self):
+        index = PathIndex()
+        index.add("/a", "first", 0)
+        index.add("/a", "second", 0)
+        self.assertEqual("first", index.lookup("/a/b.jpg"))
+
+    def test_root_and_folders(self):
+        index = PathIndex()
+        index.add("/", "others", 5)
+        self.assertEqual("others", index.lookup("/any/file.jpg"))
+        self.assertTrue(PathIndex.of_folders(["/a", "/b/c"]).lookup("/b/c/d.jpg"))
+        self.assertIsNone(PathIndex.of_folders(["/a", "/b/c"]).lookup("/b/d.jpg"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,230 @@
+#!/usr/bin/python3
+# -*- Mode: Python; coding: utf-8; indent-tabs-mode: nil; tab-width: 4 -*-
+### BEGIN LICENSE
+# Copyright (c) 2012, Peter Levi <peterlevi@peterlevi.com>
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 3, as published
+# by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranties of
+# MERCHANTABILITY, SATISFACTORY QUALITY, or FITNESS FOR A PARTICULAR
+# PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+### END LICENSE
+
+import json
+import shutil
+import tempfile
+import threading
+import time
+import types
+import unittest
+
+from variety.QuotesEngine import QuotesEngine
+
+
+def quote(text, author=None):
+    return {"quote": text, "author": author, "sourceName": "Test", "link": None}
+
+
+class Source:
+    """A quote plugin that answers get_random with the given quotes, once release is set"""
+
+    def __init__(self, quotes, blocking=False):
+        self.quotes = quotes
+        self.calls = 0
+        self.release = threading.Event()
+        if not blocking:
+            self.release.set()
+
+    def needs_internet(self):
+        return False
+
+    def supports_search(self):
+        return False
+
+    def get_random(self):
+        self.calls += 1
+        self.release.wait(10)
+        return [quote(q) for q in self.quotes]
+
+
+class TestQuotesEngine(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.options = types.SimpleNamespace(
+            quotes_enabled=True,
+            quotes_tags="",
+            quotes_authors="",
+            quotes_disabled_sources=[],
+            quotes_max_length=1000,
+            internet_enabled=True,
+        )
+        self.notifications = []
+        self.plugin_timeout = QuotesEngine.PLUGIN_TIMEOUT
+        self.parent = types.SimpleNamespace(
+            config_folder=self.tmp,
+            options=self.options,
+            show_notification=lambda title, message: self.notifications.append(title),
+        )
+
+    def tearDown(self):
+        QuotesEngine.PLUGIN_TIMEOUT = self.plugin_timeout
+        shutil.rmtree(self.tmp)
+
+    def create_engine(self):
+        """An engine with the state QuotesEngine.start sets up, without its threads"""
+        engine = QuotesEngine(self.parent)
+        engine.prepared = []
+        engine.prepared_lock = threading.Lock()
+        engine.prepare_event = threading.Event()
+        engine.cache = {}
+        engine.cache_times = {}
+        engine.cache_lock = threading.Lock()
+        engine.fetch_count = 0
+        engine.running = True
+        engine.plugins = []
+        return engine
+
+    def rewrite_cache_file(self, engine, fn):
+        with open(engine.get_cache_file(), encoding="utf8") as f:
+            data = json.load(f)
+        fn(data)
+        with open(engine.get_cache_file(), "w", encoding="utf8") as f:
+            json.dump(data, f)
+
+    def save_sample_cache(self):
+        engine = self.create_engine()
+        engine.prepared = [quote("Prepared", "Author")]
+        engine.get_cached("Plugin", "random", "")["Cached"] = quote("Cached")
+        engine.get_cached("Plugin", "author", "Author")["By author"] = quote("By author", "Author")
+        engine.get_cached("Plugin", "keyword", "empty")
+        engine.save_cache()
+        return engine
+
+    def test_save_and_load_cache(self):
+        self.save_sample_cache()
+
+        engine = self.create_engine()
+        engine.load_cache()
+        self.assertEqual([quote("Prepared", "Author")], engine.prepared)
+        self.assertEqual({"Cached": quote("Cached")}, engine.get_cached("Plugin", "random", ""))
+        self.assertEqual(
+            ["By author"], list(engine.get_cached("Plugin", "author", "Author").keys())
+        )
+        # empty searches are not persisted
+        self.assertEqual(2, len(engine.cache_times))
+
+    def test_load_cache_expired(self):
+        engine = self.save_sample_cache()
+        old = time.time() - QuotesEngine.CACHE_TTL - 60
+
+        def expire_search(data):
+            for entry in data["cache"]:
+                if entry["category"] == "author":
+                    entry["time"] = old
+
+        self.rewrite_cache_file(engine, expire_search)
+        engine = self.create_engine()
+        engine.load_cache()
+        self.assertEqual(1, len(engine.prepared))
+        self.assertEqual(1, len(engine.get_cached("Plugin", "random", "")))
+        self.assertEqual({}, engine.get_cached("Plugin", "author", "Author"))
+
+        def expire_prepared(data):
+            data["time"] = old
+
+        self.rewrite_cache_file(engine, expire_prepared)
+        engine = self.create_engine()
+        engine.load_cache()
+        self.assertEqual([], engine.prepared)
+        self.assertEqual(1, len(engine.get_cached("Plugin", "random", "")))
+
+    def test_load_cache_options_changed(self):
+        self.save_sample_cache()
+        self.options.quotes_authors = "Someone else"
+        self.options.quotes_max_length = 7
+
+        engine = self.create_engine()
+        engine.load_cache()
+        # the prepared quotes were chosen for other options, the cache is keyed by search anyway
+        self.assertEqual([], engine.prepared)
+        self.assertEqual({"Cached": quote("Cached")}, engine.get_cached("Plugin", "random", ""))
+        self.assertEqual({}, engine.get_cached("Plugin", "author", "Author"))
+
+    def test_load_cache_missing_or_broken(self):
+        engine = self.create_engine()
+        engine.load_cache()
+        self.assertEqual([], engine.prepared)
+
+        with open(engine.get_cache_file(), "w", encoding="utf8") as f:
+            f.write('{"cache": 1}')
+        engine.load_cache()
+        self.assertEqual([], engine.prepared)
+        self.assertEqual({}, engine.cache)
+
+    def test_stop_saves_cache(self):
+        engine = self.create_engine()
+        engine.started = True
+        engine.update_plugins = lambda: None
+        engine.prepared = [quote("Prepared just before quitting")]
+        engine.stop()
+
+        engine = self.create_engine()
+        engine.load_cache()
+        self.assertEqual([quote("Prepared just before quitting")], engine.prepared)
+
+    def test_get_quotes_concurrently_cached(self):
+        source = Source(["One", "Two", "Three"])
+        engine = self.create_engine()
+        engine.plugins = [{"info": {"name": "Source"}, "plugin": source}]
+
+        self.assertEqual(2, len(engine.get_quotes_concurrently(2)))
+        self.assertEqual(set(), engine.in_flight)
+        # the quote left in the cache is used before calling the plugin again
+        self.assertEqual(1, len(engine.get_quotes_concurrently(2)))
+        self.assertEqual(1, source.calls)
+
+    def test_get_quotes_concurrently_timeout(self):
+        QuotesEngine.PLUGIN_TIMEOUT = 0.2
+        fast = Source(["One", "Two"])
+        slow = Source(["Slow"], blocking=True)
+        engine = self.create_engine()
+        engine.plugins = [
+            {"info": {"name": "Fast"}, "plugin": fast},
+            {"info": {"name": "Slow"}, "plugin": slow},
+        ]
+
+        # the slow plugin times out, the quotes of the fast one are returned
+        quotes = engine.get_quotes_concurrently(5)
+        self.assertEqual(["One", "Two"], sorted(q["quote"] for q in quotes))
+        self.assertEqual({"Slow"}, engine.in_flight)
+
+        # the slow plugin is not called again while its first call is running
+        quotes = engine.get_quotes_concurrently(5)
+        self.assertEqual(["One", "Two"], sorted(q["quote"] for q in quotes))
+        self.assertEqual((2, 1), (fast.calls, slow.calls))
+        self.assertEqual([], self.notifications)
+
+        # nor when it is the only eligible plugin, and that is not reported as a failure
+        engine.plugins = engine.plugins[1:]
+        self.assertEqual([], engine.get_quotes_concurrently(5))
+        self.assertEqual(1, slow.calls)
+        self.assertEqual([], self.notifications)
+
+        # when it eventually answers, its quotes are in the cache
+        slow.release.set()
+        deadline = time.time() + 10
+        while engine.in_flight and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(set(), engine.in_flight)
+        quotes = engine.get_quotes_concurrently(1)
+        self.assertEqual(["Slow"], [q["quote"] for q in quotes])
+        self.assertEqual(1, slow.calls)
+
+
+if __name__ == "__main__":
+    unittest.main()
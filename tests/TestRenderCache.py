@@ -0,0 +1,80 @@
+#!/usr/bin/python3
+# -*- Mode: Python; coding: utf-8; indent-tabs-mode: nil; tab-width: 4 -*-
+### BEGIN LICENSE
+# Copyright (c) 2012, Peter Levi <peterlevi@peterlevi.com>
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 3, as published
+# by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranties of
+# MERCHANTABILITY, SATISFACTORY QUALITY, or FITNESS FOR A PARTICULAR
+# PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+### END LICENSE
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from variety.RenderCache import RenderCache
+
+
+class TestRenderCache(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.folder = os.path.join(self.root, "cache")
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def make_file(self, name, size=100):
+        path = os.path.join(self.root, name)
+        with open(path, "wb") as f:
+            f.write(b"x" * size)
+        return path
+
+    def test_key(self):
+        source = self.make_file("source.jpg")
+        key = RenderCache.make_key(source, {"display_mode": "zoom"})
+        self.assertEqual(key, RenderCache.make_key(source, {"display_mode": "zoom"}))
+        self.assertNotEqual(key, RenderCache.make_key(source, {"display_mode": "smart"}))
+        os.utime(source, ns=(0, 0))
+        self.assertNotEqual(key, RenderCache.make_key(source, {"display_mode": "zoom"}))
+
+    def test_put_get(self):
+        cache = RenderCache(self.folder, 1000)
+        self.assertIsNone(cache.get("a"))
+        rendered = self.make_file("rendered.jpg")
+        cache.put("a", rendered, "spanned")
+        os.unlink(rendered)
+        path, tag = cache.get("a")
+        self.assertEqual("spanned", tag)
+        self.assertEqual(100, os.path.getsize(path))
+
+        # survives a restart
+        path, tag = RenderCache(self.folder, 1000).get("a")
+        self.assertEqual("spanned", tag)
+
+    def test_lru_eviction(self):
+        cache = RenderCache(self.folder, 250)
+        for key in "abc":
+            cache.put(key, self.make_file(key + ".jpg"))
+            if key == "b":
+                cache.get("a")
+        self.assertIsNotNone(cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("c"))
+        self.assertEqual(200, cache.get_size())
+        self.assertEqual(2, len(os.listdir(self.folder)))
+
+        cache.set_max_size(0)
+        self.assertEqual(0, cache.get_count())
+        self.assertEqual([], os.listdir(self.folder))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+#!/usr/bin/python3
+# -*- Mode: Python; coding: utf-8; indent-tabs-mode: nil; tab-width: 4 -*-
+### BEGIN LICENSE
+# Copyright (c) 2012, Peter Levi <peterlevi@peterlevi.com>
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 3, as published
+# by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranties of
+# MERCHANTABILITY, SATISFACTORY QUALITY, or FITNESS FOR A PARTICULAR
+# PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+### END LICENSE
+
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from variety.SamplingProfiler import SamplingProfiler
+
+
+def busy_loop(seconds):
+    end = time.time() + seconds
+    while time.time() < end:
+        sum(range(1000))
+
+
+class TestSamplingProfiler(unittest.TestCase):
+    def test_samples_named_threads(self):
+        profiler = SamplingProfiler()
+        profiler.start(rate=200)
+        thread = threading.Thread(target=busy_loop, args=(0.3,), name="Busy;Worker")
+        thread.start()
+        thread.join()
+        profiler.stop()
+
+        lines = profiler.get_collapsed_stacks()
+        busy = [line for line in lines if line.startswith("Busy_Worker;")]
+        self.assertTrue(busy)
+        self.assertTrue(all("busy_loop (TestSamplingProfiler.py:" in line for line in busy))
+        for line in lines:
+            stack, count = line.rsplit(" ", 1)
+            self.assertGreater(int(count), 0)
+            self.assertNotIn("SamplingProfiler._run", stack)
+
+    def test_dump_and_reset(self):
+        profiler = SamplingProfiler()
+        profiler.start(rate=200)
+        busy_loop(0.1)
+        profiler.stop()
+
+        path = os.path.join(tempfile.mkdtemp(), "profile.collapsed")
+        profiler.dump(path)
+        with open(path) as f:
+            self.assertTrue(f.read().startswith("MainThread;"))
+        os.unlink(path)
+
+        profiler.reset()
+        self.assertEqual([], profiler.get_collapsed_stacks())
+
+
+if __name__ == "__main__":
+    unittest.main()
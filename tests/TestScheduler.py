@@ -0,0 +1,76 @@
+#!/usr/bin/python3
+# -*- Mode: Python; coding: utf-8; indent-tabs-mode: nil; tab-width: 4 -*-
+### BEGIN LICENSE
+# Copyright (c) 2012, Peter Levi <peterlevi@peterlevi.com>
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 3, as published
+# by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranties of
+# MERCHANTABILITY, SATISFACTORY QUALITY, or FITNESS FOR A PARTICULAR
+# PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+### END LICENSE
+
+import threading
+import time
+import unittest
+
+from variety.Scheduler import Scheduler
+
+
+class TestScheduler(unittest.TestCase):
+    def setUp(self):
+        self.scheduler = Scheduler(workers=1)
+
+    def tearDown(self):
+        self.scheduler.stop()
+
+    def test_submit(self):
+        done = threading.Event()
+        result = []
+        self.scheduler.start()
+        self.scheduler.submit("default", lambda a, b=0: (result.append(a + b), done.set()), 1, b=2)
+        self.assertTrue(done.wait(5))
+        self.assertEqual([3], result)
+
+    def test_priorities(self):
+        order = []
+        done = threading.Event()
+        self.scheduler.submit("background", order.append, "background")
+        self.scheduler.submit("hooks", order.append, "hooks")
+        self.scheduler.submit("wallpaper", order.append, "wallpaper")
+        self.scheduler.submit("background", done.set)
+        self.scheduler.start()
+        self.assertTrue(done.wait(5))
+        self.assertEqual(["wallpaper", "hooks", "background"], order)
+
+    def test_schedule(self):
+        done = threading.Event()
+        self.scheduler.start()
+        start = time.time()
+        self.scheduler.schedule(0.2, "default", done.set)
+        self.scheduler.submit("default", lambda: None)
+        self.assertTrue(done.wait(5))
+        self.assertGreaterEqual(time.time() - start, 0.2)
+
+    def test_stats_and_failures(self):
+        done = threading.Event()
+        self.scheduler.start()
+        self.scheduler.submit("custom", lambda: 1 / 0)
+        self.scheduler.submit("custom", done.set)
+        self.assertTrue(done.wait(5))
+        time.sleep(0.1)
+        stats = self.scheduler.get_stats()["queues"]["custom"]
+        self.assertEqual(2, stats["submitted"])
+        self.assertEqual(2, stats["completed"])
+        self.assertEqual(1, stats["failed"])
+        self.assertEqual(0, stats["depth"])
+        self.assertEqual(Scheduler.DEFAULT_PRIORITY, stats["priority"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+#!/usr/bin/python3
+# -*- Mode: Python; coding: utf-8; indent-tabs-mode: nil; tab-width: 4 -*-
+### BEGIN LICENSE
+# Copyright (c) 2012, Peter Levi <peterlevi@peterlevi.com>
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 3, as published
+# by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranties of
+# MERCHANTABILITY, SATISFACTORY QUALITY, or FITNESS FOR A PARTICULAR
+# PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+### END LICENSE
+
+import os
+import threading
+import unittest
+
+from variety.ImageLoader import ImageLoader
+from variety.ThumbnailDecoder import ThumbnailDecoder
+
+
+class TestThumbnailDecoder(unittest.TestCase):
+    def setUp(self):
+        self.priorities = {}
+        self.decoded = []
+        self.results = {}
+        self.done = threading.Event()
+        self.expected = 0
+
+    def decode(self, job):
+        self.decoded.append(job)
+        return job.upper()
+
+    def callback(self, job, result):
+        self.results[job] = result
+        if len(self.results) == self.expected:
+            self.done.set()
+
+    def run_decoder(self, decoder, jobs, decode_fn=None):
+        self.expected = len(jobs)
+        for job in jobs:
+            decoder.submit(job, decode_fn or self.decode, self.callback)
+        decoder.start()
+        self.assertTrue(self.done.wait(10))
+
+    def test_priority_order(self):
+        self.priorities = {"c": 3, "a": 1, "b": 2, "a2": 1}
+        decoder = ThumbnailDecoder(self.priorities.get, workers=1)
+        self.run_decoder(decoder, ["c", "a", "b", "a2"])
+        # lowest priority first, in submission order for equal priorities
+        self.assertEqual(["a", "a2", "b", "c"], self.decoded)
+        self.assertEqual({"a": "A", "a2": "A2", "b": "B", "c": "C"}, self.results)
+
+    def test_reprioritize(self):
+        self.priorities = {"a": 1, "b": 2, "c": 3}
+        decoder = ThumbnailDecoder(self.priorities.get, workers=1)
+        for job in ["a", "b", "c"]:
+            decoder.submit(job, self.decode, self.callback)
+
+        # e.g. the window was scrolled to the end, the queued jobs are reordered
+        self.priorities.update({"a": 5, "c": 0})
+        decoder.reprioritize()
+        self.expected = 3
+        decoder.start()
+        self.assertTrue(self.done.wait(10))
+        self.assertEqual(["c", "b", "a"], self.decoded)
+
+    def test_cancel_before_decode(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def blocking_decode(job):
+            started.set()
+            release.wait(10)
+            return self.decode(job)
+
+        self.priorities = {"a": 1, "b": 2, "c": 3}
+        decoder = ThumbnailDecoder(self.priorities.get, workers=1)
+        decoder.submit("a", blocking_decode, self.callback)
+        decoder.start()
+        self.assertTrue(started.wait(10))
+
+        decoder.submit("b", self.decode, self.callback)
+        decoder.cancel()
+        self.assertTrue(decoder.is_cancelled())
+        decoder.submit("c", self.decode, self.callback)
+        release.set()
+        for thread in decoder.threads:
+            thread.join(10)
+
+        # the job being decoded finishes, but its result is dropped, queued jobs never run
+        self.assertEqual(["a"], self.decoded)
+        self.assertEqual({}, self.results)
+        self.assertEqual([], decoder.queue)
+
+    def test_decode_failure(self):
+        def decode(job):
+            if job == "bad":
+                raise ValueError(job)
+            return job
+
+        decoder = ThumbnailDecoder(lambda job: 0, workers=2)
+        self.run_decoder(decoder, ["good", "bad"], decode)
+        self.assertEqual({"good": "good", "bad": None}, self.results)
+        decoder.cancel()
+
+    def test_decode_images(self):
+        folder = os.path.dirname(os.path.abspath(__file__))
+        jobs = [os.path.join(folder, "test.jpg"), os.path.join(folder, "fake_image.jpg")]
+        decoder = ThumbnailDecoder(lambda job: 0)
+        self.run_decoder(
+            decoder, jobs, lambda file: ImageLoader.load_thumbnail_pixbuf(file, 16, 16)
+        )
+        decoder.cancel()
+
+        pixbuf = self.results[jobs[0]]
+        self.assertEqual((16, 16), (pixbuf.get_width(), pixbuf.get_height()))
+        self.assertIsNone(self.results[jobs[1]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+#!/usr/bin/python3
+# -*- Mode: Python; coding: utf-8; indent-tabs-mode: nil; tab-width: 4 -*-
+### BEGIN LICENSE
+# Copyright (c) 2012, Peter Levi <peterlevi@peterlevi.com>
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 3, as published
+# by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranties of
+# MERCHANTABILITY, SATISFACTORY QUALITY, or FITNESS FOR A PARTICULAR
+# PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+### END LICENSE
+
+import os
+import unittest
+
+from variety.ThumbsWindow import ThumbsWindow
+
+
+class Thumbs:
+    """The sizing logic of ThumbsWindow, without creating an actual window"""
+
+    is_horizontal = ThumbsWindow.is_horizontal
+    _thumb_size = ThumbsWindow._thumb_size
+    _decode_thumb = ThumbsWindow._decode_thumb
+
+    def __init__(self, position, breadth):
+        self.position = position
+        self.breadth = breadth
+
+
+class TestThumbsWindow(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # Chdir to the tests directory so that we can find our test images
+        curdir = os.path.dirname(os.path.abspath(__file__))
+        if curdir:
+            os.chdir(curdir)
+
+    def test_thumb_size(self):
+        self.assertEqual((16, 16), Thumbs(ThumbsWindow.BOTTOM, 16)._thumb_size("test.jpg"))
+        self.assertEqual((48, 48), Thumbs(ThumbsWindow.LEFT, 48)._thumb_size("test.jpg"))
+        self.assertRaises(
+            Exception, lambda: Thumbs(ThumbsWindow.BOTTOM, 16)._thumb_size("fake_image.jpg")
+        )
+
+    def test_decode_thumb(self):
+        thumbs = Thumbs(ThumbsWindow.BOTTOM, 16)
+        image_info = {"file": "test.jpg", "thumb_size": thumbs._thumb_size("test.jpg")}
+        pixbuf = thumbs._decode_thumb(image_info)
+        self.assertEqual((16, 16), (pixbuf.get_width(), pixbuf.get_height()))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+#!/usr/bin/python3
+# -*- Mode: Python; coding: utf-8; indent-tabs-mode: nil; tab-width: 4 -*-
+### BEGIN LICENSE
+# Copyright (c) 2012, Peter Levi <peterlevi@peterlevi.com>
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 3, as published
+# by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranties of
+# MERCHANTABILITY, SATISFACTORY QUALITY, or FITNESS FOR A PARTICULAR
+# PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+### END LICENSE
+
+import json
+import os
+import tempfile
+import unittest
+
+from variety.Tracer import Tracer
+
+
+class TestTracer(unittest.TestCase):
+    def test_spans_and_annotations(self):
+        tracer = Tracer()
+        with tracer.span("do_set_wp", cat="wallpaper", refresh_level=0) as args:
+            args["resolution"] = "1920x1080"
+            with tracer.span("apply_clock", cat="do_set_wp"):
+                tracer.annotate(spawned_process="convert")
+        events = [e for e in tracer.get_trace()["traceEvents"] if e["ph"] == "X"]
+        self.assertEqual(["apply_clock", "do_set_wp"], [e["name"] for e in events])
+        self.assertEqual({"spawned_process": "convert"}, events[0]["args"])
+        self.assertEqual({"refresh_level": 0, "resolution": "1920x1080"}, events[1]["args"])
+        self.assertLessEqual(events[1]["ts"], events[0]["ts"])
+
+    def test_rolling_buffer(self):
+        tracer = Tracer(capacity=3)
+        for i in range(10):
+            with tracer.span("span%d" % i):
+                pass
+        events = [e for e in tracer.get_trace()["traceEvents"] if e["ph"] == "X"]
+        self.assertEqual(["span7", "span8", "span9"], [e["name"] for e in events])
+
+    def test_dump(self):
+        tracer = Tracer()
+        with tracer.span("test"):
+            pass
+        path = os.path.join(tempfile.mkdtemp(), "trace.json")
+        tracer.dump(path)
+        with open(path) as f:
+            trace = json.load(f)
+        self.assertIn("traceEvents", trace)
+        os.unlink(path)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -15,8 +15,12 @@
 # with this program.  If not, see <http://www.gnu.org/licenses/>.
 ### END LICENSE
 
+import os
+import shutil
+import tempfile
 import unittest
 
+from variety.Util import Util
 from variety.VarietyWindow import VarietyWindow
 
 
@@ -27,6 +31,33 @@ class TestVarietyWindow(unittest.TestCase):
         expected = "-fill '#DDDDDD' -annotate 0x0+300+153 '%H:%M' -pointsize 50 -annotate 0x0+300+103 '%A, %B %d'"
         self.assertEqual(expected, ff)
 
+    def test_differs_from_bundled_script(self):
+        tmp = tempfile.mkdtemp()
+        try:
+            bundled = os.path.join(tmp, "bundled")
+            script = os.path.join(tmp, "script")
+            with open(bundled, "w") as f:
+                f.write('WP="$HOME/.config/variety/wallpaper"\n')
+            replacements = {"$HOME/.config/variety/": "/home/user/.config/variety-profile/"}
+
+            Util.copy_with_replace(bundled, script, replacements)
+            self.assertFalse(
+                VarietyWindow.differs_from_bundled_script(script, bundled, replacements)
+            )
+
+            with open(script, "a") as f:
+                f.write("feh --bg-fill $WP\n")
+            self.assertTrue(
+                VarietyWindow.differs_from_bundled_script(script, bundled, replacements)
+            )
+            self.assertTrue(
+                VarietyWindow.differs_from_bundled_script(
+                    os.path.join(tmp, "missing"), bundled, replacements
+                )
+            )
+        finally:
+            shutil.rmtree(tmp)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,48 @@
+#!/usr/bin/python3
+# -*- Mode: Python; coding: utf-8; indent-tabs-mode: nil; tab-width: 4 -*-
+### BEGIN LICENSE
+# Copyright (c) 2012, Peter Levi <peterlevi@peterlevi.com>
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 3, as published
+# by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranties of
+# MERCHANTABILITY, SATISFACTORY QUALITY, or FITNESS FOR A PARTICULAR
+# PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+### END LICENSE
+
+import os
+import unittest
+from unittest.mock import patch
+
+from variety.WallpaperSetter import WallpaperHelper, get_desktop
+
+
+class TestWallpaperSetter(unittest.TestCase):
+    def test_get_desktop(self):
+        with patch.dict(os.environ, {"XDG_CURRENT_DESKTOP": "ubuntu:GNOME"}):
+            self.assertEqual("gnome", get_desktop())
+        with patch.dict(os.environ, {"XDG_CURRENT_DESKTOP": "X-Cinnamon"}):
+            self.assertEqual("x-cinnamon", get_desktop())
+        with patch.dict(os.environ, {"XDG_CURRENT_DESKTOP": "KDE"}):
+            self.assertIsNone(get_desktop())
+
+    def test_helper_reports_errors_and_survives(self):
+        helper = WallpaperHelper("no-such-desktop")
+        try:
+            for _ in range(2):
+                with self.assertRaisesRegex(Exception, "No native wallpaper setter"):
+                    helper.set_wallpaper("/tmp/wallpaper.jpg", "zoom")
+            process = helper.process
+            self.assertIsNone(process.poll())
+        finally:
+            helper.close()
+        self.assertIsNotNone(process.poll())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+#!/usr/bin/python3
+# -*- Mode: Python; coding: utf-8; indent-tabs-mode: nil; tab-width: 4 -*-
+### BEGIN LICENSE
+# Copyright (c) 2012, Peter Levi <peterlevi@peterlevi.com>
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 3, as published
+# by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranties of
+# MERCHANTABILITY, SATISFACTORY QUALITY, or FITNESS FOR A PARTICULAR
+# PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+### END LICENSE
+
+"""
+Synthetic image corpora for the benchmarks, generated at run time so that no test data
+has to be checked in and no network access is needed.
+"""
+
+import os
+import random
+
+from PIL import Image
+
+# (width, height) pairs that exercise the landscape, minimum size and display mode branches
+SIZES = [(1920, 1080), (2560, 1440), (1280, 1024), (1080, 1920), (800, 600), (320, 240)]
+
+
+def make_tree(root, depth=4, fanout=4, files_per_folder=25):
+    """
+    Creates a deep folder tree of empty .jpg/.txt files for benchmarking the file listing code.
+    Returns the number of files created.
+    """
+    count = 0
+    os.makedirs(root, exist_ok=True)
+    for i in range(files_per_folder):
+        extension = ".jpg" if i % 5 else ".txt"
+        with open(os.path.join(root, "file-%03d%s" % (i, extension)), "w"):
+            count += 1
+    if depth > 0:
+        for i in range(fanout):
+            count += make_tree(
+                os.path.join(root, "sub-%d" % i), depth - 1, fanout, files_per_folder
+            )
+    return count
+
+
+def make_images(root, count, seed=42, scale=1.0):
+    """
+    Creates count real JPEG images of various sizes and dominant colors.
+    Images are solid color with a few random rectangles, so they encode quickly but still give
+    the color analysis something to work on. scale shrinks all sizes, for faster runs.
+    """
+    rnd = random.Random(seed)
+    os.makedirs(root, exist_ok=True)
+    paths = []
+    for i in range(count):
+        w, h = SIZES[i % len(SIZES)]
+        w, h = max(16, int(w * scale)), max(16, int(h * scale))
+        color = tuple(rnd.randint(0, 255) for _ in range(3))
+        img = Image.new("RGB", (w, h), color)
+        for _ in range(5):
+            x, y = rnd.randint(0, w - 1), rnd.randint(0, h - 1)
+            box = (x, y, min(w, x + rnd.randint(1, w // 2)), min(h, y + rnd.randint(1, h // 2)))
+            img.paste(tuple(rnd.randint(0, 255) for _ in range(3)), box)
+        path = os.path.join(root, "image-%04d.jpg" % i)
+        img.save(path, "JPEG", quality=85)
+        paths.append(path)
+    return paths
@@ -0,0 +1,162 @@
+# -*- Mode: Python; coding: utf-8; indent-tabs-mode: nil; tab-width: 4 -*-
+### BEGIN LICENSE
+# Copyright (c) 2012, Peter Levi <peterlevi@peterlevi.com>
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 3, as published
+# by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranties of
+# MERCHANTABILITY, SATISFACTORY QUALITY, or FITNESS FOR A PARTICULAR
+# PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+### END LICENSE
+
+"""
+A local HTTP stand-in for the image sources' servers, with optional latency and bandwidth shaping.
+
+Requests are redirected to it by replacing Util.request for the duration of a
+redirect_requests() block: https://host/path?query is fetched as
+http://127.0.0.1:port/host/path?query, and the server answers from tests.benchmarks.fixtures.
+"""
+
+import contextlib
+import itertools
+import threading
+import time
+import urllib.parse
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from tests.benchmarks import fixtures
+
+
+class FakeServer:
+    CHUNK = 16 * 1024
+
+    def __init__(self, items=50, image_size=(1920, 1080), latency_ms=0, bandwidth_kbps=0):
+        """
+        :param items: number of images listed in every API response
+        :param latency_ms: delay before each response starts
+        :param bandwidth_kbps: per-connection bandwidth limit in kilobytes per second, 0 for none
+        """
+        self.items = items
+        self.latency = latency_ms / 1000.0
+        self.bandwidth = bandwidth_kbps * 1024
+        self.images = fixtures.make_image_variants(*image_size)
+        self.seq = itertools.count(1)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.bytes_sent = 0
+        self.httpd = None
+
+    def start(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.handle(self)
+
+            do_POST = do_GET
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        threading.Thread(target=self.httpd.serve_forever, name="FakeServer", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    @property
+    def port(self):
+        return self.httpd.server_address[1]
+
+    def rewrite(self, url):
+        if url.startswith("//"):
+            url = "https:" + url
+        p = urllib.parse.urlsplit(url)
+        return "http://127.0.0.1:%d/%s%s%s" % (
+            self.port,
+            p.netloc,
+            p.path or "/",
+            "?" + p.query if p.query else "",
+        )
+
+    def get_stats(self):
+        with self.lock:
+            return self.requests, self.bytes_sent
+
+    def handle(self, request):
+        p = urllib.parse.urlsplit(request.path)
+        host, _, path = p.path.lstrip("/").partition("/")
+        path = "/" + path
+        query = urllib.parse.parse_qs(p.query)
+
+        fixture = fixtures.find_fixture(host, path)
+        if fixture:
+            content_type, body = fixture(query, next(self.seq), self.items)
+        elif host in fixtures.IMAGE_HOSTS:
+            content_type = "image/jpeg"
+            body = self.images[zlib.crc32(request.path.encode()) % len(self.images)]
+        else:
+            request.send_error(404, "No fixture for %s%s" % (host, path))
+            return
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        request.send_response(200)
+        request.send_header("Content-Type", content_type)
+        request.send_header("Content-Length", str(len(body)))
+        request.send_header("X-Ratelimit-Remaining", "5000")
+        request.end_headers()
+        for i in range(0, len(body), FakeServer.CHUNK):
+            chunk = body[i : i + FakeServer.CHUNK]
+            request.wfile.write(chunk)
+            if self.bandwidth:
+                time.sleep(len(chunk) / self.bandwidth)
+
+        with self.lock:
+            self.requests += 1
+            self.bytes_sent += len(body)
+
+
+class RequestTimer(threading.local):
+    """Wall time spent in Util.request by the current thread, to tell fetching from parsing"""
+
+    def __init__(self):
+        self.total = 0.0
+
+    @contextlib.contextmanager
+    def measure(self):
+        self.total = 0.0
+        yield self
+
+
+@contextlib.contextmanager
+def redirect_requests(server):
+    """Makes every Util.request call in the block go to server instead of the real host"""
+    from variety.Util import Util
+
+    original = Util.__dict__["request"]
+    request = original.__func__
+    timer = RequestTimer()
+
+    def redirected(url, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return request(server.rewrite(url), *args, **kwargs)
+        finally:
+            timer.total += time.perf_counter() - start
+
+    Util.request = staticmethod(redirected)
+    try:
+        yield timer
+    finally:
+        Util.request = original
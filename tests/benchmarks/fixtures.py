@@ -0,0 +1,391 @@
+# -*- Mode: Python; coding: utf-8; indent-tabs-mode: nil; tab-width: 4 -*-
+### BEGIN LICENSE
+# Copyright (c) 2012, Peter Levi <peterlevi@peterlevi.com>
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 3, as published
+# by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranties of
+# MERCHANTABILITY, SATISFACTORY QUALITY, or FITNESS FOR A PARTICULAR
+# PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+### END LICENSE
+
+"""
+API responses of the image sources, for the offline downloader benchmarks.
+
+The responses follow the structure and field set of real responses of each service (trimmed to
+the fields a typical response has), but are generated, so that their size can be varied and so
+that every response lists images that were not seen before - otherwise the downloaders would
+skip the images they already downloaded.
+Every fixture is a function (query, seq, items) -> (content_type, body), where query is the
+parsed query string of the request and seq is a number unique to the request.
+"""
+
+import io
+import json
+import random
+from xml.sax.saxutils import escape
+
+from PIL import Image
+
+JSON = "application/json; charset=utf-8"
+HTML = "text/html; charset=utf-8"
+XML = "application/rss+xml; charset=utf-8"
+
+WORDS = (
+    "mountain lake forest sunset autumn river valley snow beach ocean coast desert canyon "
+    "waterfall meadow aurora night sky clouds fog island glacier volcano field"
+).split()
+
+
+def _words(rnd, count):
+    return [rnd.choice(WORDS) for _ in range(count)]
+
+
+def _json(data):
+    return JSON, json.dumps(data).encode()
+
+
+def flickr_rest(query, seq, items):
+    rnd = random.Random(seq)
+    method = query.get("method", [""])[0]
+    if method != "flickr.photos.search":
+        return _json({"stat": "fail", "code": 112, "message": "Method not found"})
+
+    photos = []
+    if "extras" in query:
+        for i in range(items):
+            photo_id = "5%04d%05d" % (seq % 10000, i)
+            photo = {
+                "id": photo_id,
+                "owner": "%d@N0%d" % (rnd.randint(10000000, 99999999), rnd.randint(0, 8)),
+                "secret": "%010x" % rnd.getrandbits(40),
+                "server": "65535",
+                "farm": 66,
+                "title": " ".join(_words(rnd, 3)).capitalize(),
+                "ispublic": 1,
+                "isfriend": 0,
+                "isfamily": 0,
+                "description": {"_content": " ".join(_words(rnd, 40))},
+                "ownername": "Photographer %d" % rnd.randint(1, 500),
+                "tags": " ".join(_words(rnd, 15)),
+                "o_width": "6000",
+                "o_height": "4000",
+            }
+            for suffix, width, height in (
+                ("o", 6000, 4000),
+                ("k", 2048, 1365),
+                ("h", 1600, 1067),
+                ("l", 1024, 683),
+            ):
+                photo["url_" + suffix] = "https://live.staticflickr.com/65535/%s_%s_%s.jpg" % (
+                    photo_id,
+                    photo["secret"],
+                    suffix,
+                )
+                photo["width_" + suffix] = width
+                photo["height_" + suffix] = height
+            photos.append(photo)
+
+    return _json(
+        {
+            "photos": {
+                "page": 1,
+                "pages": 10,
+                "perpage": int(query.get("per_page", ["100"])[0]),
+                "total": 10 * items,
+                "photo": photos,
+            },
+            "stat": "ok",
+        }
+    )
+
+
+def wallhaven_search(query, seq, items):
+    rnd = random.Random(seq)
+    data = []
+    for i in range(items):
+        wallpaper_id = "%03x%03x" % (seq % 4096, i)
+        data.append(
+            {
+                "id": wallpaper_id,
+                "url": "https://wallhaven.cc/w/" + wallpaper_id,
+                "short_url": "https://whvn.cc/" + wallpaper_id,
+                "views": rnd.randint(100, 100000),
+                "favorites": rnd.randint(0, 5000),
+                "source": "",
+                "purity": "sfw",
+                "category": "general",
+                "dimension_x": 3840,
+                "dimension_y": 2160,
+                "resolution": "3840x2160",
+                "ratio": "1.78",
+                "file_size": rnd.randint(500000, 5000000),
+                "file_type": "image/jpeg",
+                "created_at": "2024-01-01 12:00:00",
+                "colors": ["#424153", "#999999", "#cccccc"],
+                "path": "https://w.wallhaven.cc/full/%s/wallhaven-%s.jpg"
+                % (wallpaper_id[:2], wallpaper_id),
+                "thumbs": {
+                    "large": "https://th.wallhaven.cc/lg/%s/%s.jpg"
+                    % (wallpaper_id[:2], wallpaper_id),
+                    "original": "https://th.wallhaven.cc/orig/%s/%s.jpg"
+                    % (wallpaper_id[:2], wallpaper_id),
+                    "small": "https://th.wallhaven.cc/small/%s/%s.jpg"
+                    % (wallpaper_id[:2], wallpaper_id),
+                },
+            }
+        )
+    return _json(
+        {
+            "data": data,
+            "meta": {
+                "current_page": int(query.get("page", ["1"])[0]),
+                "last_page": 10,
+                "per_page": items,
+                "total": 10 * items,
+                "query": query.get("q", [""])[0],
+                "seed": None,
+            },
+        }
+    )
+
+
+def wallhaven_info(query, seq, items):
+    rnd = random.Random(seq)
+    tags = [
+        {"id": rnd.randint(1, 100000), "name": word, "alias": "", "category_id": 1, "purity": "sfw"}
+        for word in _words(rnd, 8)
+    ]
+    return _json({"data": {"id": "%06x" % seq, "purity": "sfw", "tags": tags}})
+
+
+def reddit_listing(query, seq, items):
+    rnd = random.Random(seq)
+    children = []
+    for i in range(items):
+        post_id = "%x%03x" % (seq, i)
+        # about a fifth of the posts on image subreddits link to something other than an image
+        url = (
+            "https://i.redd.it/%s.jpg" % post_id
+            if i % 5
+            else "https://www.reddit.com/gallery/" + post_id
+        )
+        children.append(
+            {
+                "kind": "t3",
+                "data": {
+                    "id": post_id,
+                    "subreddit": "EarthPorn",
+                    "title": " ".join(_words(rnd, 6)).capitalize() + " [4032x3024]",
+                    "author": "user%d" % rnd.randint(1, 10000),
+                    "score": rnd.randint(1, 50000),
+                    "num_comments": rnd.randint(0, 500),
+                    "over_18": False,
+                    "url": url,
+                    "permalink": "/r/EarthPorn/comments/%s/%s/" % (post_id, rnd.choice(WORDS)),
+                    "thumbnail": "https://b.thumbs.redditmedia.com/%s.jpg" % post_id,
+                    "created_utc": 1700000000 + i,
+                },
+            }
+        )
+    return _json(
+        {"kind": "Listing", "data": {"after": "t3_next", "dist": items, "children": children}}
+    )
+
+
+def bing_archive(query, seq, items):
+    # Bing returns at most 8 images, whatever is asked for
+    rnd = random.Random(seq)
+    images = []
+    for i in range(min(items, 8)):
+        name = "OHR.Bench%dx%d" % (seq, i)
+        images.append(
+            {
+                "startdate": "202401%02d" % (i + 1),
+                "fullstartdate": "202401%02d0800" % (i + 1),
+                "enddate": "202401%02d" % (i + 2),
+                "url": "/th?id=%s_EN-US%d_1920x1080.jpg&rf=LaDigue_1920x1080.jpg&pid=hp"
+                % (name, seq),
+                "urlbase": "/th?id=%s_EN-US%d" % (name, seq),
+                "copyright": "%s (© Photographer)" % " ".join(_words(rnd, 5)).capitalize(),
+                "copyrightlink": "https://www.bing.com/search?q=%s" % rnd.choice(WORDS),
+                "title": " ".join(_words(rnd, 3)).capitalize(),
+                "wp": True,
+                "hsh": "%032x" % rnd.getrandbits(128),
+            }
+        )
+    return _json({"images": images, "tooltips": {"loading": "Loading..."}})
+
+
+def apod_archive(query, seq, items):
+    lines = ["<html><head><title>Astronomy Picture of the Day Archive</title></head><body><b>"]
+    for i in range(items):
+        lines.append(
+            '2024 January %02d:  <a href="ap%d%04d.html">%s</a><br>'
+            % (i % 28 + 1, seq, i, " ".join(_words(random.Random(i), 3)).capitalize())
+        )
+    lines.append("</b></body></html>")
+    return HTML, "\n".join(lines).encode()
+
+
+def apod_page(query, seq, items, page=""):
+    rnd = random.Random(seq)
+    name = page[len("ap") : -len(".html")]
+    body = (
+        "<html><head><title>APOD</title></head><body><center><h1>Astronomy Picture of the Day</h1>"
+        '<p><a href="image/2401/%s_bench.jpg"><img src="image/2401/%s_bench1024.jpg" '
+        'alt="%s"></a></p></center><center><b>%s</b></center><p><b>Explanation:</b> %s</p>'
+        "</body></html>"
+        % (name, name, rnd.choice(WORDS), " ".join(_words(rnd, 4)), " ".join(_words(rnd, 150)))
+    )
+    return HTML, body.encode()
+
+
+def media_rss(query, seq, items):
+    rnd = random.Random(seq)
+    entries = []
+    for i in range(items):
+        item_id = "%d-%d" % (seq, i)
+        title = escape(" ".join(_words(rnd, 3)).capitalize())
+        entries.append(
+            "<item><title>%s</title>"
+            "<link>https://www.deviantart.com/artist/art/bench-%s</link>"
+            '<guid isPermaLink="true">https://www.deviantart.com/artist/art/bench-%s</guid>'
+            "<pubDate>Mon, 01 Jan 2024 12:00:00 PST</pubDate>"
+            '<media:title type="plain">%s</media:title>'
+            "<media:keywords>%s</media:keywords>"
+            '<media:rating>nonadult</media:rating><media:category label="Landscapes">'
+            "photography/nature/landscapes</media:category>"
+            '<media:credit role="author" scheme="urn:ebu">artist%d</media:credit>'
+            '<media:description type="html">%s</media:description>'
+            '<media:thumbnail url="https://images.example.com/thumb/bench-%s.jpg" '
+            'height="150" width="225"/>'
+            '<media:content url="https://images.example.com/full/bench-%s.jpg" '
+            'height="2160" width="3840" medium="image"/></item>'
+            % (
+                title,
+                item_id,
+                item_id,
+                title,
+                ", ".join(_words(rnd, 6)),
+                rnd.randint(1, 1000),
+                escape(" ".join(_words(rnd, 30))),
+                item_id,
+                item_id,
+            )
+        )
+    body = (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<rss version="2.0" xmlns:media="http://search.yahoo.com/mrss/" '
+        'xmlns:atom="http://www.w3.org/2005/Atom"><channel>'
+        "<title>DeviantArt: popular leaves</title><link>https://www.deviantart.com</link>"
+        "<description>DeviantArt RSS for popular leaves</description>%s</channel></rss>"
+        % "".join(entries)
+    )
+    return XML, body.encode()
+
+
+def unsplash_random(query, seq, items):
+    rnd = random.Random(seq)
+    photos = []
+    for i in range(min(items, int(query.get("count", ["30"])[0]))):
+        photo_id = "%d-%04d" % (seq, i)
+        user = "user%d" % rnd.randint(1, 10000)
+        photos.append(
+            {
+                "id": photo_id,
+                "created_at": "2024-01-01T12:00:00Z",
+                "width": 6000,
+                "height": 4000,
+                "color": "#0c2640",
+                "blur_hash": "LB8:~?%2xuM{~WM{WBWB%2ofRjj[",
+                "description": " ".join(_words(rnd, 8)),
+                "alt_description": " ".join(_words(rnd, 6)),
+                "urls": {
+                    size: "https://images.unsplash.com/photo-%s?ixid=M3w%d&ixlib=rb-4.0.3%s"
+                    % (photo_id, seq, "" if size in ("raw", "full") else "&q=80&w=1080")
+                    for size in ("raw", "full", "regular", "small", "thumb")
+                },
+                "links": {
+                    "self": "https://api.unsplash.com/photos/" + photo_id,
+                    "html": "https://unsplash.com/photos/" + photo_id,
+                    "download": "https://unsplash.com/photos/%s/download" % photo_id,
+                    "download_location": "https://api.unsplash.com/photos/%s/download" % photo_id,
+                },
+                "likes": rnd.randint(0, 1000),
+                "topic_submissions": {rnd.choice(WORDS): {"status": "approved"}},
+                "user": {
+                    "id": "u%d" % rnd.randint(1, 10000),
+                    "username": user,
+                    "name": user.capitalize(),
+                    "links": {"html": "https://unsplash.com/@" + user},
+                },
+                "exif": {"make": "Canon", "model": "EOS 5D", "iso": 100},
+                "views": rnd.randint(1000, 1000000),
+                "downloads": rnd.randint(10, 10000),
+            }
+        )
+    return _json(photos)
+
+
+def unsplash_download_location(query, seq, items):
+    return _json({"url": "https://images.unsplash.com/photo-%d" % seq})
+
+
+# (host, path prefix) -> fixture, the first match wins. Requests to IMAGE_HOSTS get an image.
+ROUTES = [
+    ("api.flickr.com", "/services/rest", flickr_rest),
+    ("wallhaven.cc", "/api/v1/search", wallhaven_search),
+    ("wallhaven.cc", "/api/v1/w/", wallhaven_info),
+    ("www.reddit.com", "/r/", reddit_listing),
+    ("www.bing.com", "/HPImageArchive.aspx", bing_archive),
+    ("apod.nasa.gov", "/apod/archivepix.html", apod_archive),
+    ("api.unsplash.com", "/photos/random", unsplash_random),
+    ("api.unsplash.com", "/photos/", unsplash_download_location),
+    ("backend.deviantart.com", "/rss.xml", media_rss),
+]
+
+IMAGE_HOSTS = {
+    "live.staticflickr.com",
+    "w.wallhaven.cc",
+    "i.redd.it",
+    "www.bing.com",
+    "apod.nasa.gov",
+    "images.unsplash.com",
+    "images.example.com",
+}
+
+
+def find_fixture(host, path):
+    for route_host, prefix, fixture in ROUTES:
+        if host == route_host and path.startswith(prefix):
+            return fixture
+    if host == "apod.nasa.gov" and path.startswith("/apod/ap") and path.endswith(".html"):
+        return lambda query, seq, items: apod_page(query, seq, items, path.split("/")[-1])
+    return None
+
+
+def make_image_variants(width, height, count=4, seed=42):
+    """
+    Returns count JPEGs of the given size, as bytes. They are noisy enough that their size is
+    close to the size of a photo of the same resolution.
+    """
+    rnd = random.Random(seed)
+    variants = []
+    for _ in range(count):
+        # upscaled noise compresses about as badly as a real photo does
+        noise = Image.frombytes(
+            "RGB",
+            (width // 8, height // 8),
+            bytes(rnd.getrandbits(8) for _ in range(width * height * 3 // 64)),
+        )
+        img = noise.resize((width, height), Image.BILINEAR)
+        out = io.BytesIO()
+        img.save(out, "JPEG", quality=90)
+        variants.append(out.getvalue())
+    return variants
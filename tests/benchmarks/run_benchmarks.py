@@ -0,0 +1,460 @@
+#!/usr/bin/python3
+# -*- Mode: Python; coding: utf-8; indent-tabs-mode: nil; tab-width: 4 -*-
+### BEGIN LICENSE
+# Copyright (c) 2012, Peter Levi <peterlevi@peterlevi.com>
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 3, as published
+# by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranties of
+# MERCHANTABILITY, SATISFACTORY QUALITY, or FITNESS FOR A PARTICULAR
+# PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+### END LICENSE
+
+"""
+Benchmarks for the wallpaper selection and rendering hot paths.
+
+Run from the project root:
+
+    python3 -m tests.benchmarks.run_benchmarks [--filter NAME] [--update-baseline]
+
+Results are compared against a local JSON baseline (~/.cache/variety/benchmarks-baseline.json)
+and the run fails if any benchmark's median got slower than the baseline by more than
+--tolerance. No network access is needed. GTK needs a display: when there is none, the runner
+restarts itself under xvfb-run if that is available.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+BENCHMARKS = []
+
+# baselines are specific to the machine they were recorded on, so they are kept out of the tree
+DEFAULT_BASELINE = os.path.expanduser("~/.cache/variety/benchmarks-baseline.json")
+
+
+def benchmark(name):
+    """Registers a benchmark setup function, it returns the callable to time"""
+
+    def decorator(fn):
+        BENCHMARKS.append((name, fn))
+        return fn
+
+    return decorator
+
+
+def ensure_display(module="tests.benchmarks.run_benchmarks"):
+    if os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY"):
+        return
+    if os.environ.get("VARIETY_BENCHMARKS_XVFB"):
+        return  # already restarted once, run without a display
+    if shutil.which("xvfb-run"):
+        env = dict(os.environ, VARIETY_BENCHMARKS_XVFB="1")
+        args = ["xvfb-run", "-a", sys.executable, "-m", module]
+        os.execvpe("xvfb-run", args + sys.argv[1:], env)
+    print("No display and no xvfb-run, GTK-dependent benchmarks may fail", file=sys.stderr)
+
+
+class Corpus:
+    def __init__(self, root, image_count, scale):
+        from tests.benchmarks.corpus import make_images, make_tree
+
+        self.root = root
+        self.tree = os.path.join(root, "tree")
+        self.tree_files = make_tree(self.tree)
+        self.images_folder = os.path.join(root, "images")
+        self.images = make_images(self.images_folder, image_count, scale=scale)
+
+        from variety.Util import Util
+
+        # give half of the images metadata, ratings and SFW ratings, like downloaded images have
+        for i, img in enumerate(self.images[::2]):
+            Util.write_metadata(
+                img,
+                {
+                    "sourceType": "benchmark",
+                    "keywords": ["landscape", "nature"],
+                    "sfwRating": 100 if i % 3 else 50,
+                },
+            )
+            Util.set_rating(img, i % 6 - 1)
+
+
+class BenchmarkWindow:
+    """Just enough of VarietyWindow to run its image selection code without creating any windows"""
+
+    def __init__(self, options, folders):
+        from variety.VarietyWindow import VarietyWindow
+
+        for method in ("select_random_images", "find_images", "image_ok", "size_ok"):
+            setattr(self, method, getattr(VarietyWindow, method).__get__(self))
+
+        self.options = options
+        self.folders = folders
+        self.individual_images = []
+        self.albums = []
+        self.image_colors_cache = {}
+        self.prepared = []
+        self.prepared_lock = threading.Lock()
+        self.prepared_cleared = False
+        self.running = True
+        self.used = []
+        self.min_width = 1920 * options.min_size // 100
+        self.min_height = 1080 * options.min_size // 100
+
+    def has_real_downloaders(self):
+        return False
+
+    def trigger_download(self):
+        pass
+
+
+def make_options(**overrides):
+    from variety.Options import Options
+
+    options = Options()
+    options.set_defaults()
+    options.use_landscape_enabled = False
+    for key, value in overrides.items():
+        setattr(options, key, value)
+    return options
+
+
+# filter combination name -> options overrides
+FILTER_COMBINATIONS = {
+    "none": {},
+    "landscape": {"use_landscape_enabled": True},
+    "min_size": {"min_size_enabled": True, "min_size": 80},
+    "lightness": {"lightness_enabled": True},
+    "color": {"desired_color_enabled": True, "desired_color": (200, 50, 50)},
+    "rating": {"min_rating_enabled": True, "min_rating": 3},
+    "safe_mode": {"safe_mode": True},
+    "all": {
+        "use_landscape_enabled": True,
+        "min_size_enabled": True,
+        "lightness_enabled": True,
+        "desired_color_enabled": True,
+        "desired_color": (200, 50, 50),
+        "min_rating_enabled": True,
+        "min_rating": 3,
+        "safe_mode": True,
+    },
+}
+
+
+@benchmark("Util.list_files[deep_tree]")
+def bench_list_files(corpus):
+    from variety.Util import Util
+
+    def run():
+        return sum(1 for _ in Util.list_files(folders=(corpus.tree,), filter_func=Util.is_image))
+
+    return run
+
+
+@benchmark("select_random_images")
+def bench_select_random_images(corpus):
+    window = BenchmarkWindow(make_options(), [corpus.tree, corpus.images_folder])
+    return lambda: window.select_random_images(100)
+
+
+def _image_ok_benchmark(combination):
+    def setup(corpus):
+        window = BenchmarkWindow(
+            make_options(**FILTER_COMBINATIONS[combination]), [corpus.images_folder]
+        )
+
+        def run():
+            # the colors cache would turn every run after the first one into a lookup
+            window.image_colors_cache = {}
+            return sum(1 for img in corpus.images if window.image_ok(img, 0))
+
+        return run
+
+    return setup
+
+
+def _find_images_benchmark(combination):
+    def setup(corpus):
+        window = BenchmarkWindow(
+            make_options(**FILTER_COMBINATIONS[combination]), [corpus.images_folder]
+        )
+
+        def run():
+            window.image_colors_cache = {}
+            window.prepared = []
+            window.find_images()
+
+        return run
+
+    return setup
+
+
+for _combination in FILTER_COMBINATIONS:
+    benchmark("image_ok[%s]" % _combination)(_image_ok_benchmark(_combination))
+    benchmark("find_images[%s]" % _combination)(_find_images_benchmark(_combination))
+
+
+@benchmark("DominantColors")
+def bench_dominant_colors(corpus):
+    from variety.DominantColors import DominantColors
+
+    def run():
+        for img in corpus.images:
+            DominantColors(img, False).get_dominant_colors()
+
+    return run
+
+
+@benchmark("QuoteWriter.write_quote_on_surface")
+def bench_write_quote(corpus):
+    from variety.QuoteWriter import QuoteWriter
+
+    options = make_options()
+    surface = QuoteWriter.load_cairo_surface(corpus.images[0], 1920, 1080)
+    quote = "The quick brown fox jumps over the lazy dog. " * 4
+
+    def run():
+        QuoteWriter.write_quote_on_surface(surface, quote, "Author", options)
+
+    return run
+
+
+@benchmark("QuoteWriter.write_quote_on_surface[uncached]")
+def bench_write_quote_uncached(corpus):
+    from variety.QuoteWriter import QuoteWriter
+
+    options = make_options()
+    surface = QuoteWriter.load_cairo_surface(corpus.images[0], 1920, 1080)
+    quote = "The quick brown fox jumps over the lazy dog. " * 4
+
+    def run():
+        QuoteWriter.layouts.clear()
+        QuoteWriter.overlays.clear()
+        QuoteWriter.write_quote_on_surface(surface, quote, "Author", options)
+
+    return run
+
+
+def _save_surface_benchmark(extension, quality):
+    def bench(corpus):
+        from variety.QuoteWriter import QuoteWriter
+
+        surface = QuoteWriter.load_cairo_surface(corpus.images[0], 1920, 1080)
+        target = os.path.join(corpus.root, "saved" + extension)
+
+        def run():
+            QuoteWriter.save_cairo_surface(surface, target, quality)
+            QuoteWriter.load_cairo_surface(target, 1920, 1080)
+
+        return run
+
+    return bench
+
+
+# intermediate handoff between rendering stages: the old full-quality JPEG vs. lossless PPM
+benchmark("QuoteWriter.save+load[jpg q100]")(_save_surface_benchmark(".jpg", 100))
+benchmark("QuoteWriter.save+load[ppm]")(_save_surface_benchmark(".ppm", 100))
+
+
+@benchmark("display_modes[fn]")
+def bench_display_mode_fns(corpus):
+    from variety.plugins.builtin.display_modes.ResizingDisplayModesPlugin import (
+        ResizingDisplayModesPlugin,
+    )
+
+    # per-monitor renders in its fn, see bench_per_monitor_render
+    modes = [m for m in ResizingDisplayModesPlugin().display_modes() if m.id != "per-monitor"]
+
+    def run():
+        for img in corpus.images:
+            for mode in modes:
+                mode.fn(img)
+
+    return run
+
+
+@benchmark("display_modes[imagemagick]")
+def bench_display_mode_render(corpus):
+    from variety.plugins.builtin.display_modes.ResizingDisplayModesPlugin import (
+        ResizingDisplayModesPlugin,
+    )
+
+    if not shutil.which("convert"):
+        return None
+    modes = [m for m in ResizingDisplayModesPlugin().display_modes() if m.id != "per-monitor"]
+    target = os.path.join(corpus.root, "rendered.jpg")
+
+    def run():
+        for mode in modes:
+            data = mode.fn(corpus.images[0])
+            if data.imagemagick_cmd:
+                os.system("convert %s %s %s" % (corpus.images[0], data.imagemagick_cmd, target))
+
+    return run
+
+
+@benchmark("MonitorRenderer[3 monitors]")
+def bench_per_monitor_render(corpus):
+    from variety.DisplayGeometry import Layout, Monitor
+    from variety.MonitorRenderer import render_per_monitor
+    from variety.plugins.builtin.display_modes.ResizingDisplayModesPlugin import _per_monitor_cmd
+    from variety.Util import Util
+
+    if not shutil.which("convert"):
+        return None
+    # two 4K monitors around a portrait one
+    layout = Layout(
+        (
+            Monitor(0, 0, 3840, 2160, 1, True),
+            Monitor(3840, 0, 2160, 3840, 1, False),
+            Monitor(6000, 0, 3840, 2160, 1, False),
+        ),
+        9840,
+        3840,
+    )
+    image = corpus.images[0]
+    get_cmd = _per_monitor_cmd(Util.get_size(image))
+    target = os.path.join(corpus.root, "monitors.jpg")
+
+    def run():
+        render_per_monitor(image, layout, target, get_cmd, "-quality 95")
+
+    return run
+
+
+@benchmark("Util.write_metadata")
+def bench_write_metadata(corpus):
+    from variety.Util import Util
+
+    images = corpus.images[1::2][:10]
+
+    def run():
+        for i, img in enumerate(images):
+            Util.write_metadata(
+                img,
+                {
+                    "sourceType": "benchmark",
+                    "sourceURL": "https://example.com/%d" % i,
+                    "keywords": ["one", "two", "three"],
+                    "sfwRating": 100,
+                },
+            )
+
+    return run
+
+
+@benchmark("Util.read_metadata")
+def bench_read_metadata(corpus):
+    from variety.Util import Util
+
+    images = corpus.images[:10]
+
+    def run():
+        for img in images:
+            Util.read_metadata(img)
+
+    return run
+
+
+def time_benchmark(fn, repeat):
+    fn()  # warm up caches and lazy imports
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return {
+        "min_ms": round(min(times) * 1000, 2),
+        "median_ms": round(statistics.median(times) * 1000, 2),
+        "mean_ms": round(statistics.mean(times) * 1000, 2),
+        "repeat": repeat,
+    }
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for name, result in sorted(results.items()):
+        previous = baseline.get(name)
+        if not previous:
+            status = "new"
+        else:
+            ratio = result["median_ms"] / max(previous["median_ms"], 0.01)
+            status = "%+.0f%%" % ((ratio - 1) * 100)
+            if ratio > 1 + tolerance:
+                status += " REGRESSION"
+                regressions.append(name)
+        print("%-45s %10.2f ms  %s" % (name, result["median_ms"], status))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Variety benchmarks")
+    parser.add_argument("--filter", help="Only run benchmarks whose name contains this")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--images", type=int, default=30, help="Size of the image corpus")
+    parser.add_argument("--scale", type=float, default=0.5, help="Scale of the corpus images")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.25, help="Allowed slowdown vs baseline, 0.25 = 25%%"
+    )
+    args = parser.parse_args()
+
+    ensure_display()
+
+    from variety.profile import set_profile_path
+
+    root = tempfile.mkdtemp(prefix="variety-benchmarks-")
+    try:
+        set_profile_path(os.path.join(root, "profile"))
+        corpus = Corpus(os.path.join(root, "corpus"), args.images, args.scale)
+
+        results = {}
+        for name, setup in BENCHMARKS:
+            if args.filter and args.filter not in name:
+                continue
+            try:
+                fn = setup(corpus)
+            except Exception as e:
+                print("%-45s skipped: %s" % (name, e), file=sys.stderr)
+                continue
+            if fn is None:
+                print("%-45s skipped" % name, file=sys.stderr)
+                continue
+            results[name] = time_benchmark(fn, args.repeat)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    regressions = compare(results, baseline, args.tolerance)
+
+    if args.update_baseline or not baseline:
+        baseline.update(results)
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline + ".partial", "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        os.rename(args.baseline + ".partial", args.baseline)
+        print("Baseline written to %s" % args.baseline)
+    elif regressions:
+        print("%d benchmark(s) regressed: %s" % (len(regressions), ", ".join(regressions)))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
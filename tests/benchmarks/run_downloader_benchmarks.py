@@ -0,0 +1,308 @@
+#!/usr/bin/python3
+# -*- Mode: Python; coding: utf-8; indent-tabs-mode: nil; tab-width: 4 -*-
+### BEGIN LICENSE
+# Copyright (c) 2012, Peter Levi <peterlevi@peterlevi.com>
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 3, as published
+# by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranties of
+# MERCHANTABILITY, SATISFACTORY QUALITY, or FITNESS FOR A PARTICULAR
+# PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+### END LICENSE
+
+"""
+Offline benchmarks for the image source downloaders.
+
+Run from the project root:
+
+    python3 -m tests.benchmarks.run_downloader_benchmarks [--filter NAME] [--latency-ms 100]
+        [--bandwidth-kbps 500] [--output results.json]
+
+All requests made through Util.request go to a local HTTP server that answers with fixture API
+responses and synthetic images (see fixtures.py), so no network access is needed and the results
+are reproducible. For every downloader this measures:
+  - fill_queue: total time, the part of it spent fetching and the rest (parsing and filtering)
+  - download_one: end-to-end latency, including the queue refills, bytes per saved image and
+    bytes and requests on the wire per image
+  - concurrency: images per second with 1, 2, 4... downloaders running in parallel threads
+Use --latency-ms and --bandwidth-kbps to simulate slow links.
+"""
+
+import argparse
+import collections
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+from tests.benchmarks.fake_server import FakeServer, redirect_requests
+from tests.benchmarks.run_benchmarks import ensure_display, make_options
+
+UNTHROTTLED = {"max_downloads_per_hour": 1000000, "max_queue_fills_per_hour": 1000000}
+
+
+class BenchmarkVariety:
+    """Just enough of VarietyWindow for the downloaders"""
+
+    def __init__(self, root):
+        self.options = make_options(favorites_folder=os.path.join(root, "Favorites"))
+        self.banned = set()
+        self.server_options = collections.defaultdict(lambda: UNTHROTTLED)
+
+    def size_ok(self, width, height):
+        return True
+
+
+def _source_downloader(source_class, config):
+    def create(variety):
+        source = source_class()
+        source.set_variety(variety)
+        return source.create_downloader(config)
+
+    return create
+
+
+def _simple_downloader(downloader_class):
+    def create(variety):
+        downloader = downloader_class()
+        downloader.set_variety(variety)
+        return downloader
+
+    return create
+
+
+def get_downloader_factories():
+    from variety.FlickrDownloader import FlickrDownloader
+    from variety.plugins.builtin.downloaders.APODDownloader import APODDownloader
+    from variety.plugins.builtin.downloaders.BingDownloader import BingDownloader
+    from variety.plugins.builtin.downloaders.MediaRSSSource import MediaRSSSource
+    from variety.plugins.builtin.downloaders.RedditSource import RedditSource
+    from variety.plugins.builtin.downloaders.UnsplashDownloader import UnsplashDownloader
+    from variety.plugins.builtin.downloaders.WallhavenSource import WallhavenSource
+
+    return {
+        "flickr": lambda variety: FlickrDownloader(variety, "text:nature;"),
+        "wallhaven": _source_downloader(WallhavenSource, "nature"),
+        "reddit": _source_downloader(RedditSource, "https://www.reddit.com/r/EarthPorn/"),
+        "bing": _simple_downloader(BingDownloader),
+        "apod": _simple_downloader(APODDownloader),
+        "mediarss": _source_downloader(
+            MediaRSSSource,
+            "https://backend.deviantart.com/rss.xml?q=boost%3Apopular+leaves&type=deviation",
+        ),
+        "unsplash": _simple_downloader(UnsplashDownloader),
+    }
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100.0))]
+
+
+def bench_fill_queue(create, variety, folder, timer, repeat):
+    dl = create(variety)
+    dl.update_download_folder(folder)
+    dl.fill_queue()  # warm up lazy imports
+    totals, fetches = [], []
+    items = 0
+    for _ in range(repeat):
+        with timer.measure():
+            start = time.perf_counter()
+            items = len(dl.fill_queue() or [])
+            totals.append(time.perf_counter() - start)
+            fetches.append(timer.total)
+    return {
+        "items": items,
+        "fill_ms": round(statistics.median(totals) * 1000, 2),
+        "fetch_ms": round(statistics.median(fetches) * 1000, 2),
+        "parse_ms": round(statistics.median(t - f for t, f in zip(totals, fetches)) * 1000, 2),
+    }
+
+
+def bench_download_one(create, variety, folder, server, count):
+    dl = create(variety)
+    dl.update_download_folder(folder)
+    requests_before, bytes_before = server.get_stats()
+    latencies, sizes = [], []
+    for _ in range(count):
+        start = time.perf_counter()
+        f = dl.download_one()
+        latencies.append(time.perf_counter() - start)
+        if f:
+            sizes.append(os.path.getsize(f))
+    requests_after, bytes_after = server.get_stats()
+    downloaded = max(1, len(sizes))
+    return {
+        "downloaded": len(sizes),
+        "failed": count - len(sizes),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "image_bytes": int(statistics.mean(sizes)) if sizes else 0,
+        "wire_bytes_per_image": (bytes_after - bytes_before) // downloaded,
+        "requests_per_image": round((requests_after - requests_before) / downloaded, 2),
+    }
+
+
+def bench_concurrency(create, variety, folder, thread_counts, per_thread):
+    results = {}
+    for count in thread_counts:
+        downloaders = []
+        for i in range(count):
+            dl = create(variety)
+            dl.update_download_folder(os.path.join(folder, "%d-%d" % (count, i)))
+            downloaders.append(dl)
+        downloaded = []
+
+        def run(dl):
+            for _ in range(per_thread):
+                if dl.download_one():
+                    downloaded.append(1)
+
+        threads = [threading.Thread(target=run, args=(dl,)) for dl in downloaders]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - start
+        results[count] = round(len(downloaded) / elapsed, 2)
+    return results
+
+
+def print_results(results, thread_counts):
+    print(
+        "%-10s %6s %9s %9s %9s | %9s %9s %9s %9s %6s"
+        % (
+            "source",
+            "items",
+            "fill ms",
+            "fetch ms",
+            "parse ms",
+            "p50 ms",
+            "p95 ms",
+            "KB/image",
+            "wire KB",
+            "req",
+        )
+    )
+    for name, r in sorted(results.items()):
+        f, d = r["fill_queue"], r["download_one"]
+        print(
+            "%-10s %6d %9.2f %9.2f %9.2f | %9.2f %9.2f %9d %9d %6.2f%s"
+            % (
+                name,
+                f["items"],
+                f["fill_ms"],
+                f["fetch_ms"],
+                f["parse_ms"],
+                d["p50_ms"],
+                d["p95_ms"],
+                d["image_bytes"] // 1024,
+                d["wire_bytes_per_image"] // 1024,
+                d["requests_per_image"],
+                "  (%d failed)" % d["failed"] if d["failed"] else "",
+            )
+        )
+
+    print()
+    print("%-10s %s" % ("images/s", " ".join("%12s" % ("%d threads" % n) for n in thread_counts)))
+    for name, r in sorted(results.items()):
+        scaling = r["concurrency"]
+        single = scaling[thread_counts[0]] or 1
+        print(
+            "%-10s %s"
+            % (
+                name,
+                " ".join(
+                    "%12s" % ("%.1f (x%.1f)" % (scaling[n], scaling[n] / single))
+                    for n in thread_counts
+                ),
+            )
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Variety offline downloader benchmarks")
+    parser.add_argument("--filter", help="Only run downloaders whose name contains this")
+    parser.add_argument("--repeat", type=int, default=5, help="fill_queue calls to time")
+    parser.add_argument("--downloads", type=int, default=20, help="download_one calls to time")
+    parser.add_argument("--items", type=int, default=50, help="Images per API response")
+    parser.add_argument("--image-size", default="1920x1080", help="Size of the served images")
+    parser.add_argument("--latency-ms", type=float, default=0, help="Delay of every response")
+    parser.add_argument(
+        "--bandwidth-kbps", type=float, default=0, help="Per-connection bandwidth limit in KB/s"
+    )
+    parser.add_argument("--threads", default="1,2,4,8", help="Thread counts for the scaling runs")
+    parser.add_argument("--per-thread", type=int, default=5, help="Downloads per thread")
+    parser.add_argument("--output", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    # Unsplash sizes its requests after the primary display
+    ensure_display("tests.benchmarks.run_downloader_benchmarks")
+
+    # requests honors proxy settings from the environment, the local server must be reached directly
+    os.environ["no_proxy"] = ",".join(filter(None, [os.environ.get("no_proxy"), "127.0.0.1"]))
+
+    from variety.profile import set_profile_path
+
+    width, height = (int(x) for x in args.image_size.split("x"))
+    thread_counts = [int(x) for x in args.threads.split(",")]
+    server = FakeServer(
+        items=args.items,
+        image_size=(width, height),
+        latency_ms=args.latency_ms,
+        bandwidth_kbps=args.bandwidth_kbps,
+    ).start()
+
+    root = tempfile.mkdtemp(prefix="variety-downloader-benchmarks-")
+    results = {}
+    try:
+        set_profile_path(os.path.join(root, "profile"))
+        variety = BenchmarkVariety(root)
+        with redirect_requests(server) as timer:
+            for name, create in get_downloader_factories().items():
+                if args.filter and args.filter not in name:
+                    continue
+                folder = os.path.join(root, name)
+                try:
+                    results[name] = {
+                        "fill_queue": bench_fill_queue(
+                            create, variety, os.path.join(folder, "fill"), timer, args.repeat
+                        ),
+                        "download_one": bench_download_one(
+                            create, variety, os.path.join(folder, "one"), server, args.downloads
+                        ),
+                        "concurrency": bench_concurrency(
+                            create,
+                            variety,
+                            os.path.join(folder, "concurrency"),
+                            thread_counts,
+                            args.per_thread,
+                        ),
+                    }
+                except Exception as e:
+                    print("%-10s failed: %s" % (name, e), file=sys.stderr)
+    finally:
+        server.stop()
+        shutil.rmtree(root, ignore_errors=True)
+
+    print_results(results, thread_counts)
+
+    if args.output:
+        with open(args.output + ".partial", "w") as f:
+            json.dump({"settings": vars(args), "results": results}, f, indent=2, sort_keys=True)
+        os.rename(args.output + ".partial", args.output)
+        print("Results written to %s" % args.output)
+
+
+if __name__ == "__main__":
+    main()
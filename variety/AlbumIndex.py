@@ -0,0 +1,144 @@
+# -*- Mode: Python; coding: utf-8; indent-tabs-mode: nil; tab-width: 4 -*-
+### BEGIN LICENSE
+# Copyright (c) 2012, Peter Levi <peterlevi@peterlevi.com>
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 3, as published
+# by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranties of
+# MERCHANTABILITY, SATISFACTORY QUALITY, or FITNESS FOR A PARTICULAR
+# PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+### END LICENSE
+
+import logging
+import os
+import threading
+import time
+
+from variety.Util import Util
+
+logger = logging.getLogger("variety")
+
+
+class AlbumIndex:
+    """
+    The sorted list of images in an album folder, built lazily on first use.
+    Indexes are cached per (path, sort order) across config reloads and rebuilt only when the
+    modification time of one of the album's directories changes.
+    """
+
+    BY_FILENAME = "filename"
+    BY_DATE = "date"
+
+    # Directory mtimes are re-checked at most this often (seconds)
+    VALIDATE_INTERVAL = 60
+    MAX_FILES = 10000
+
+    _cache = {}
+    _cache_lock = threading.Lock()
+
+    def __init__(self, path, order):
+        self.path = os.path.normpath(path)
+        self.order = order
+        self.lock = threading.Lock()
+        self.images = None
+        self.positions = None
+        self.dir_mtimes = None
+        self.validated_at = 0
+
+    @staticmethod
+    def get(path, order):
+        """Returns the shared, possibly not yet built index for the given album"""
+        key = (os.path.normpath(path), order)
+        with AlbumIndex._cache_lock:
+            index = AlbumIndex._cache.get(key)
+            if index is None:
+                index = AlbumIndex(path, order)
+                AlbumIndex._cache[key] = index
+            return index
+
+    @staticmethod
+    def retain_only(indexes):
+        """Drops the cached indexes of albums that are no longer configured"""
+        with AlbumIndex._cache_lock:
+            keep = {(index.path, index.order) for index in indexes}
+            for key in list(AlbumIndex._cache.keys()):
+                if key not in keep:
+                    del AlbumIndex._cache[key]
+
+    def _is_stale(self):
+        if self.images is None:
+            return True
+        if time.time() - self.validated_at < AlbumIndex.VALIDATE_INTERVAL:
+            return False
+        self.validated_at = time.time()
+        for folder, mtime in self.dir_mtimes.items():
+            try:
+                if os.stat(folder).st_mtime != mtime:
+                    return True
+            except OSError:
+                return True
+        return False
+
+    def _build(self):
+        start = time.time()
+        dir_mtimes = {}
+        found = []
+        for root, subfolders, files in os.walk(self.path, followlinks=True):
+            try:
+                dir_mtimes[root] = os.stat(root).st_mtime
+            except OSError:
+                continue
+            for filename in files:
+                path = os.path.join(root, filename)
+                if len(found) < AlbumIndex.MAX_FILES and Util.is_image(path):
+                    found.append(path)
+
+        if self.order == AlbumIndex.BY_DATE:
+            keyed = []
+            for path in found:
+                try:
+                    keyed.append((os.path.getmtime(path), path))
+                except OSError:
+                    pass
+            images = tuple(path for _mtime, path in sorted(keyed))
+        else:
+            images = tuple(sorted(found))
+
+        self.images = images
+        self.positions = {path: i for i, path in enumerate(images)}
+        self.dir_mtimes = dir_mtimes
+        self.validated_at = time.time()
+        logger.info(
+            lambda: "Indexed album %s: %d images, %d folders in %.3fs"
+            % (self.path, len(images), len(dir_mtimes), time.time() - start)
+        )
+
+    def _get(self):
+        with self.lock:
+            if self._is_stale():
+                self._build()
+            return self.images, self.positions
+
+    def get_images(self):
+        return self._get()[0]
+
+    def contains_path(self, path):
+        path = os.path.normpath(path)
+        return path == self.path or path.startswith(self.path + os.sep)
+
+    def first(self):
+        images = self.get_images()
+        return images[0] if images else None
+
+    def next_after(self, image):
+        """Returns the image following the given one in the album, or None"""
+        images, positions = self._get()
+        index = positions.get(os.path.normpath(image))
+        if index is not None and index < len(images) - 1:
+            return images[index + 1]
+        return None
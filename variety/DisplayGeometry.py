@@ -0,0 +1,135 @@
+# -*- Mode: Python; coding: utf-8; indent-tabs-mode: nil; tab-width: 4 -*-
+### BEGIN LICENSE
+# Copyright (c) 2012, Peter Levi <peterlevi@peterlevi.com>
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 3, as published
+# by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranties of
+# MERCHANTABILITY, SATISFACTORY QUALITY, or FITNESS FOR A PARTICULAR
+# PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+### END LICENSE
+
+import collections
+import logging
+import threading
+
+logger = logging.getLogger("variety")
+
+Monitor = collections.namedtuple("Monitor", ["x", "y", "width", "height", "scale", "primary"])
+
+
+class Layout(collections.namedtuple("Layout", ["monitors", "width", "height"])):
+    """
+    Immutable snapshot of the monitor layout. width and height are the size of the whole screen
+    (the bounding box of all monitors), in application pixels.
+    """
+
+    def get_primary(self):
+        for monitor in self.monitors:
+            if monitor.primary:
+                return monitor
+        return self.monitors[0] if self.monitors else None
+
+
+class DisplayGeometry:
+    """
+    Caches the monitor layout, so that the wallpaper rendering code can ask for display sizes from
+    any thread without querying Gdk every time. Once watch() is called the cached layout is
+    refreshed from Gdk's monitor signals, and listeners are told when it actually changed.
+    Until then every call reads the layout from Gdk, as there is no way to know it is current.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.layout = None
+        self.watching = False
+        self.listeners = []
+
+    def watch(self):
+        """Subscribes to the Gdk monitor signals. Must be called on the Gtk thread."""
+        from gi.repository import Gdk  # pylint: disable=E0611
+
+        if self.watching:
+            return
+        display = Gdk.Display.get_default()
+        display.connect("monitor-added", self._on_changed)
+        display.connect("monitor-removed", self._on_changed)
+        screen = Gdk.Screen.get_default()
+        # emitted when the geometry or scale factor of a monitor changes
+        screen.connect("monitors-changed", self._on_changed)
+        screen.connect("size-changed", self._on_changed)
+        with self.lock:
+            self.layout = DisplayGeometry.read_layout()
+            self.watching = True
+        logger.info(lambda: "Display layout: %s" % (self.layout,))
+
+    def add_listener(self, listener):
+        """listener(layout) is called on the Gtk thread whenever the monitor layout changes"""
+        self.listeners.append(listener)
+
+    @staticmethod
+    def read_layout():
+        from gi.repository import Gdk  # pylint: disable=E0611
+
+        display = Gdk.Display.get_default()
+        primary = display.get_primary_monitor()
+        monitors = []
+        for i in range(display.get_n_monitors()):
+            monitor = display.get_monitor(i)
+            geometry = monitor.get_geometry()
+            monitors.append(
+                Monitor(
+                    geometry.x,
+                    geometry.y,
+                    geometry.width,
+                    geometry.height,
+                    monitor.get_scale_factor(),
+                    monitor == primary,
+                )
+            )
+        screen = Gdk.Screen.get_default()
+        return Layout(tuple(monitors), screen.get_width(), screen.get_height())
+
+    def _on_changed(self, *args):
+        try:
+            layout = DisplayGeometry.read_layout()
+        except Exception:
+            logger.exception(lambda: "Could not read the display layout")
+            return
+
+        with self.lock:
+            if layout == self.layout:
+                return
+            self.layout = layout
+
+        logger.info(lambda: "Display layout changed: %s" % (layout,))
+        for listener in list(self.listeners):
+            try:
+                listener(layout)
+            except Exception:
+                logger.exception(lambda: "Display layout listener %s failed" % listener)
+
+    def get_layout(self):
+        if not self.watching:
+            return DisplayGeometry.read_layout()
+        return self.layout
+
+    def get_primary_size(self, hidpi_scaled=True):
+        layout = self.get_layout()
+        monitor = layout.get_primary()
+        if not monitor:
+            return layout.width, layout.height
+        scale = monitor.scale if hidpi_scaled else 1
+        return monitor.width * scale, monitor.height * scale
+
+    def get_total_size(self):
+        layout = self.get_layout()
+        return layout.width, layout.height
+
+
+display_geometry = DisplayGeometry()
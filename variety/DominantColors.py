@@ -16,16 +16,20 @@
 
 import sys
 
-from PIL import Image, ImageFilter
+from variety.ImageLoader import ImageLoader
+from variety.LazyModule import LazyModule
+
+Image = LazyModule("PIL.Image")
+ImageFilter = LazyModule("PIL.ImageFilter")
 
 
 class DominantColors:
     def __init__(self, image_name, only_size_needed=True):
         self.imageName = image_name
-        self.original = Image.open(image_name)
+        self.original = Image.open(image_name)  # lazy, only the header is parsed here
 
         if not only_size_needed:
-            self.resized = self.original.resize((50, 50))
+            self.resized = ImageLoader.open_reduced(image_name, (50, 50)).resize((50, 50))
             # self.resized = self.resized.filter(ImageFilter.BLUR)
 
             # load image data
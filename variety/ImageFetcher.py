@@ -17,9 +17,9 @@ import logging
 import os
 import urllib.parse
 
-from PIL import Image
 from requests.exceptions import HTTPError
 
+from variety.ImageLoader import ImageLoader
 from variety.Util import Util, _
 
 logger = logging.getLogger("variety")
@@ -112,13 +112,13 @@ class ImageFetcher:
                 Util.request_write_to(r, f)
 
             try:
-                img = Image.open(local_filepath_partial)
+                width, height = ImageLoader.get_size(local_filepath_partial)
             except Exception:
                 progress_reporter(_("Not an image"), url)
                 Util.safe_unlink(local_filepath_partial)
                 return None
 
-            if img.size[0] < 400 or img.size[1] < 400:
+            if width < 400 or height < 400:
                 # too small - delete and do not use
                 progress_reporter(_("Image too small, ignoring it"), url)
                 Util.safe_unlink(local_filepath_partial)
@@ -0,0 +1,192 @@
+# -*- Mode: Python; coding: utf-8; indent-tabs-mode: nil; tab-width: 4 -*-
+### BEGIN LICENSE
+# Copyright (c) 2012, Peter Levi <peterlevi@peterlevi.com>
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 3, as published
+# by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranties of
+# MERCHANTABILITY, SATISFACTORY QUALITY, or FITNESS FOR A PARTICULAR
+# PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+### END LICENSE
+
+import logging
+
+from variety.LazyModule import LazyModule
+
+from gi.repository import GdkPixbuf, GLib
+
+Image = LazyModule("PIL.Image")
+
+logger = logging.getLogger("variety")
+
+# PIL's reduce() does not support palette and bilevel images
+REDUCIBLE_MODES = {"L", "LA", "RGB", "RGBA", "RGBa", "La", "I", "F"}
+
+
+class ImageLoader:
+    """
+    Loads images at the smallest resolution the caller actually needs.
+    Dimension queries only parse the image headers, analysis reads use JPEG draft mode
+    (DCT scaling while decoding) or PIL reduce(), and pixbufs are loaded directly at scale.
+    Every decoding call logs the number of decoded bytes at DEBUG level.
+    """
+
+    @staticmethod
+    def _log_decoded(what, filename, size, bands):
+        logger.debug(
+            lambda: "ImageLoader.%s: decoded %dx%d, %d bytes: %s"
+            % (what, size[0], size[1], size[0] * size[1] * bands, filename)
+        )
+
+    @staticmethod
+    def get_size(filename):
+        """Returns (width, height) by parsing the image header only"""
+        format, image_width, image_height = GdkPixbuf.Pixbuf.get_file_info(filename)
+        if not format:
+            raise Exception("Not an image or unsupported image format")
+        else:
+            return image_width, image_height
+
+    @staticmethod
+    def open_reduced(filename, size):
+        """
+        Opens the image with PIL and decodes it at the smallest resolution that is still at least
+        size=(width, height). The result should be further resized by the caller if an exact size is needed.
+        """
+        img = Image.open(filename)
+        original_size = img.size
+        if img.format == "JPEG":
+            img.draft(img.mode, size)
+        img.load()
+        ImageLoader._log_decoded("open_reduced", filename, img.size, len(img.getbands()))
+
+        factor = min(img.size[0] // max(1, size[0]), img.size[1] // max(1, size[1]))
+        if factor >= 2 and img.mode in REDUCIBLE_MODES:
+            img = img.reduce(factor)
+
+        logger.debug(
+            lambda: "ImageLoader.open_reduced: %s -> %s for requested %s: %s"
+            % (original_size, img.size, size, filename)
+        )
+        return img
+
+    @staticmethod
+    def open_at_size(filename, size):
+        """
+        Opens the image with PIL, decoded at reduced resolution by open_reduced and resized to
+        exactly size=(width, height), without preserving the aspect ratio
+        """
+        img = ImageLoader.open_reduced(filename, size)
+        if img.size != tuple(size):
+            img = img.resize(tuple(size), Image.BILINEAR)
+        return img
+
+    @staticmethod
+    def load_pixbuf_at_scale(filename, width, height, preserve_aspect_ratio=True):
+        """Loads a pixbuf scaled while decoding (the GdkPixbuf JPEG loader uses DCT scaling)"""
+        pixbuf = GdkPixbuf.Pixbuf.new_from_file_at_scale(
+            filename, width, height, preserve_aspect_ratio
+        )
+        ImageLoader._log_decoded(
+            "load_pixbuf_at_scale",
+            filename,
+            (pixbuf.get_width(), pixbuf.get_height()),
+            pixbuf.get_n_channels(),
+        )
+        return pixbuf
+
+    @staticmethod
+    def load_thumbnail_pixbuf(filename, width, height):
+        """
+        Loads a pixbuf of the given file, fitted within width x height.
+        JPEGs are decoded with PIL in draft mode, so libjpeg does the downscaling while decoding
+        and never materializes the full-resolution image. Other formats go through GdkPixbuf.
+        """
+        if filename.lower().endswith((".jpg", ".jpeg")):
+            try:
+                with Image.open(filename) as img:
+                    img.draft("RGB", (width, height))
+                    img = img.convert("RGB")
+                    ImageLoader._log_decoded("load_thumbnail_pixbuf", filename, img.size, 3)
+                    img.thumbnail((width, height), Image.BILINEAR)
+                    w, h = img.size
+                    return GdkPixbuf.Pixbuf.new_from_bytes(
+                        GLib.Bytes.new(img.tobytes()),
+                        GdkPixbuf.Colorspace.RGB,
+                        False,
+                        8,
+                        w,
+                        h,
+                        w * 3,
+                    )
+            except Exception:
+                logger.debug(
+                    lambda: "Draft-mode decoding failed for %s, using GdkPixbuf" % filename
+                )
+        return ImageLoader.load_pixbuf_at_scale(filename, width, height)
+
+    @staticmethod
+    def count_gif_frames(filename, stop_at=None):
+        """
+        Counts the frames of a GIF by walking its block structure, without decoding any image data.
+        Stops counting once stop_at frames are found.
+        """
+        with open(filename, "rb") as f:
+            header = f.read(13)
+            if len(header) < 13 or header[:3] != b"GIF":
+                raise ValueError("Not a GIF file: %s" % filename)
+            flags = header[10]
+            if flags & 0x80:
+                f.seek(3 * (2 ** ((flags & 0x07) + 1)), 1)
+
+            def skip_sub_blocks():
+                while True:
+                    length = f.read(1)
+                    if not length or length[0] == 0:
+                        return
+                    f.seek(length[0], 1)
+
+            frames = 0
+            while True:
+                block = f.read(1)
+                if not block or block == b"\x3b":  # EOF or trailer
+                    return frames
+                elif block == b"\x21":  # extension: label, then sub-blocks
+                    f.read(1)
+                    skip_sub_blocks()
+                elif block == b"\x2c":  # image descriptor
+                    frames += 1
+                    if stop_at and frames >= stop_at:
+                        return frames
+                    descriptor = f.read(9)
+                    if len(descriptor) < 9:
+                        return frames
+                    local_flags = descriptor[8]
+                    if local_flags & 0x80:
+                        f.seek(3 * (2 ** ((local_flags & 0x07) + 1)), 1)
+                    f.read(1)  # LZW minimum code size
+                    skip_sub_blocks()
+                else:
+                    raise ValueError("Unexpected GIF block %r in %s" % (block, filename))
+
+    @staticmethod
+    def is_animated_gif(filename):
+        if not filename.lower().endswith(".gif"):
+            return False
+
+        try:
+            return ImageLoader.count_gif_frames(filename, stop_at=2) > 1
+        except ValueError:
+            # fallback to PIL for GIFs with an unexpected structure
+            with Image.open(filename) as gif:
+                try:
+                    gif.seek(1)
+                except EOFError:
+                    return False
+                else:
+                    return True
@@ -0,0 +1,69 @@
+# -*- Mode: Python; coding: utf-8; indent-tabs-mode: nil; tab-width: 4 -*-
+### BEGIN LICENSE
+# Copyright (c) 2012, Peter Levi <peterlevi@peterlevi.com>
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 3, as published
+# by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranties of
+# MERCHANTABILITY, SATISFACTORY QUALITY, or FITNESS FOR A PARTICULAR
+# PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+### END LICENSE
+
+import importlib
+import logging
+import threading
+import time
+
+logger = logging.getLogger("variety")
+
+
+class LazyModule:
+    """
+    Stands in for a heavy module that is only needed on specific code paths
+    (bs4 and lxml for scraping, cairo and PangoCairo for quotes, PIL for image analysis).
+    The module is imported on first attribute access, e.g.:
+
+        Image = LazyModule("PIL.Image")
+        ...
+        Image.open(filename)  # PIL is imported here
+    """
+
+    def __init__(self, name):
+        self.__dict__["_name"] = name
+        self.__dict__["_module"] = None
+        self.__dict__["_lock"] = threading.Lock()
+
+    def _load(self):
+        module = self.__dict__["_module"]
+        if module is None:
+            with self.__dict__["_lock"]:
+                module = self.__dict__["_module"]
+                if module is None:
+                    start = time.perf_counter()
+                    module = importlib.import_module(self.__dict__["_name"])
+                    self.__dict__["_module"] = module
+                    logger.debug(
+                        lambda: "LazyModule: imported %s in %.1f ms"
+                        % (self.__dict__["_name"], (time.perf_counter() - start) * 1000)
+                    )
+        return module
+
+    def is_loaded(self):
+        return self.__dict__["_module"] is not None
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+    def __repr__(self):
+        return "<LazyModule %s%s>" % (
+            self.__dict__["_name"],
+            "" if self.is_loaded() else " (not loaded)",
+        )
@@ -0,0 +1,178 @@
+# -*- Mode: Python; coding: utf-8; indent-tabs-mode: nil; tab-width: 4 -*-
+### BEGIN LICENSE
+# Copyright (c) 2012, Peter Levi <peterlevi@peterlevi.com>
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 3, as published
+# by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranties of
+# MERCHANTABILITY, SATISFACTORY QUALITY, or FITNESS FOR A PARTICULAR
+# PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+### END LICENSE
+
+import bisect
+import contextlib
+import functools
+import json
+import logging
+import threading
+import time
+
+logger = logging.getLogger("variety")
+
+
+class Histogram:
+    """Latency histogram with fixed millisecond buckets"""
+
+    BUCKETS_MS = [1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000]
+
+    def __init__(self):
+        self.counts = [0] * (len(Histogram.BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, ms):
+        self.counts[bisect.bisect_left(Histogram.BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+
+    def percentile(self, p):
+        """Upper bound of the bucket containing the p-th percentile"""
+        if not self.count:
+            return 0
+        rank = p / 100.0 * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return Histogram.BUCKETS_MS[i] if i < len(Histogram.BUCKETS_MS) else self.max
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total / self.count, 1) if self.count else 0,
+            "p50_ms": self.percentile(50),
+            "p95_ms": self.percentile(95),
+            "max_ms": round(self.max, 1),
+        }
+
+
+class Metrics:
+    """
+    In-process registry of counters, gauges and latency histograms.
+    Labels are appended to the metric name, e.g. "downloads[wallhaven]".
+    Gauges are callables evaluated when a snapshot is taken.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+
+    @staticmethod
+    def _key(name, label):
+        return name if label is None else "%s[%s]" % (name, label)
+
+    def inc(self, name, value=1, label=None):
+        key = Metrics._key(name, label)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def cache_access(self, name, hit):
+        """Counts a hit or a miss of the given cache, the snapshot contains the hit rate"""
+        self.inc(name + ".hits" if hit else name + ".misses")
+
+    def register_gauge(self, name, fn, label=None):
+        with self.lock:
+            self.gauges[Metrics._key(name, label)] = fn
+
+    def observe(self, name, seconds, label=None):
+        key = Metrics._key(name, label)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(seconds * 1000)
+
+    @contextlib.contextmanager
+    def timer(self, name, label=None):
+        """Context manager that records the wall time of the enclosed block in a histogram"""
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.observe(name, time.time() - start, label)
+
+    def timed(self, name, label=None):
+        """Decorator that records the wall time of every call of the decorated function"""
+
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.timer(name, label):
+                    return fn(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def snapshot(self):
+        with self.lock:
+            counters = dict(self.counters)
+            gauges = dict(self.gauges)
+            histograms = {key: h.to_dict() for key, h in self.histograms.items()}
+
+        gauge_values = {}
+        for key, fn in gauges.items():
+            try:
+                gauge_values[key] = fn()
+            except Exception:
+                logger.exception(lambda: "Could not evaluate gauge %s" % key)
+
+        hit_rates = {}
+        for key in counters:
+            if key.endswith(".hits"):
+                name = key[: -len(".hits")]
+                hits = counters[key]
+                total = hits + counters.get(name + ".misses", 0)
+                hit_rates[name] = round(hits / total, 3) if total else 0
+
+        return {
+            "uptime_seconds": int(time.time() - self.started),
+            "counters": counters,
+            "gauges": gauge_values,
+            "cache_hit_rates": hit_rates,
+            "latencies": histograms,
+        }
+
+    def format(self, as_json=False):
+        snapshot = self.snapshot()
+        if as_json:
+            return json.dumps(snapshot, indent=2, sort_keys=True)
+
+        lines = ["Uptime: %ds" % snapshot["uptime_seconds"]]
+        for section in ("counters", "gauges", "cache_hit_rates"):
+            lines.append("")
+            lines.append(section.replace("_", " ").capitalize() + ":")
+            for key, value in sorted(snapshot[section].items()):
+                lines.append("  %-50s %s" % (key, value))
+        lines.append("")
+        lines.append("Latencies:")
+        for key, h in sorted(snapshot["latencies"].items()):
+            lines.append(
+                "  %-50s count=%d avg=%.1fms p50<=%sms p95<=%sms max=%.1fms"
+                % (key, h["count"], h["avg_ms"], h["p50_ms"], h["p95_ms"], h["max_ms"])
+            )
+        return "\n".join(lines)
+
+
+metrics = Metrics()
@@ -0,0 +1,108 @@
+# -*- Mode: Python; coding: utf-8; indent-tabs-mode: nil; tab-width: 4 -*-
+### BEGIN LICENSE
+# Copyright (c) 2012, Peter Levi <peterlevi@peterlevi.com>
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 3, as published
+# by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranties of
+# MERCHANTABILITY, SATISFACTORY QUALITY, or FITNESS FOR A PARTICULAR
+# PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+### END LICENSE
+
+import logging
+import os
+import shlex
+import shutil
+import subprocess
+import tempfile
+
+from variety.Tracer import tracer
+
+logger = logging.getLogger("variety")
+
+
+def get_outputs(layout):
+    """
+    Returns (canvas_width, canvas_height, [(x, y, width, height) per monitor]) in device pixels,
+    for a canvas that covers all monitors and is used by the desktop's "spanned" mode.
+    """
+    primary = layout.get_primary()
+    scale = primary.scale if primary else 1
+    min_x = min([m.x for m in layout.monitors] or [0])
+    min_y = min([m.y for m in layout.monitors] or [0])
+    outputs = [
+        ((m.x - min_x) * scale, (m.y - min_y) * scale, m.width * scale, m.height * scale)
+        for m in layout.monitors
+    ]
+    return layout.width * scale, layout.height * scale, outputs
+
+
+def render_per_monitor(filename, layout, target_file, get_cmd, output_options="", timeout=60):
+    """
+    Renders filename separately for every monitor and stitches the results into target_file.
+
+    The per-monitor convert processes run in parallel, and monitors of the same size are rendered
+    only once.
+    :param get_cmd: get_cmd(width, height) returns the ImageMagick options that turn the image into
+    one of size width x height
+    :param output_options: ImageMagick options for writing target_file, e.g. its JPEG quality
+    :return: True on success
+    """
+    canvas_w, canvas_h, outputs = get_outputs(layout)
+    sizes = sorted(set((w, h) for _x, _y, w, h in outputs))
+    output = shlex.split(output_options) + [target_file]
+    if len(outputs) == 1 and outputs[0] == (0, 0, canvas_w, canvas_h):
+        # a single monitor covering the whole screen, no stitching needed
+        size = canvas_w, canvas_h
+        return _run(_convert_cmd(filename, get_cmd(*size), size, output), timeout)
+
+    tmp = tempfile.mkdtemp(prefix="variety-monitors-")
+    try:
+        # the parts are kept lossless in ImageMagick's own format, only the final canvas is encoded
+        parts = {size: os.path.join(tmp, "%dx%d.miff" % size) for size in sizes}
+        processes = []
+        for size, part in parts.items():
+            cmd = _convert_cmd(filename, get_cmd(*size), size, [part])
+            logger.info(lambda: "Per-monitor render cmd: " + " ".join(cmd))
+            processes.append(subprocess.Popen(cmd))
+        tracer.annotate(spawned_process="convert", monitor_renders=len(processes))
+        if not all([_wait(p, timeout) for p in processes]):
+            return False
+
+        cmd = ["convert", "-size", "%dx%d" % (canvas_w, canvas_h), "xc:black"]
+        for x, y, w, h in outputs:
+            cmd += [parts[(w, h)], "-geometry", "+%d+%d" % (x, y), "-composite"]
+        return _run(cmd + output, timeout)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def _convert_cmd(filename, imagemagick_cmd, size, output):
+    # zoom commands only guarantee to cover the size, crop so the part does not spill over
+    extent = ["-gravity", "center", "-extent", "%dx%d" % size]
+    return ["convert", filename] + shlex.split(imagemagick_cmd) + extent + output
+
+
+def _run(cmd, timeout):
+    return _wait(subprocess.Popen(cmd), timeout)
+
+
+def _wait(process, timeout):
+    try:
+        result = process.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+        logger.warning(lambda: "ImageMagick timed out, killed: %s" % process.args)
+        return False
+    if result != 0:
+        logger.warning(
+            lambda: "Could not execute convert command. Missing ImageMagick? Resultcode: %d"
+            % result
+        )
+    return result == 0
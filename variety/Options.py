@@ -121,6 +121,44 @@ class Options:
             except Exception:
                 pass
 
+            try:
+                wallpaper_setter = config["wallpaper_setter"].lower()
+                if wallpaper_setter in ["auto", "helper", "script"]:
+                    self.wallpaper_setter = wallpaper_setter
+            except Exception:
+                pass
+
+            try:
+                self.set_wallpaper_script_hook = (
+                    config["set_wallpaper_script_hook"].lower() in TRUTH_VALUES
+                )
+            except Exception:
+                pass
+
+            try:
+                self.render_cache_size = max(0, int(config["render_cache_size"]))
+            except Exception:
+                pass
+
+            try:
+                render_output_format = config["render_output_format"].lower()
+                if render_output_format in ["jpg", "png", "bmp"]:
+                    self.render_output_format = render_output_format
+            except Exception:
+                pass
+
+            try:
+                self.render_output_quality = max(1, min(100, int(config["render_output_quality"])))
+            except Exception:
+                pass
+
+            try:
+                self.render_lossless_intermediates = (
+                    config["render_lossless_intermediates"].lower() in TRUTH_VALUES
+                )
+            except Exception:
+                pass
+
             try:
                 self.download_folder = os.path.expanduser(config["download_folder"])
             except Exception:
@@ -629,6 +667,12 @@ class Options:
 
         self.set_wallpaper_script = os.path.join(get_profile_path(), "scripts", "set_wallpaper")
         self.get_wallpaper_script = os.path.join(get_profile_path(), "scripts", "get_wallpaper")
+        self.wallpaper_setter = "auto"
+        self.set_wallpaper_script_hook = False
+        self.render_cache_size = 200
+        self.render_output_format = "jpg"
+        self.render_output_quality = 95
+        self.render_lossless_intermediates = True
 
         self.download_folder = os.path.join(get_profile_path(), "Downloaded")
         self.download_preference_ratio = 0.9
@@ -748,6 +792,12 @@ class Options:
 
             config["set_wallpaper_script"] = Util.collapseuser(self.set_wallpaper_script)
             config["get_wallpaper_script"] = Util.collapseuser(self.get_wallpaper_script)
+            config["wallpaper_setter"] = self.wallpaper_setter
+            config["set_wallpaper_script_hook"] = str(self.set_wallpaper_script_hook)
+            config["render_cache_size"] = str(self.render_cache_size)
+            config["render_output_format"] = self.render_output_format
+            config["render_output_quality"] = str(self.render_output_quality)
+            config["render_lossless_intermediates"] = str(self.render_lossless_intermediates)
 
             config["download_folder"] = Util.collapseuser(self.download_folder)
             config["download_preference_ratio"] = str(self.download_preference_ratio)
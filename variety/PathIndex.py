@@ -0,0 +1,67 @@
+# -*- Mode: Python; coding: utf-8; indent-tabs-mode: nil; tab-width: 4 -*-
+### BEGIN LICENSE
+# Copyright (c) 2012, Peter Levi <peterlevi@peterlevi.com>
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 3, as published
+# by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranties of
+# MERCHANTABILITY, SATISFACTORY QUALITY, or FITNESS FOR A PARTICULAR
+# PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+### END LICENSE
+
+import os
+
+
+class PathIndex:
+    """
+    Trie on path components that maps files to the folders (or exact files) containing them.
+    Every entry has a priority, and lookup returns the value of the matching entry with the lowest
+    priority, in time proportional to the depth of the path rather than the number of entries.
+    A folder matches the files below it, not itself, like a startswith(Util.folderpath(folder))
+    check.
+    """
+
+    def __init__(self):
+        self.root = {}
+
+    @staticmethod
+    def _components(path):
+        return [c for c in os.path.normpath(path).split("/") if c]
+
+    def add(self, path, value, priority=0, exact=False):
+        """
+        :param exact: match only path itself, not the files below it
+        """
+        node = self.root
+        for component in PathIndex._components(path):
+            node = node.setdefault(component, {})
+        # the other keys are path components, which never contain "/"
+        key = "/exact" if exact else "/below"
+        if key not in node or priority < node[key][0]:
+            node[key] = (priority, value)
+
+    def lookup(self, path):
+        matches = []
+        node = self.root
+        for component in PathIndex._components(path):
+            matches.append(node.get("/below"))
+            node = node.get(component)
+            if node is None:
+                break
+        else:
+            matches.append(node.get("/exact"))
+        matches = [m for m in matches if m]
+        return min(matches, key=lambda m: m[0])[1] if matches else None
+
+    @staticmethod
+    def of_folders(folders):
+        """Returns an index in which every file under one of the folders maps to True"""
+        index = PathIndex()
+        for folder in folders:
+            index.add(folder, True)
+        return index
@@ -14,54 +14,131 @@
 # with this program.  If not, see <http://www.gnu.org/licenses/>.
 ### END LICENSE
 
+import collections
+import logging
+import math
 import threading
+from concurrent.futures import ThreadPoolExecutor
 
-import cairo
-from PIL import Image
-
+from variety.ImageLoader import ImageLoader
+from variety.LazyModule import LazyModule
+from variety.Tracer import tracer
 from variety.Util import Util
 
 # fmt: off
 import gi  # isort:skip
 gi.require_version("PangoCairo", "1.0")
-from gi.repository import Gdk, GdkPixbuf, GObject, Pango, PangoCairo  # isort:skip
+from gi.repository import Pango  # isort:skip
 # fmt: on
 
+# cairo, PangoCairo and PIL are only needed once a quote is rendered
+cairo = LazyModule("cairo")
+PangoCairo = LazyModule("gi.repository.PangoCairo")
+Image = LazyModule("PIL.Image")
+
+logger = logging.getLogger("variety")
+
 
 class QuoteWriter:
+    # Pango layouts of the most recent quotes, see get_layouts
+    LAYOUT_CACHE_SIZE = 16
+
+    # rendered quote boxes, see get_overlay - a full-width box is several megabytes at 4K
+    OVERLAY_CACHE_SIZE = 4
+
+    layouts = collections.OrderedDict()
+    layouts_lock = threading.Lock()
+    overlays = collections.OrderedDict()
+    overlays_lock = threading.Lock()
+    executor = None
+    executor_lock = threading.Lock()
+
     @staticmethod
-    def write_quote(quote, author, infile, outfile, options=None):
-        done_event = threading.Event()
-        exception = [None]
+    def get_executor():
+        # Quotes are rendered offscreen with cairo and PangoCairo, which needs no Gtk, but Pango
+        # keeps a font map per thread: a single render thread keeps the fonts and layouts warm.
+        with QuoteWriter.executor_lock:
+            if not QuoteWriter.executor:
+                QuoteWriter.executor = ThreadPoolExecutor(1, thread_name_prefix="QuoteWriter")
+            return QuoteWriter.executor
 
+    @staticmethod
+    def write_quote(quote, author, infile, outfile, options=None, quality=100):
         def go():
-            try:
-                w, h = Util.get_scaled_size(infile)
-                surface = QuoteWriter.load_cairo_surface(infile, w, h)
-                QuoteWriter.write_quote_on_surface(surface, quote, author, options)
-                QuoteWriter.save_cairo_surface(surface, outfile)
-            except Exception as e:
-                exception[0] = e
-            finally:
-                done_event.set()
-
-        Util.add_mainloop_task(go)
-        done_event.wait()
-        if exception[0]:
-            raise exception[0]  # pylint: disable=raising-bad-type
+            w, h = Util.get_scaled_size(infile)
+            surface = QuoteWriter.load_cairo_surface(infile, w, h)
+            QuoteWriter.write_quote_on_surface(surface, quote, author, options)
+            QuoteWriter.save_cairo_surface(surface, outfile, quality)
+
+        with tracer.span("write_quote", cat="quote"):
+            QuoteWriter.get_executor().submit(go).result()
+
+    @staticmethod
+    def load_image(filename, w, h):
+        try:
+            # JPEGs are decoded at reduced resolution, close to the size of the screen
+            return ImageLoader.open_at_size(filename, (w, h))
+        except Exception:
+            logger.debug(lambda: "PIL could not load %s, using GdkPixbuf" % filename)
+        # pylint: disable=no-member
+        pixbuf = ImageLoader.load_pixbuf_at_scale(filename, w, h, False)
+        size = pixbuf.get_width(), pixbuf.get_height()
+        mode = "RGBA" if pixbuf.get_has_alpha() else "RGB"
+        return Image.frombuffer(
+            mode, size, pixbuf.get_pixels(), "raw", mode, pixbuf.get_rowstride(), 1
+        )
 
     @staticmethod
     def load_cairo_surface(filename, w, h):
+        image = QuoteWriter.load_image(filename, w, h)
+        size = image.size
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA")
+        # cairo wants native-endian premultiplied ARGB, i.e. BGRA in memory on little-endian
+        data = bytearray(image.convert("RGBa").tobytes("raw", "BGRa"))
+        return cairo.ImageSurface.create_for_data(
+            data, cairo.FORMAT_ARGB32, size[0], size[1], size[0] * 4
+        )
+
+    @staticmethod
+    def get_layouts(quote, author, font, width):
+        """
+        Returns (quote_layout, author_layout or None), laid out for the given width in pixels.
+        Laying out the text is the costly part of rendering a quote, and the same quote is
+        rendered again on every clock tick or wallpaper refresh.
+        """
+        key = (quote, author, font, width)
+        with QuoteWriter.layouts_lock:
+            if key in QuoteWriter.layouts:
+                QuoteWriter.layouts.move_to_end(key)
+                return QuoteWriter.layouts[key]
+
         # pylint: disable=no-member
-        pixbuf = GdkPixbuf.Pixbuf.new_from_file_at_scale(filename, w, h, False)
-        surface = cairo.ImageSurface(0, pixbuf.get_width(), pixbuf.get_height())
-        context = cairo.Context(surface)
-        Gdk.cairo_set_source_pixbuf(context, pixbuf, 0, 0)
-        context.paint()
-        return surface
+        context = cairo.Context(cairo.ImageSurface(cairo.FORMAT_ARGB32, 1, 1))
+        qlayout = PangoCairo.create_layout(context)
+        qlayout.set_width(width * Pango.SCALE)
+        qlayout.set_alignment(Pango.Alignment.LEFT)
+        qlayout.set_wrap(Pango.WrapMode.WORD)
+        qlayout.set_font_description(Pango.FontDescription(font))
+        qlayout.set_text(quote, -1)
+
+        alayout = None
+        if author:
+            alayout = PangoCairo.create_layout(context)
+            alayout.set_width(qlayout.get_pixel_size()[0] * Pango.SCALE)
+            alayout.set_alignment(Pango.Alignment.RIGHT)
+            alayout.set_wrap(Pango.WrapMode.WORD)
+            alayout.set_font_description(Pango.FontDescription(font))
+            alayout.set_text(author, -1)
+
+        with QuoteWriter.layouts_lock:
+            QuoteWriter.layouts[key] = qlayout, alayout
+            while len(QuoteWriter.layouts) > QuoteWriter.LAYOUT_CACHE_SIZE:
+                QuoteWriter.layouts.popitem(last=False)
+        return qlayout, alayout
 
     @staticmethod
-    def save_cairo_surface(surface, filename):
+    def save_cairo_surface(surface, filename, quality=100):
         try:
             # attempt faster method first
             # the get_data() call will fail with Cairo version < 1.15.4-1 (e.g. on 16.04)
@@ -71,65 +148,66 @@ class QuoteWriter:
             image = Image.frombuffer("RGBA", size, data.tobytes(), "raw", "BGRA", 0, 1).convert(
                 "RGB"
             )
-            image.save(filename, quality=100)
+            image.save(filename, quality=quality)
         except:
             # fallback to slower method, but which works on 16.04
             surface.write_to_png(filename)
 
     @staticmethod
-    def write_quote_on_surface(surface, quote, author=None, options=None, margin=30):
-        qcontext = cairo.Context(surface)  # pylint: disable=no-member
-        acontext = cairo.Context(surface)  # pylint: disable=no-member
-
-        iw = surface.get_width()
-        ih = surface.get_height()
-
-        sw, sh = Util.get_primary_display_size(hidpi_scaled=True)
-        trimw, trimh = Util.compute_trimmed_offsets((iw, ih), (sw, sh))
+    def get_overlay(quote, author, options, screen_width, margin=30):
+        """
+        Returns (layer, width, height): the quote box with its text rendered on a transparent
+        surface, and the exact (possibly fractional) size of the box. The layer only depends on
+        the quote, its style and the screen width, so clock ticks and wallpaper changes reuse it.
+        """
+        key = (
+            quote,
+            author,
+            options.quotes_font,
+            tuple(options.quotes_text_color),
+            tuple(options.quotes_bg_color),
+            options.quotes_bg_opacity,
+            options.quotes_text_shadow,
+            options.quotes_width,
+            screen_width,
+            margin,
+        )
+        with QuoteWriter.overlays_lock:
+            if key in QuoteWriter.overlays:
+                QuoteWriter.overlays.move_to_end(key)
+                return QuoteWriter.overlays[key]
 
-        width = max(
-            200, sw * options.quotes_width // 100
-        )  # use quotes_width percent of the visible width
+        # use quotes_width percent of the visible width
+        width = max(200, screen_width * options.quotes_width // 100)
 
-        qlayout = PangoCairo.create_layout(qcontext)
-        qlayout.set_width((width - 4 * margin) * Pango.SCALE)
-        qlayout.set_alignment(Pango.Alignment.LEFT)
-        qlayout.set_wrap(Pango.WrapMode.WORD)
-        font = options.quotes_font if options else "Serif 30"
-        qlayout.set_font_description(Pango.FontDescription(font))
-        qlayout.set_text(quote, -1)
+        qlayout, alayout = QuoteWriter.get_layouts(
+            quote, author, options.quotes_font, width - 4 * margin
+        )
 
         qheight = qlayout.get_pixel_size()[1]
         qwidth = qlayout.get_pixel_size()[0]
         if options.quotes_width < 98:
             width = qwidth + 4 * margin
         else:
-            width = sw
-
-        alayout = PangoCairo.create_layout(acontext)
-        aheight = 0
-        if author:
-            alayout.set_width(qwidth * Pango.SCALE)
-            alayout.set_alignment(Pango.Alignment.RIGHT)
-            alayout.set_wrap(Pango.WrapMode.WORD)
-            alayout.set_font_description(Pango.FontDescription(font))
-            alayout.set_text(author, -1)
+            width = screen_width
 
-            aheight = alayout.get_pixel_size()[1]
+        aheight = alayout.get_pixel_size()[1] if alayout else 0
 
         height = qheight + aheight + 2.5 * margin
 
+        # pylint: disable=no-member
+        layer = cairo.ImageSurface(cairo.FORMAT_ARGB32, int(width), int(math.ceil(height)))
+        qcontext = cairo.Context(layer)
+        acontext = cairo.Context(layer)
+
         bgc = options.quotes_bg_color
         qcontext.set_source_rgba(
             bgc[0] / 255.0, bgc[1] / 255.0, bgc[2] / 255.0, options.quotes_bg_opacity / 100.0
         )  # gray semi-transparent background
-
-        hpos = trimw + (sw - width) * options.quotes_hpos // 100
-        vpos = trimh + (sh - height) * options.quotes_vpos // 100
-        qcontext.rectangle(hpos, vpos, width, height)
+        qcontext.rectangle(0, 0, width, height)
         qcontext.fill()
 
-        qcontext.translate(hpos + (width - qwidth) / 2, vpos + margin)
+        qcontext.translate((width - qwidth) / 2, margin)
 
         if options.quotes_text_shadow:
             qcontext.set_source_rgba(0, 0, 0, 0.2)
@@ -143,20 +221,45 @@ class QuoteWriter:
         PangoCairo.update_layout(qcontext, qlayout)
         PangoCairo.show_layout(qcontext, qlayout)
 
-        acontext.translate(hpos + (width - qwidth) / 2, vpos + margin + qheight + margin / 2)
+        if alayout:
+            acontext.translate((width - qwidth) / 2, margin + qheight + margin / 2)
 
-        if options.quotes_text_shadow:
-            acontext.set_source_rgba(0, 0, 0, 0.2)
+            if options.quotes_text_shadow:
+                acontext.set_source_rgba(0, 0, 0, 0.2)
+                PangoCairo.update_layout(acontext, alayout)
+                PangoCairo.show_layout(acontext, alayout)
+                acontext.translate(-2, -2)
+
+            acontext.set_source_rgb(tc[0] / 255.0, tc[1] / 255.0, tc[2] / 255.0)
             PangoCairo.update_layout(acontext, alayout)
             PangoCairo.show_layout(acontext, alayout)
-            acontext.translate(-2, -2)
 
-        acontext.set_source_rgb(tc[0] / 255.0, tc[1] / 255.0, tc[2] / 255.0)
-        PangoCairo.update_layout(acontext, alayout)
-        PangoCairo.show_layout(acontext, alayout)
+        layer.flush()
+        overlay = layer, width, height
+        with QuoteWriter.overlays_lock:
+            QuoteWriter.overlays[key] = overlay
+            while len(QuoteWriter.overlays) > QuoteWriter.OVERLAY_CACHE_SIZE:
+                QuoteWriter.overlays.popitem(last=False)
+        return overlay
+
+    @staticmethod
+    def write_quote_on_surface(surface, quote, author=None, options=None, margin=30):
+        iw = surface.get_width()
+        ih = surface.get_height()
+
+        sw, sh = Util.get_primary_display_size(hidpi_scaled=True)
+        trimw, trimh = Util.compute_trimmed_offsets((iw, ih), (sw, sh))
+
+        layer, width, height = QuoteWriter.get_overlay(quote, author, options, sw, margin)
 
-        qcontext.show_page()
-        acontext.show_page()
+        hpos = trimw + (sw - width) * options.quotes_hpos // 100
+        vpos = trimh + (sh - height) * options.quotes_vpos // 100
+
+        # whole pixel offsets, so the layer is copied instead of resampled
+        context = cairo.Context(surface)  # pylint: disable=no-member
+        context.set_source_surface(layer, round(hpos), round(vpos))
+        context.paint()
+        surface.flush()
 
 
 if __name__ == "__main__":
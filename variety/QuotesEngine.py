@@ -14,29 +14,47 @@
 # with this program.  If not, see <http://www.gnu.org/licenses/>.
 ### END LICENSE
 
+import json
 import logging
+import os
+import queue
 import random
 import threading
 import time
 
+from variety.Metrics import metrics
 from variety.plugins.IQuoteSource import IQuoteSource
-from variety.Util import _
+from variety.Util import Util, _
 
 logger = logging.getLogger("variety")
 
 
 class QuotesEngine:
+    # Persisted quotes (prepared buffer and fetched-but-unused quotes) are reused for this long
+    CACHE_TTL = 3 * 24 * 3600
+
+    # Query several plugins in parallel when filling the prepared buffer
+    CONCURRENT_FETCH = True
+    MAX_CONCURRENT_PLUGINS = 4
+    PLUGIN_TIMEOUT = 10
+
     def __init__(self, parent=None):
         self.parent = parent
         self.quote = None
         self.started = False
         self.running = False
         self.used = []
+        self.plugin_stats = {}
+        self.stats_lock = threading.Lock()
+        # names of the plugins with a fetch still running, possibly after PLUGIN_TIMEOUT
+        self.in_flight = set()
 
     def update_plugins(self):
         for p in self.parent.jumble.get_plugins(IQuoteSource):
             name = p["info"]["name"]
             if name in self.parent.options.quotes_disabled_sources:
+                if not p.is_loaded():
+                    continue  # never loaded, so not active - no need to import it
                 try:
                     p["plugin"].deactivate()
                 except Exception:
@@ -50,6 +68,9 @@ class QuotesEngine:
         self.plugins = self.parent.jumble.get_plugins(IQuoteSource, active=True)
 
     def stop(self):
+        if self.started:
+            # keep the prepared buffer and the cached quotes for the next start
+            self.save_cache()
         self.running = False
         self.started = False
         self.update_plugins()
@@ -69,6 +90,10 @@ class QuotesEngine:
         self.change_event = threading.Event()
 
         self.cache = {}
+        self.cache_times = {}
+        self.cache_lock = threading.Lock()
+        self.fetch_count = 0
+        self.load_cache()
 
         self.started = True
         self.running = True
@@ -87,6 +112,88 @@ class QuotesEngine:
     def quit(self):
         self.running = False
         self.prepare_event.set()
+        self.save_cache()
+
+    def get_cache_file(self):
+        return os.path.join(self.parent.config_folder, "quotes_cache.json")
+
+    def get_options_signature(self):
+        options = self.parent.options
+        return [
+            options.quotes_tags,
+            options.quotes_authors,
+            sorted(options.quotes_disabled_sources),
+            options.quotes_max_length,
+        ]
+
+    def save_cache(self):
+        try:
+            with self.cache_lock:
+                entries = [
+                    {
+                        "plugin": plugin,
+                        "category": category,
+                        "search": search,
+                        "time": self.cache_times.get((plugin, category, search), time.time()),
+                        "quotes": list(quotes.values()),
+                    }
+                    for plugin, categories in self.cache.items()
+                    for category, searches in categories.items()
+                    for search, quotes in searches.items()
+                    if quotes
+                ]
+            with self.prepared_lock:
+                prepared = list(self.prepared)
+
+            data = {
+                "time": time.time(),
+                "options": self.get_options_signature(),
+                "prepared": prepared,
+                "cache": entries,
+            }
+            cache_file = self.get_cache_file()
+            with open(cache_file + ".partial", "w", encoding="utf8") as f:
+                json.dump(data, f)
+            os.rename(cache_file + ".partial", cache_file)
+        except Exception:
+            logger.exception(lambda: "Could not save quotes cache")
+
+    def load_cache(self):
+        try:
+            with open(self.get_cache_file(), encoding="utf8") as f:
+                data = json.load(f)
+        except Exception:
+            logger.info(lambda: "No quotes cache to load, starting afresh")
+            return
+
+        try:
+            now = time.time()
+            max_length = self.parent.options.quotes_max_length
+            for entry in data["cache"]:
+                if now - entry["time"] > QuotesEngine.CACHE_TTL:
+                    continue
+                plugin, category, search = entry["plugin"], entry["category"], entry["search"]
+                self.cache.setdefault(plugin, {"random": {}, "keyword": {}, "author": {}})
+                self.cache[plugin][category][search] = {
+                    q["quote"]: q for q in entry["quotes"] if len(q["quote"]) < max_length
+                }
+                self.cache_times[(plugin, category, search)] = entry["time"]
+
+            if (
+                now - data["time"] <= QuotesEngine.CACHE_TTL
+                and data["options"] == self.get_options_signature()
+            ):
+                self.prepared = data["prepared"]
+
+            logger.info(
+                lambda: "Loaded quotes cache: %d prepared, %d cached searches"
+                % (len(self.prepared), len(self.cache_times))
+            )
+        except Exception:
+            logger.exception(lambda: "Could not load quotes cache, ignoring it")
+            self.prepared = []
+            self.cache = {}
+            self.cache_times = {}
 
     def get_quote(self):
         return self.quote
@@ -195,24 +302,43 @@ class QuotesEngine:
     def prepare_thread(self):
         logger.info(lambda: "Quotes prepare thread running")
 
+        # show a quote from the persisted buffer right away
+        if self.prepared and self.parent.options.quotes_enabled and self.parent.quote is None:
+            self.parent.quote = self.change_quote()
+            self.parent.refresh_texts()
+
         while self.running:
             try:
+                fetched = False
                 while (
                     self.running and self.parent.options.quotes_enabled and len(self.prepared) < 10
                 ):
                     logger.info(
-                        lambda: "Quotes prepared buffer contains %s quotes, fetching a quote"
+                        lambda: "Quotes prepared buffer contains %s quotes, fetching quotes"
                         % len(self.prepared)
                     )
-                    quote = self.get_one_quote()
-                    if quote:
+                    fetch_count = self.fetch_count
+                    if QuotesEngine.CONCURRENT_FETCH:
+                        quotes = self.get_quotes_concurrently(10 - len(self.prepared))
+                    else:
+                        quotes = [self.get_one_quote()]
+                    quotes = [q for q in quotes if q]
+                    if quotes:
                         with self.prepared_lock:
-                            self.prepared.append(quote)
+                            self.prepared.extend(quotes)
                         if self.parent.options.quotes_enabled and self.parent.quote is None:
                             self.parent.quote = self.change_quote()
                             self.parent.refresh_texts()
 
-                    time.sleep(2)
+                    if self.fetch_count != fetch_count:
+                        fetched = True
+                    if self.fetch_count != fetch_count or not quotes:
+                        # only pause between actual plugin calls or while waiting for plugins that
+                        # are still busy, cached quotes are free
+                        time.sleep(2)
+
+                if fetched:
+                    self.save_cache()
 
                 if not self.running:
                     return
@@ -223,7 +349,8 @@ class QuotesEngine:
             self.prepare_event.wait()
             self.prepare_event.clear()
 
-    def get_one_quote(self):
+    def get_search(self):
+        """Returns (category, search) for the next fetch, and whether searching is configured"""
         keywords = []
         if self.parent.options.quotes_tags.strip():
             keywords = self.parent.options.quotes_tags.split(",")
@@ -236,11 +363,13 @@ class QuotesEngine:
             category, search = random.choice(
                 [("keyword", k) for k in keywords] + [("author", a) for a in authors]
             )
+        return category, search, bool(keywords or authors)
 
+    def get_eligible_plugins(self, searching):
         plugins = list(self.plugins)
         if not self.parent.options.internet_enabled:
             plugins = [p for p in plugins if not p["plugin"].needs_internet()]
-        if keywords or authors:
+        if searching:
             plugins = [p for p in plugins if p["plugin"].supports_search()]
 
         if not plugins:
@@ -253,63 +382,200 @@ class QuotesEngine:
             )
             raise Exception("No quote plugins")
 
+        return plugins
+
+    def notify_no_quotes(self, all_failed):
+        if (
+            time.time() - self.last_error_notification_time > 3600
+            and len(self.prepared) + len(self.used) < 5
+        ):
+            self.last_error_notification_time = time.time()
+            if all_failed:
+                self.parent.show_notification(
+                    _("Could not fetch quotes"),
+                    _("Quotes services may be down, we will continue trying"),
+                )
+            else:
+                self.parent.show_notification(
+                    _("Could not find quotes"),
+                    _("Maybe you are searching for something very obscure?"),
+                )
+
+    def record_plugin_result(self, plugin_name, ok, latency):
+        metrics.inc("quote_fetches" if ok else "quote_fetch_failures", label=plugin_name)
+        metrics.observe("quote_fetch", latency, label=plugin_name)
+        with self.stats_lock:
+            stats = self.plugin_stats.setdefault(
+                plugin_name, {"successes": 0, "failures": 0, "latency": None}
+            )
+            stats["successes" if ok else "failures"] += 1
+            if stats["latency"] is None:
+                stats["latency"] = latency
+            else:
+                stats["latency"] = 0.7 * stats["latency"] + 0.3 * latency
+
+    def get_plugin_weight(self, plugin):
+        """Healthy and responsive plugins are picked more often"""
+        stats = self.plugin_stats.get(plugin["info"]["name"])
+        if not stats:
+            return 1.0
+        health = (stats["successes"] + 1.0) / (stats["successes"] + stats["failures"] + 2.0)
+        return health / (1.0 + (stats["latency"] or 0) / QuotesEngine.PLUGIN_TIMEOUT)
+
+    def choose_plugin(self, plugins):
+        return random.choices(plugins, weights=[self.get_plugin_weight(p) for p in plugins])[0]
+
+    def get_cached(self, plugin_name, category, search):
+        with self.cache_lock:
+            self.cache.setdefault(plugin_name, {"random": {}, "keyword": {}, "author": {}})
+            return self.cache[plugin_name][category].setdefault(search, {})
+
+    def fetch_into_cache(self, plugin, category, search):
+        """
+        Calls the plugin and adds the quotes it returns to the cache.
+        Returns True on success (even if no quotes were found), False if the plugin failed.
+        """
+        plugin_name = plugin["info"]["name"]
+        self.fetch_count += 1
+        start_time = time.time()
+        try:
+            if category == "random":
+                quotes = plugin["plugin"].get_random()
+            elif category == "keyword":
+                quotes = plugin["plugin"].get_for_keyword(search)
+            elif category == "author":
+                quotes = plugin["plugin"].get_for_author(search)
+            else:
+                raise RuntimeError("Unknown category")
+        except Exception:
+            logger.exception(lambda: "Exception in quote plugin %s" % plugin_name)
+            self.record_plugin_result(plugin_name, False, time.time() - start_time)
+            return False
+
+        self.record_plugin_result(plugin_name, True, time.time() - start_time)
+        if quotes:
+            cached = self.get_cached(plugin_name, category, search)
+            with self.cache_lock:
+                for q in quotes:
+                    if len(q["quote"]) < self.parent.options.quotes_max_length:
+                        cached[q["quote"]] = q
+                self.cache_times[(plugin_name, category, search)] = time.time()
+        return True
+
+    def take_from_cache(self, plugin_name, category, search):
+        cached = self.get_cached(plugin_name, category, search)
+        with self.cache_lock:
+            if not cached:
+                return None
+            quote = random.choice(list(cached.values()))
+            del cached[quote["quote"]]
+            return quote
+
+    def get_one_quote(self):
+        category, search, searching = self.get_search()
+        plugins = self.get_eligible_plugins(searching)
+
         error_plugins = []
         count_plugins = len(plugins)
         while self.running and self.parent.options.quotes_enabled:
             if not plugins:
-                if (
-                    time.time() - self.last_error_notification_time > 3600
-                    and len(self.prepared) + len(self.used) < 5
-                ):
-                    self.last_error_notification_time = time.time()
-                    if len(error_plugins) == count_plugins:
-                        self.parent.show_notification(
-                            _("Could not fetch quotes"),
-                            _("Quotes services may be down, we will continue trying"),
-                        )
-                    else:
-                        self.parent.show_notification(
-                            _("Could not find quotes"),
-                            _("Maybe you are searching for something very obscure?"),
-                        )
+                self.notify_no_quotes(all_failed=len(error_plugins) == count_plugins)
                 return None
 
-            plugin = random.choice(plugins)
+            plugin = self.choose_plugin(plugins)
             plugin_name = plugin["info"]["name"]
-            self.cache.setdefault(plugin_name, {"random": {}, "keyword": {}, "author": {}})
-            self.cache[plugin_name][category].setdefault(search, {})
-            cached = self.cache[plugin_name][category][search]
 
+            cached = self.get_cached(plugin_name, category, search)
+            metrics.cache_access("quotes_cache", bool(cached))
             if not cached:
-                try:
-                    if category == "random":
-                        quotes = plugin["plugin"].get_random()
-                    elif category == "keyword":
-                        quotes = plugin["plugin"].get_for_keyword(search)
-                    elif category == "author":
-                        quotes = plugin["plugin"].get_for_author(search)
-                    else:
-                        raise RuntimeError("Unknown category")
-
-                    if quotes:
-                        for q in quotes:
-                            if len(q["quote"]) < self.parent.options.quotes_max_length:
-                                cached[q["quote"]] = q
-
-                except Exception:
-                    logger.exception(lambda: "Exception in quote plugin")
+                if not self.fetch_into_cache(plugin, category, search):
                     plugins.remove(plugin)
                     error_plugins.append(plugin)
                     continue
 
-            if not cached:
+            quote = self.take_from_cache(plugin_name, category, search)
+            if not quote:
                 logger.warning(lambda: "No quotes for '%s' for plugin %s" % (search, plugin_name))
                 plugins.remove(plugin)
                 continue
 
-            quote = random.choice(list(cached.values()))
-            del cached[quote["quote"]]
-            if not cached:
-                del cached
-
             return quote
+
+    def get_quotes_concurrently(self, count):
+        """
+        Returns up to count quotes. Plugins with no cached quotes for the current search are queried
+        in parallel (at most MAX_CONCURRENT_PLUGINS, picked by health and latency), and quotes are
+        taken from whichever plugins answer first, waiting at most PLUGIN_TIMEOUT seconds.
+        Slower plugins still fill the cache when they eventually answer, and are not queried again
+        until then.
+        """
+        category, search, searching = self.get_search()
+        plugins = self.get_eligible_plugins(searching)
+
+        ready = [
+            p["info"]["name"]
+            for p in plugins
+            if self.get_cached(p["info"]["name"], category, search)
+        ]
+        with self.stats_lock:
+            busy = [p["info"]["name"] for p in plugins if p["info"]["name"] in self.in_flight]
+        to_fetch = [p for p in plugins if p["info"]["name"] not in ready + busy]
+
+        def _available():
+            return sum(len(self.get_cached(name, category, search)) for name in ready)
+
+        results = queue.Queue()
+        started = 0
+        if _available() >= count:
+            to_fetch = []
+        while to_fetch and started < QuotesEngine.MAX_CONCURRENT_PLUGINS:
+            plugin = self.choose_plugin(to_fetch)
+            to_fetch.remove(plugin)
+            with self.stats_lock:
+                self.in_flight.add(plugin["info"]["name"])
+
+            def _fetch(plugin=plugin):
+                name = plugin["info"]["name"]
+                ok = False
+                try:
+                    ok = self.fetch_into_cache(plugin, category, search)
+                finally:
+                    with self.stats_lock:
+                        self.in_flight.discard(name)
+                    results.put((name, ok))
+
+            Util.start_daemon(_fetch)
+            started += 1
+
+        failed = 0
+        deadline = time.time() + QuotesEngine.PLUGIN_TIMEOUT
+        while started and self.running and _available() < count:
+            try:
+                name, ok = results.get(timeout=max(0, deadline - time.time()))
+            except queue.Empty:
+                logger.info(
+                    lambda: "Quote plugins did not answer in %ds" % QuotesEngine.PLUGIN_TIMEOUT
+                )
+                break
+            started -= 1
+            if ok:
+                ready.append(name)
+            else:
+                failed += 1
+
+        # take quotes round-robin, fastest plugins first
+        quotes = []
+        while ready and len(quotes) < count:
+            for name in list(ready):
+                quote = self.take_from_cache(name, category, search)
+                if quote:
+                    quotes.append(quote)
+                else:
+                    ready.remove(name)
+                if len(quotes) >= count:
+                    break
+
+        if not quotes and not started and not busy:
+            self.notify_no_quotes(all_failed=failed == len(plugins))
+
+        return quotes
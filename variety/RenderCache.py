@@ -0,0 +1,150 @@
+# -*- Mode: Python; coding: utf-8; indent-tabs-mode: nil; tab-width: 4 -*-
+### BEGIN LICENSE
+# Copyright (c) 2012, Peter Levi <peterlevi@peterlevi.com>
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 3, as published
+# by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranties of
+# MERCHANTABILITY, SATISFACTORY QUALITY, or FITNESS FOR A PARTICULAR
+# PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+### END LICENSE
+
+import collections
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+
+from variety.Metrics import metrics
+
+logger = logging.getLogger("variety")
+
+
+def link_or_copy(source, target):
+    """Hard-links source to target, or copies it when they are on different file systems"""
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copyfile(source, target + ".partial")
+        os.rename(target + ".partial", target)
+
+
+class RenderCache:
+    """
+    Content-addressed cache of rendered wallpapers: the outputs of the auto-rotate, filter,
+    display mode, quote and clock chain, keyed by a hash of the source image and of everything
+    that affects its rendering. The least recently used entries are evicted when the cache grows
+    above max_size bytes. Files are named by their key and tag, so the cache survives restarts.
+    """
+
+    TAG = re.compile(r"^[\w-]*$")
+
+    def __init__(self, folder, max_size):
+        self.folder = folder
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        # key -> (path, size, tag), least recently used first
+        self.entries = collections.OrderedDict()
+        self.size = 0
+        self.loaded = False
+
+    @staticmethod
+    def make_key(source, state):
+        """
+        :param source: path of the original image, its size and modification time are part of
+        the key, so edited images are rendered again
+        :param state: JSON-serializable description of everything else the render depends on
+        """
+        st = os.stat(source)
+        data = json.dumps([source, st.st_mtime_ns, st.st_size, state], sort_keys=True)
+        return hashlib.sha1(data.encode("utf-8")).hexdigest()
+
+    def _load(self):
+        if self.loaded:
+            return
+        os.makedirs(self.folder, exist_ok=True)
+        files = []
+        for name in os.listdir(self.folder):
+            path = os.path.join(self.folder, name)
+            if name.endswith(".partial"):
+                os.unlink(path)
+                continue
+            st = os.stat(path)
+            key, _, tag = os.path.splitext(name)[0].partition(".")
+            files.append((st.st_mtime, key, path, st.st_size, tag))
+        for _mtime, key, path, size, tag in sorted(files):
+            self.entries[key] = (path, size, tag)
+            self.size += size
+        self.loaded = True
+
+    def get(self, key):
+        """Returns (path, tag) of the cached render for key, or None"""
+        with self.lock:
+            self._load()
+            entry = self.entries.get(key)
+            metrics.cache_access("render_cache", entry is not None)
+            if not entry:
+                return None
+            if not os.path.exists(entry[0]):
+                del self.entries[key]
+                self.size -= entry[1]
+                return None
+            self.entries.move_to_end(key)
+            # access times are unreliable with relatime/noatime, the LRU order is kept in mtime
+            os.utime(entry[0])
+            return entry[0], entry[2]
+
+    def put(self, key, file, tag=""):
+        """
+        Stores a copy of file under key. The file itself is left alone.
+        :param tag: a short string of letters, digits, _ and - returned along with the file by get
+        """
+        if self.max_size <= 0 or not RenderCache.TAG.match(tag):
+            return
+        with self.lock:
+            self._load()
+            if key in self.entries:
+                return
+            path = os.path.join(self.folder, "%s.%s%s" % (key, tag, os.path.splitext(file)[1]))
+            link_or_copy(file, path)
+            size = os.path.getsize(path)
+            self.entries[key] = (path, size, tag)
+            self.size += size
+            self._evict()
+
+    def _evict(self):
+        while self.size > self.max_size and self.entries:
+            key, (path, size, _tag) = self.entries.popitem(last=False)
+            self.size -= size
+            logger.debug(lambda: "Evicting %s from the render cache" % path)
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+    def set_max_size(self, max_size):
+        with self.lock:
+            self.max_size = max_size
+            if self.loaded:
+                self._evict()
+
+    def get_size(self):
+        return self.size
+
+    def get_count(self):
+        return len(self.entries)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+            self.loaded = False
+            shutil.rmtree(self.folder, ignore_errors=True)
@@ -0,0 +1,149 @@
+# -*- Mode: Python; coding: utf-8; indent-tabs-mode: nil; tab-width: 4 -*-
+### BEGIN LICENSE
+# Copyright (c) 2012, Peter Levi <peterlevi@peterlevi.com>
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 3, as published
+# by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranties of
+# MERCHANTABILITY, SATISFACTORY QUALITY, or FITNESS FOR A PARTICULAR
+# PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+### END LICENSE
+
+import collections
+import logging
+import os
+import sys
+import threading
+import time
+
+logger = logging.getLogger("variety")
+
+
+class SamplingProfiler:
+    """
+    Low-overhead alternative to Util.ModuleProfiler that can be left running: a background thread
+    periodically takes the stacks of all other threads and counts how often each stack was seen,
+    per thread name. dump() writes the counts in the collapsed-stack format used by flamegraph.pl,
+    speedscope and similar tools.
+    """
+
+    DEFAULT_RATE = 100  # samples per second
+
+    # distinct stacks kept, samples of further new stacks are only counted per thread
+    MAX_STACKS = 50000
+
+    # thread names are looked up again after this many samples, to pick up renamed threads
+    THREAD_NAMES_REFRESH = 100
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = collections.Counter()
+        self.thread = None
+        self.running = False
+        self.interval = 1.0 / SamplingProfiler.DEFAULT_RATE
+        self.samples = 0
+        self.sampling_time = 0.0
+        self.started = None
+        self.thread_names = {}
+
+    def is_running(self):
+        return self.running
+
+    def start(self, rate=DEFAULT_RATE):
+        """Starts sampling all threads rate times per second"""
+        if self.running:
+            return
+        self.interval = 1.0 / max(1, rate)
+        self.running = True
+        self.started = time.time()
+        self.thread = threading.Thread(target=self._run, name="SamplingProfiler")
+        self.thread.daemon = True
+        self.thread.start()
+        logger.info(lambda: "Sampling profiler started at %d samples/s" % rate)
+
+    def stop(self):
+        self.running = False
+
+    def reset(self):
+        with self.lock:
+            self.counts.clear()
+            self.samples = 0
+            self.sampling_time = 0.0
+            self.started = time.time()
+
+    def get_overhead(self):
+        """Fraction of the wall time spent taking samples"""
+        elapsed = time.time() - self.started if self.started else 0
+        return self.sampling_time / elapsed if elapsed else 0.0
+
+    def _run(self):
+        own = threading.get_ident()
+        while self.running:
+            time.sleep(self.interval)
+            start = time.perf_counter()
+            self._sample(own)
+            self.sampling_time += time.perf_counter() - start
+
+    def _sample(self, own):
+        frames = sys._current_frames()
+        if self.samples % SamplingProfiler.THREAD_NAMES_REFRESH == 0 or any(
+            tid not in self.thread_names for tid in frames
+        ):
+            self.thread_names = {t.ident: t.name for t in threading.enumerate()}
+
+        with self.lock:
+            self.samples += 1
+            for tid, frame in frames.items():
+                if tid == own:
+                    continue
+                codes = []
+                while frame is not None:
+                    codes.append(frame.f_code)
+                    frame = frame.f_back
+                thread_name = self.thread_names.get(tid, str(tid)).replace(";", "_")
+                key = (thread_name, tuple(codes))
+                if key not in self.counts and len(self.counts) >= SamplingProfiler.MAX_STACKS:
+                    key = (key[0], ())
+                self.counts[key] += 1
+
+    @staticmethod
+    def _frame_name(code):
+        return "%s (%s:%d)" % (
+            getattr(code, "co_qualname", code.co_name),
+            os.path.basename(code.co_filename),
+            code.co_firstlineno,
+        )
+
+    def get_collapsed_stacks(self):
+        """
+        Returns a list of "thread;outermost;...;innermost count" lines, the collapsed-stack
+        format accepted by flame graph tools
+        """
+        with self.lock:
+            counts = list(self.counts.items())
+
+        stacks = collections.Counter()
+        for (thread_name, codes), count in counts:
+            names = [SamplingProfiler._frame_name(code) for code in reversed(codes)]
+            line = ";".join([thread_name] + (names or ["[other stacks]"]))
+            stacks[line] += count
+        return ["%s %d" % (stack, count) for stack, count in sorted(stacks.items())]
+
+    def dump(self, path):
+        """Writes the collected stacks to path in collapsed-stack format"""
+        lines = self.get_collapsed_stacks()
+        with open(path + ".partial", "w") as f:
+            f.write("\n".join(lines) + "\n")
+        os.rename(path + ".partial", path)
+        logger.info(
+            lambda: "Dumped %d stacks from %d samples to %s, sampling overhead %.2f%%"
+            % (len(lines), self.samples, path, 100 * self.get_overhead())
+        )
+
+
+sampling_profiler = SamplingProfiler()
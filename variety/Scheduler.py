@@ -0,0 +1,178 @@
+# -*- Mode: Python; coding: utf-8; indent-tabs-mode: nil; tab-width: 4 -*-
+### BEGIN LICENSE
+# Copyright (c) 2012, Peter Levi <peterlevi@peterlevi.com>
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 3, as published
+# by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranties of
+# MERCHANTABILITY, SATISFACTORY QUALITY, or FITNESS FOR A PARTICULAR
+# PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+### END LICENSE
+
+import collections
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+logger = logging.getLogger("variety")
+
+
+class Scheduler:
+    """
+    Runs short background tasks on a fixed pool of worker threads instead of starting
+    a new thread for every call.
+    Tasks are submitted to named queues. Workers always take the oldest task from the most urgent
+    non-empty queue. Delayed tasks are kept in a single heap ordered by due time and are moved to
+    their queue when due.
+    """
+
+    # queue name -> priority, lower is more urgent. Unknown queue names get DEFAULT_PRIORITY.
+    QUEUES = {"wallpaper": 0, "ui": 1, "default": 2, "hooks": 3, "background": 4}
+    DEFAULT_PRIORITY = 2
+
+    # tasks that waited longer than this in their queue are logged (seconds)
+    SLOW_WAIT = 1.0
+
+    def __init__(self, workers=4, name="Scheduler"):
+        self.workers = workers
+        self.name = name
+        self.condition = threading.Condition()
+        self.queues = {}
+        self.priorities = {}
+        self.timers = []
+        self.counter = itertools.count()
+        self.stats = {}
+        self.running = False
+        self.threads = []
+        for queue, priority in Scheduler.QUEUES.items():
+            self._add_queue(queue, priority)
+
+    def _add_queue(self, queue, priority):
+        self.queues[queue] = collections.deque()
+        self.priorities[queue] = priority
+        self.stats[queue] = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "total_wait": 0.0,
+            "max_wait": 0.0,
+            "total_run": 0.0,
+        }
+
+    def start(self):
+        with self.condition:
+            if self.running:
+                return
+            self.running = True
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name="%s-%d" % (self.name, i))
+            thread.daemon = True
+            thread.start()
+            self.threads.append(thread)
+
+    def stop(self):
+        """Stops the workers once they finish their current tasks. Queued tasks are dropped."""
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+
+    def submit(self, queue, fn, *args, **kwargs):
+        """Runs fn(*args, **kwargs) on a worker thread as soon as one is free"""
+        with self.condition:
+            self._enqueue(queue, (time.time(), fn, args, kwargs))
+            self.condition.notify()
+
+    def schedule(self, delay, queue, fn, *args, **kwargs):
+        """Runs fn(*args, **kwargs) on a worker thread after delay seconds"""
+        if delay <= 0:
+            return self.submit(queue, fn, *args, **kwargs)
+        with self.condition:
+            heapq.heappush(
+                self.timers, (time.time() + delay, next(self.counter), queue, fn, args, kwargs)
+            )
+            # a waiting worker may need to wake up earlier than it planned to
+            self.condition.notify()
+
+    def _enqueue(self, queue, task):
+        if queue not in self.queues:
+            self._add_queue(queue, Scheduler.DEFAULT_PRIORITY)
+        self.queues[queue].append(task)
+        self.stats[queue]["submitted"] += 1
+
+    def _next_task(self):
+        """Called with the condition held. Returns (queue, task) or None when stopped."""
+        while self.running:
+            now = time.time()
+            while self.timers and self.timers[0][0] <= now:
+                due, _seq, queue, fn, args, kwargs = heapq.heappop(self.timers)
+                self._enqueue(queue, (due, fn, args, kwargs))
+
+            best = None
+            for queue, tasks in self.queues.items():
+                if tasks and (best is None or self.priorities[queue] < self.priorities[best]):
+                    best = queue
+            if best is not None:
+                return best, self.queues[best].popleft()
+
+            timeout = self.timers[0][0] - now if self.timers else None
+            self.condition.wait(timeout)
+        return None
+
+    def _worker(self):
+        while True:
+            with self.condition:
+                next_task = self._next_task()
+            if next_task is None:
+                return
+
+            queue, (enqueued, fn, args, kwargs) = next_task
+            started = time.time()
+            wait = started - enqueued
+            if wait > Scheduler.SLOW_WAIT:
+                logger.info(
+                    lambda: "Scheduler: task %s waited %.2fs in queue %s"
+                    % (getattr(fn, "__name__", fn), wait, queue)
+                )
+
+            failed = False
+            try:
+                fn(*args, **kwargs)
+            except Exception:
+                failed = True
+                logger.exception(
+                    lambda: "Scheduler: task %s in queue %s failed"
+                    % (getattr(fn, "__name__", fn), queue)
+                )
+
+            with self.condition:
+                stats = self.stats[queue]
+                stats["completed"] += 1
+                stats["failed"] += int(failed)
+                stats["total_wait"] += wait
+                stats["max_wait"] = max(stats["max_wait"], wait)
+                stats["total_run"] += time.time() - started
+
+    def get_stats(self):
+        """Returns per-queue depth, task counts and average and maximum wait times in ms"""
+        with self.condition:
+            result = {"workers": self.workers, "timers": len(self.timers), "queues": {}}
+            for queue, stats in self.stats.items():
+                completed = stats["completed"] or 1
+                result["queues"][queue] = {
+                    "priority": self.priorities[queue],
+                    "depth": len(self.queues[queue]),
+                    "submitted": stats["submitted"],
+                    "completed": stats["completed"],
+                    "failed": stats["failed"],
+                    "avg_wait_ms": round(1000 * stats["total_wait"] / completed, 1),
+                    "max_wait_ms": round(1000 * stats["max_wait"], 1),
+                    "avg_run_ms": round(1000 * stats["total_run"] / completed, 1),
+                }
+            return result
@@ -0,0 +1,147 @@
+# -*- Mode: Python; coding: utf-8; indent-tabs-mode: nil; tab-width: 4 -*-
+### BEGIN LICENSE
+# Copyright (c) 2012, Peter Levi <peterlevi@peterlevi.com>
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 3, as published
+# by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranties of
+# MERCHANTABILITY, SATISFACTORY QUALITY, or FITNESS FOR A PARTICULAR
+# PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+### END LICENSE
+
+import builtins
+import contextlib
+import importlib.util
+import logging
+import sys
+import threading
+import time
+
+# This module is imported before everything else in variety, so that it can time all other imports.
+# It must use only the standard library.
+
+logger = logging.getLogger("variety")
+
+
+class StartupProfiler:
+    """
+    Records the wall time of startup phases and of every module import done on the main thread.
+    Complements ModuleProfiler (in Util), which traces calls but cannot see the time spent importing.
+    Enabled with --profile-startup; when disabled all methods are cheap no-ops.
+    """
+
+    # Imports that took less than this (self time, in seconds) are not listed individually
+    MIN_REPORTED_IMPORT = 0.001
+    MAX_REPORTED_IMPORTS = 40
+
+    def __init__(self):
+        self.enabled = False
+        self.start_time = None
+        self.phases = []
+        self.imports = {}
+        self.import_stack = []
+        self.original_import = None
+        self.thread_id = None
+
+    def start(self):
+        if self.enabled:
+            return
+        self.enabled = True
+        self.start_time = time.perf_counter()
+        self.thread_id = threading.get_ident()
+        self.original_import = builtins.__import__
+        builtins.__import__ = self._import
+
+    def stop(self):
+        if self.original_import and builtins.__import__ == self._import:
+            builtins.__import__ = self.original_import
+        self.original_import = None
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        if threading.get_ident() != self.thread_id or (level == 0 and name in sys.modules):
+            return self.original_import(name, globals, locals, fromlist, level)
+
+        start = time.perf_counter()
+        self.import_stack.append(0.0)
+        try:
+            return self.original_import(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - start
+            children = self.import_stack.pop()
+            if self.import_stack:
+                self.import_stack[-1] += elapsed
+            key = self._module_name(name, globals, fromlist, level)
+            self_time, total = self.imports.get(key, (0.0, 0.0))
+            self.imports[key] = (self_time + elapsed - children, total + elapsed)
+
+    @staticmethod
+    def _module_name(name, globals, fromlist, level):
+        if not level:
+            return name
+        try:
+            package = (globals or {}).get("__package__") or ""
+            resolved = importlib.util.resolve_name("." * level + name, package)
+        except Exception:
+            resolved = "." * level + name
+        if not name and fromlist:
+            resolved += ".{%s}" % ",".join(fromlist)
+        return resolved
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Context manager that records the wall time of the enclosed block as a startup phase"""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, start - self.start_time, time.perf_counter() - start))
+
+    def get_report(self):
+        lines = [
+            "Startup profile: %.3fs since start of profiling"
+            % (time.perf_counter() - self.start_time)
+        ]
+
+        lines.append("")
+        lines.append("Phases (sorted by duration):")
+        for name, offset, duration in sorted(self.phases, key=lambda p: -p[2]):
+            lines.append("  %8.1f ms  %-40s (at %.1f ms)" % (duration * 1000, name, offset * 1000))
+
+        imports = sorted(self.imports.items(), key=lambda i: -i[1][0])
+        total = sum(self_time for _name, (self_time, _total) in imports)
+        lines.append("")
+        lines.append(
+            "Imports on the main thread (sorted by self time, %d modules, %.1f ms in total):"
+            % (len(imports), total * 1000)
+        )
+        lines.append("   self ms  cumulative ms  module")
+        for name, (self_time, cumulative) in imports[: self.MAX_REPORTED_IMPORTS]:
+            if self_time < self.MIN_REPORTED_IMPORT:
+                break
+            lines.append("  %8.1f  %13.1f  %s" % (self_time * 1000, cumulative * 1000, name))
+
+        return "\n".join(lines)
+
+    def finish(self):
+        """Stops recording and prints the report to stderr and the log"""
+        if not self.enabled:
+            return
+        self.stop()
+        self.enabled = False
+        report = self.get_report()
+        logger.info(report)
+        try:
+            print(report, file=sys.stderr)
+        except Exception:
+            pass
+
+
+startup_profiler = StartupProfiler()
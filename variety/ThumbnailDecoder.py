@@ -0,0 +1,104 @@
+# -*- Mode: Python; coding: utf-8; indent-tabs-mode: nil; tab-width: 4 -*-
+### BEGIN LICENSE
+# Copyright (c) 2012, Peter Levi <peterlevi@peterlevi.com>
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 3, as published
+# by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranties of
+# MERCHANTABILITY, SATISFACTORY QUALITY, or FITNESS FOR A PARTICULAR
+# PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+### END LICENSE
+
+import heapq
+import itertools
+import logging
+import os
+import threading
+
+logger = logging.getLogger("variety")
+
+
+class ThumbnailDecoder:
+    """
+    A small pool of decoding threads fed from a priority queue.
+    Priorities are computed by priority_fn(job) (lower is more urgent) and are re-evaluated
+    whenever reprioritize() is called, e.g. when the thumbs window is scrolled.
+    """
+
+    def __init__(self, priority_fn, workers=None):
+        self.priority_fn = priority_fn
+        self.workers = workers or min(4, os.cpu_count() or 1)
+        self.queue = []
+        self.counter = itertools.count()
+        self.dirty = False
+        self.cancelled = False
+        self.condition = threading.Condition()
+        self.threads = []
+
+    def start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name="ThumbnailDecoder-%d" % i)
+            thread.daemon = True
+            thread.start()
+            self.threads.append(thread)
+
+    def submit(self, job, decode_fn, callback):
+        """
+        Queues decode_fn(job) and calls callback(job, result) on the decoding thread when done.
+        result is None if decoding failed.
+        """
+        with self.condition:
+            if self.cancelled:
+                return
+            entry = [self.priority_fn(job), next(self.counter), job, decode_fn, callback]
+            heapq.heappush(self.queue, entry)
+            self.condition.notify()
+
+    def reprioritize(self):
+        with self.condition:
+            self.dirty = True
+
+    def cancel(self):
+        with self.condition:
+            self.cancelled = True
+            self.queue = []
+            self.condition.notify_all()
+
+    def is_cancelled(self):
+        return self.cancelled
+
+    def _pop(self):
+        with self.condition:
+            while not self.queue and not self.cancelled:
+                self.condition.wait()
+            if self.cancelled:
+                return None
+            if self.dirty:
+                for entry in self.queue:
+                    entry[0] = self.priority_fn(entry[2])
+                heapq.heapify(self.queue)
+                self.dirty = False
+            return heapq.heappop(self.queue)
+
+    def _worker(self):
+        while True:
+            entry = self._pop()
+            if entry is None:
+                return
+            _, _, job, decode_fn, callback = entry
+            try:
+                result = decode_fn(job)
+            except Exception:
+                logger.debug(lambda: "Could not decode thumbnail for %s" % str(job))
+                result = None
+            if self.cancelled:
+                return
+            try:
+                callback(job, result)
+            except Exception:
+                logger.exception(lambda: "Error in thumbnail decoder callback")
@@ -350,6 +350,10 @@ class ThumbsManager:
             self.screen = screen
             self.folders = folders
 
+            if self.thumbs_window:
+                # stop decoding thumbnails for the old window right away
+                self.thumbs_window.cancel_thumbs()
+
             def _go():
                 try:
                     if self.thumbs_window:
@@ -19,9 +19,11 @@ import os
 import threading
 import time
 
-from gi.repository import Gdk, GdkPixbuf, GObject, Gtk
+from gi.repository import Gdk, GObject, Gtk
 
 from variety.profile import get_profile_wm_class
+from variety.ImageLoader import ImageLoader
+from variety.ThumbnailDecoder import ThumbnailDecoder
 from variety.Util import Util, on_gtk
 
 logger = logging.getLogger("variety")
@@ -106,6 +108,14 @@ class ThumbsWindow(Gtk.Window):
 
         self.add(eventbox)
 
+        # Thumbnails are decoded in parallel, those closest to the visible area first
+        self.visible_range = (0, self._window_length())
+        self.decoder = ThumbnailDecoder(self._thumb_priority)
+        adj = self._get_adjustment()
+        if adj:
+            adj.connect("value-changed", self._on_scrolled)
+            adj.connect("changed", self._on_scrolled)
+
         self.image_count = 0
 
         self.active_file = None
@@ -135,6 +145,8 @@ class ThumbsWindow(Gtk.Window):
 
         self._show()
 
+        self.decoder.start()
+
         thumbs_thread = threading.Thread(target=self._thumbs_thread)
         thumbs_thread.daemon = True
         thumbs_thread.start()
@@ -178,31 +190,76 @@ class ThumbsWindow(Gtk.Window):
         except Exception:
             logger.exception(lambda: "Error while creating thumbs:")
 
+    def _get_adjustment(self):
+        return (
+            self.scroll.get_hadjustment() if self.is_horizontal() else self.scroll.get_vadjustment()
+        )
+
+    def _on_scrolled(self, adj):
+        page = adj.get_page_size() or self._window_length()
+        self.visible_range = (adj.get_value(), adj.get_value() + page)
+        self.decoder.reprioritize()
+
+    def _thumb_priority(self, image_info):
+        """Distance in pixels from the thumbnail to the currently visible part of the window"""
+        lo, hi = self.visible_range
+        start = image_info["start"]
+        end = start + image_info["size"]
+        if end < lo:
+            return lo - end
+        elif start > hi:
+            return start - hi
+        else:
+            return 0
+
+    def _thumb_size(self, file):
+        """Computes the thumbnail size from the image header only, without decoding it"""
+        width, height = ImageLoader.get_size(file)
+        if not width or not height:
+            raise Exception("Not an image or unsupported image format")
+        if self.is_horizontal():
+            return max(1, min(10000, int(round(width * self.breadth / height)))), self.breadth
+        else:
+            return self.breadth, max(1, min(10000, int(round(height * self.breadth / width))))
+
+    def _decode_thumb(self, image_info):
+        return ImageLoader.load_thumbnail_pixbuf(image_info["file"], *image_info["thumb_size"])
+
+    def _on_thumb_decoded(self, image_info, pixbuf):
+        if not pixbuf:
+            logger.warning(
+                lambda: "Could not create thumbnail for file %s. File may be missing or invalid."
+                % image_info["file"]
+            )
+            return
+
+        def _set():
+            if self.running and not image_info.get("removed"):
+                image_info["thumb"].set_from_pixbuf(pixbuf)
+
+        Util.add_mainloop_task(_set)
+
+    def cancel_thumbs(self):
+        self.decoder.cancel()
+
     def add_image(self, file, at_front=False):
         try:
-            if self.is_horizontal():
-                pixbuf = GdkPixbuf.Pixbuf.new_from_file_at_size(file, 10000, self.breadth)
-            else:
-                pixbuf = GdkPixbuf.Pixbuf.new_from_file_at_size(file, self.breadth, 10000)
+            thumb_size = self._thumb_size(file)
         except Exception:
             logger.warning(
                 lambda: "Could not create thumbnail for file %s. File may be missing or invalid."
                 % file
             )
-            pixbuf = None
+            thumb_size = None
 
         def _go():
             image_size = (
-                0
-                if not pixbuf
-                else pixbuf.get_width()
-                if self.is_horizontal()
-                else pixbuf.get_height()
+                0 if not thumb_size else thumb_size[0] if self.is_horizontal() else thumb_size[1]
             )
 
             thumb = Gtk.Image()
-            if pixbuf:
-                thumb.set_from_pixbuf(pixbuf)
+            if thumb_size:
+                thumb.set_size_request(*thumb_size)
             thumb.set_visible(True)
 
             overlay = Gtk.Overlay()
@@ -223,6 +280,7 @@ class ThumbsWindow(Gtk.Window):
                 "eventbox": eventbox,
                 "thumb": thumb,
                 "size": image_size,
+                "thumb_size": thumb_size,
                 "overlay": overlay,
             }
             if at_front:
@@ -266,6 +324,11 @@ class ThumbsWindow(Gtk.Window):
             if file == self.active_file or position == self.active_position:
                 self.mark_active(self.active_file, self.active_position)
 
+            if thumb_size:
+                if at_front:
+                    self.decoder.reprioritize()
+                self.decoder.submit(image_info, self._decode_thumb, self._on_thumb_decoded)
+
         Util.add_mainloop_task(_go)
 
     def _window_length(self):
@@ -311,6 +374,7 @@ class ThumbsWindow(Gtk.Window):
                 self.box.remove(eventbox)
                 eventbox.destroy()
                 thumb.destroy()
+                info["removed"] = True
                 self.total_width -= info["size"]
                 self.update_size()
 
@@ -375,6 +439,7 @@ class ThumbsWindow(Gtk.Window):
     def destroy(self, widget=False):
         logger.debug(lambda: "Destroying thumb window %s, %d" % (str(self), time.time()))
         self.running = False
+        self.decoder.cancel()
         self.autoscroll_event.set()
         super(ThumbsWindow, self).destroy()
 
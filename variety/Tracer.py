@@ -0,0 +1,107 @@
+# -*- Mode: Python; coding: utf-8; indent-tabs-mode: nil; tab-width: 4 -*-
+### BEGIN LICENSE
+# Copyright (c) 2012, Peter Levi <peterlevi@peterlevi.com>
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 3, as published
+# by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranties of
+# MERCHANTABILITY, SATISFACTORY QUALITY, or FITNESS FOR A PARTICULAR
+# PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+### END LICENSE
+
+import collections
+import contextlib
+import json
+import logging
+import os
+import threading
+import time
+
+from variety.Metrics import metrics
+
+logger = logging.getLogger("variety")
+
+
+class Tracer:
+    """
+    Records timed, annotated spans in a rolling buffer that can be dumped as Chrome trace-event
+    JSON (viewable in chrome://tracing or Perfetto).
+    Span durations are also recorded in the metrics registry under the span's category,
+    labeled with the span name.
+    """
+
+    def __init__(self, capacity=5000):
+        self.events = collections.deque(maxlen=capacity)
+        self.thread_names = {}
+        self.local = threading.local()
+        self.lock = threading.Lock()
+
+    def _stack(self):
+        stack = getattr(self.local, "stack", None)
+        if stack is None:
+            stack = self.local.stack = []
+        return stack
+
+    @contextlib.contextmanager
+    def span(self, name, cat="variety", **args):
+        """
+        Context manager that records the enclosed block as a span.
+        Code running inside it can add arguments to the span with annotate().
+        """
+        stack = self._stack()
+        span_args = dict(args)
+        stack.append(span_args)
+        start = time.time()
+        try:
+            yield span_args
+        finally:
+            duration = time.time() - start
+            stack.pop()
+            tid = threading.get_ident()
+            event = {
+                "name": name,
+                "cat": cat,
+                "ph": "X",
+                "ts": int(start * 1e6),
+                "dur": int(duration * 1e6),
+                "pid": os.getpid(),
+                "tid": tid,
+                "args": span_args,
+            }
+            with self.lock:
+                self.events.append(event)
+                self.thread_names[tid] = threading.current_thread().name
+            metrics.observe(cat, duration, label=name)
+
+    def annotate(self, **args):
+        """Adds arguments to the innermost span open on the current thread, if any"""
+        stack = self._stack()
+        if stack:
+            stack[-1].update(args)
+
+    def get_trace(self):
+        with self.lock:
+            events = list(self.events)
+            thread_names = dict(self.thread_names)
+        pid = os.getpid()
+        metadata = [
+            {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+            for tid, name in thread_names.items()
+        ]
+        return {"traceEvents": metadata + events, "displayTimeUnit": "ms"}
+
+    def dump(self, path):
+        """Writes the buffered spans to path as Chrome trace-event JSON"""
+        trace = self.get_trace()
+        with open(path + ".partial", "w") as f:
+            json.dump(trace, f)
+        os.rename(path + ".partial", path)
+        logger.info(lambda: "Dumped %d trace events to %s" % (len(trace["traceEvents"]), path))
+
+
+tracer = Tracer()
@@ -33,10 +33,11 @@ import time
 import urllib.parse
 from itertools import cycle
 
-import bs4
 import requests
-from PIL import Image
 
+from variety.DisplayGeometry import display_geometry
+from variety.ImageLoader import ImageLoader
+from variety.LazyModule import LazyModule
 from variety_lib import get_version
 
 # fmt: off
@@ -48,6 +49,8 @@ from gi.repository import Gdk, GdkPixbuf, GExiv2, Gio, GLib, Pango  # isort:skip
 # fmt: on
 
 
+bs4 = LazyModule("bs4")
+
 USER_AGENT = "Variety Wallpaper Changer " + get_version()
 
 random.seed()
@@ -382,16 +385,7 @@ class Util:
 
     @staticmethod
     def is_animated_gif(filename):
-        if not filename.lower().endswith(".gif"):
-            return False
-
-        gif = Image.open(filename)
-        try:
-            gif.seek(1)
-        except EOFError:
-            return False
-        else:
-            return True
+        return ImageLoader.is_animated_gif(filename)
 
     @staticmethod
     def list_files(
@@ -601,30 +595,15 @@ class Util:
 
     @staticmethod
     def get_size(image):
-        format, image_width, image_height = GdkPixbuf.Pixbuf.get_file_info(image)
-        if not format:
-            raise Exception("Not an image or unsupported image format")
-        else:
-            return image_width, image_height
+        return ImageLoader.get_size(image)
 
     @staticmethod
     def get_primary_display_size(hidpi_scaled=True):
-        display = Gdk.Display.get_default()
-        monitor = display.get_primary_monitor()
-        if not monitor:
-            monitor = display.get_monitor(0)
-
-        if monitor:
-            geometry = monitor.get_geometry()
-            scale = monitor.get_scale_factor() if hidpi_scaled else 1.0
-            return int(geometry.width * scale), int(geometry.height * scale)
-        else:
-            return Util.get_multimonitor_display_size()
+        return display_geometry.get_primary_size(hidpi_scaled)
 
     @staticmethod
     def get_multimonitor_display_size():
-        screen = Gdk.Screen.get_default()
-        return screen.get_width(), screen.get_height()
+        return display_geometry.get_total_size()
 
     @staticmethod
     def find_unique_name(filename):
@@ -835,7 +814,7 @@ class Util:
 
     @staticmethod
     def get_thumbnail_data(image, width, height):
-        pixbuf = GdkPixbuf.Pixbuf.new_from_file_at_size(image, width, height)
+        pixbuf = ImageLoader.load_pixbuf_at_scale(image, width, height)
         return pixbuf.save_to_bufferv("jpeg", [], [])[1]
 
     @staticmethod
@@ -909,11 +888,16 @@ class Util:
             logger.exception(lambda: "Could not delete {}, ignoring".format(filepath))
 
     @staticmethod
-    def copy_with_replace(from_path, to_path, search_replace_map):
+    def read_with_replace(from_path, search_replace_map):
         with open(from_path, "r") as file:
             data = file.read()
         for search, replace in search_replace_map.items():
             data = data.replace(search, replace)
+        return data
+
+    @staticmethod
+    def copy_with_replace(from_path, to_path, search_replace_map):
+        data = Util.read_with_replace(from_path, search_replace_map)
         with open(to_path + ".partial", "w") as file:
             file.write(data)
             file.flush()
@@ -91,6 +91,41 @@ To set a specific wallpaper: %prog --set /some/local/image.jpg
         ),
     )
 
+    parser.add_option(
+        "--profile-startup",
+        action="store_true",
+        dest="profile_startup",
+        help=_(
+            "Measure the time spent in each startup phase and module import and print a report "
+            "once Variety has started. Used only when initially starting Variety."
+        ),
+    )
+
+    parser.add_option(
+        "--profile-sampling",
+        action="store",
+        type="int",
+        dest="profile_sampling",
+        metavar="RATE",
+        help=_(
+            "Run a low-overhead sampling profiler that records the stacks of all threads RATE "
+            "times per second (100 is a good start). Write the collected stacks with "
+            "--profile-dump, or by sending SIGUSR1 to the Variety process. "
+            "Used only when initially starting Variety."
+        ),
+    )
+
+    parser.add_option(
+        "--profile-dump",
+        action="store",
+        dest="profile_dump",
+        help=_(
+            "Write the stacks collected by the sampling profiler to the given file in the "
+            "collapsed-stack format used by flame graph tools, absolute path required. "
+            "Used only when the application is already running."
+        ),
+    )
+
     parser.add_option(
         "-q", "--quit", action="store_true", dest="quit", help=_("Make the running instance quit")
     )
@@ -107,6 +142,34 @@ To set a specific wallpaper: %prog --set /some/local/image.jpg
         ),
     )
 
+    parser.add_option(
+        "--stats",
+        action="store_true",
+        dest="stats",
+        help=_(
+            "Print runtime statistics of the running instance: counters, gauges, cache hit rates "
+            "and latencies. Used only when the application is already running."
+        ),
+    )
+
+    parser.add_option(
+        "--json",
+        action="store_true",
+        dest="json",
+        help=_("Use JSON output for --stats"),
+    )
+
+    parser.add_option(
+        "--dump-trace",
+        action="store",
+        dest="dump_trace",
+        help=_(
+            "Write the recently recorded wallpaper-setting traces to the given file in Chrome "
+            "trace-event JSON format, absolute path required. "
+            "Used only when the application is already running."
+        ),
+    )
+
     parser.add_option(
         "--set",
         "--set-wallpaper",
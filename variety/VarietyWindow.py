@@ -29,15 +29,19 @@ import urllib.parse
 import webbrowser
 from typing import List
 
-from PIL import Image as PILImage
-
 from jumble.Jumble import Jumble
 from variety import indicator
 from variety.AboutVarietyDialog import AboutVarietyDialog
+from variety.AlbumIndex import AlbumIndex
+from variety.DisplayGeometry import display_geometry
 from variety.DominantColors import DominantColors
 from variety.FlickrDownloader import FlickrDownloader
 from variety.ImageFetcher import ImageFetcher
+from variety.ImageLoader import ImageLoader
+from variety.LazyModule import LazyModule
+from variety.Metrics import metrics
 from variety.Options import Options
+from variety.PathIndex import PathIndex
 from variety.plugins.downloaders.ConfigurableImageSource import ConfigurableImageSource
 from variety.plugins.downloaders.DefaultDownloader import SAFE_MODE_BLACKLIST
 from variety.plugins.downloaders.ImageSource import ImageSource
@@ -57,9 +61,15 @@ from variety.profile import (
 )
 from variety.QuotesEngine import QuotesEngine
 from variety.QuoteWriter import QuoteWriter
+from variety.RenderCache import RenderCache, link_or_copy
+from variety.SamplingProfiler import sampling_profiler
+from variety.Scheduler import Scheduler
+from variety.StartupProfiler import startup_profiler
 from variety.ThumbsManager import ThumbsManager
+from variety.Tracer import tracer
 from variety.Util import Util, _, debounce, on_gtk, throttle
 from variety.VarietyOptionParser import parse_options
+from variety.WallpaperSetter import WallpaperHelper, create_native_setter, get_desktop
 from variety.WelcomeDialog import WelcomeDialog
 from variety_lib import varietyconfig
 
@@ -71,6 +81,9 @@ from gi.repository import Gdk, Gio, GObject, Gtk, Notify  # isort:skip
 Notify.init("Variety")
 # fmt: on
 
+# PIL is only needed once an intermediate render is encoded
+Image = LazyModule("PIL.Image")
+
 
 random.seed()
 logger = logging.getLogger("variety")
@@ -94,6 +107,12 @@ class VarietyWindow(Gtk.Window):
     # How many unseen_downloads max to for every downloader.
     MAX_UNSEEN_PER_DOWNLOADER = 10
 
+    # How often to re-read the desktop wallpaper via get_wallpaper when no change was detected
+    DESKTOP_WALLPAPER_RECHECK = 600
+
+    # Format of the lossless intermediate files of the rendering chain, see new_render_file
+    RENDER_INTERMEDIATE_EXTENSION = ".ppm"
+
     @classmethod
     def get_instance(cls):
         return VarietyWindow.instance
@@ -104,6 +123,13 @@ class VarietyWindow(Gtk.Window):
     def start(self, cmdoptions):
         self.running = True
 
+        self.scheduler = Scheduler(name="VarietyScheduler")
+        self.scheduler.start()
+        self.register_metrics_gauges()
+
+        display_geometry.watch()
+        display_geometry.add_listener(self.on_display_geometry_changed)
+
         self.about = None
         self.preferences_dialog = None
         self.ind = None
@@ -116,7 +142,28 @@ class VarietyWindow(Gtk.Window):
         except Exception:
             self.gsettings = None
 
-        self.prepare_config_folder()
+        self.wallpaper_setter = None
+        self.wallpaper_setter_key = None
+        self.script_customized = None
+
+        # the wallpaper currently shown by the desktop, as last set or read by Variety
+        self.desktop_wallpaper = None
+        self.desktop_wallpaper_checked = 0
+        if self.gsettings:
+            self.gsettings.connect("changed::picture-uri", self.on_desktop_wallpaper_changed)
+            # GSettings only emits changed for keys that have been read, and self.gsettings keeps
+            # the object (and the subscription) alive
+            self.gsettings.get_string("picture-uri")
+
+        # folder -> wallpaper files Variety created there, see cleanup_old_wallpapers
+        self.wallpaper_files = {}
+        self.render_cache = None
+        self.source_index = None
+        self.favorites_operations_index = None
+        self.thumbs_folders_index = None
+
+        with startup_profiler.phase("prepare_config_folder"):
+            self.prepare_config_folder()
         self.dialogs = []
 
         fr_file = os.path.join(self.config_folder, ".firstrun")
@@ -127,14 +174,16 @@ class VarietyWindow(Gtk.Window):
             self.show_welcome_dialog()
             first_run_internet_enabled = self.show_privacy_dialog()
 
-        self.thumbs_manager = ThumbsManager(self)
+        with startup_profiler.phase("ThumbsManager"):
+            self.thumbs_manager = ThumbsManager(self)
 
         self.quotes_engine = None
         self.quote = None
         self.quote_favorites_contents = ""
         self.clock_thread = None
 
-        self.perform_upgrade()
+        with startup_profiler.phase("perform_upgrade"):
+            self.perform_upgrade()
 
         self.events = []
 
@@ -142,12 +191,17 @@ class VarietyWindow(Gtk.Window):
         self.prepared_cleared = False
         self.prepared_lock = threading.Lock()
 
-        self.register_clipboard()
+        with startup_profiler.phase("register_clipboard"):
+            self.register_clipboard()
 
         self.do_set_wp_lock = threading.Lock()
+        self.pending_wp = None
+        self.pending_wp_lock = threading.Lock()
+        self.wp_task_queued = False
         self.auto_changed = True
 
-        self.process_command(cmdoptions, initial_run=True)
+        with startup_profiler.phase("process_command"):
+            self.process_command(cmdoptions, initial_run=True)
 
         # load config
         self.options = None
@@ -156,23 +210,34 @@ class VarietyWindow(Gtk.Window):
 
         logger.info(lambda: "Using data_path %s" % varietyconfig.get_data_path())
         self.jumble = Jumble(
-            [os.path.join(os.path.dirname(__file__), "plugins", "builtin"), self.plugins_folder]
+            [os.path.join(os.path.dirname(__file__), "plugins", "builtin"), self.plugins_folder],
+            manifest_file=os.path.join(self.config_folder, ".plugins_manifest.json"),
         )
 
         setattr(self.jumble, "parent", self)
-        self.jumble.load()
+        with startup_profiler.phase("Jumble.load"):
+            self.jumble.load()
 
         self.image_count = -1
         self.image_colors_cache = {}
 
-        self.load_downloader_plugins()
-        self.create_downloaders_cache()
-        self.reload_config(is_on_start=True, first_run_internet_enabled=first_run_internet_enabled)
-        self.load_banned()
-        self.load_last_change_time()
-        self.update_indicator(auto_changed=False)
+        with startup_profiler.phase("load_downloader_plugins"):
+            self.load_downloader_plugins()
+        with startup_profiler.phase("create_downloaders_cache"):
+            self.create_downloaders_cache()
+        with startup_profiler.phase("reload_config"):
+            self.reload_config(
+                is_on_start=True, first_run_internet_enabled=first_run_internet_enabled
+            )
+        with startup_profiler.phase("load_banned"):
+            self.load_banned()
+        with startup_profiler.phase("load_last_change_time"):
+            self.load_last_change_time()
+        with startup_profiler.phase("update_indicator"):
+            self.update_indicator(auto_changed=False)
 
-        self.start_threads()
+        with startup_profiler.phase("start_threads"):
+            self.start_threads()
 
         if first_run:
             self.first_run(fr_file)
@@ -180,8 +245,16 @@ class VarietyWindow(Gtk.Window):
         def _delayed():
             self.create_preferences_dialog()
 
-            for plugin in self.jumble.get_plugins(clazz=IVarietyPlugin):
-                threading.Timer(0, plugin["plugin"].on_variety_start_complete).start()
+            def _start_complete(plugin):
+                if plugin.is_subclass(IVarietyPlugin):
+                    self.scheduler.submit("background", plugin["plugin"].on_variety_start_complete)
+
+            with self.jumble.lock:
+                # plugins that are loaded later on demand get the call when they are loaded
+                self.jumble.add_load_listener(_start_complete)
+                for plugin in self.jumble.get_plugins(clazz=IVarietyPlugin):
+                    if plugin.is_loaded():
+                        _start_complete(plugin)
 
         GObject.timeout_add(1000, _delayed)
 
@@ -290,7 +363,7 @@ class VarietyWindow(Gtk.Window):
             Util.copy_with_replace(
                 varietyconfig.get_data_file("scripts", "set_wallpaper"),
                 os.path.join(self.scripts_folder, "set_wallpaper"),
-                {DEFAULT_PROFILE_PATH.replace("~", "$HOME"): get_profile_path(expanded=True)},
+                VarietyWindow.get_script_replacements(),
             )
 
         if not os.path.exists(os.path.join(self.scripts_folder, "get_wallpaper")):
@@ -301,7 +374,7 @@ class VarietyWindow(Gtk.Window):
             Util.copy_with_replace(
                 varietyconfig.get_data_file("scripts", "get_wallpaper"),
                 os.path.join(self.scripts_folder, "get_wallpaper"),
-                {DEFAULT_PROFILE_PATH.replace("~", "$HOME"): get_profile_path(expanded=True)},
+                VarietyWindow.get_script_replacements(),
             )
 
         # make all scripts executable:
@@ -447,19 +520,12 @@ class VarietyWindow(Gtk.Window):
             if not enabled:
                 continue
 
-            # prepare a cache for albums to avoid walking those folders on every change
-            if type in (Options.SourceType.ALBUM_FILENAME, Options.SourceType.ALBUM_DATE):
-                images = Util.list_files(folders=(location,), filter_func=Util.is_image)
-                if type == Options.SourceType.ALBUM_FILENAME:
-                    images = sorted(images)
-                elif type == Options.SourceType.ALBUM_DATE:
-                    images = sorted(images, key=os.path.getmtime)
-                else:
-                    raise Exception("Unsupported album type")
-
-                if images:
-                    self.albums.append({"path": os.path.normpath(location), "images": images})
-
+            # albums are indexed lazily on first use, and the indexes survive config reloads
+            if type == Options.SourceType.ALBUM_FILENAME:
+                self.albums.append(AlbumIndex.get(location, AlbumIndex.BY_FILENAME))
+                continue
+            elif type == Options.SourceType.ALBUM_DATE:
+                self.albums.append(AlbumIndex.get(location, AlbumIndex.BY_DATE))
                 continue
 
             if type not in self.options.get_downloader_source_types():
@@ -482,6 +548,8 @@ class VarietyWindow(Gtk.Window):
                         % (type, location)
                     )
 
+        AlbumIndex.retain_only(self.albums)
+
         for downloader in Options.SIMPLE_DOWNLOADERS:
             downloader.update_download_folder(self.real_download_folder)
 
@@ -492,11 +560,19 @@ class VarietyWindow(Gtk.Window):
 
         self.filters = [f[2] for f in self.options.filters if f[0]]
 
-        self.min_width = 0
-        self.min_height = 0
-        if self.options.min_size_enabled:
-            self.min_width = Gdk.Screen.get_default().get_width() * self.options.min_size // 100
-            self.min_height = Gdk.Screen.get_default().get_height() * self.options.min_size // 100
+        self.update_min_size()
+
+        # rebuilt on first use, see get_source and determine_favorites_operation
+        self.source_index = None
+        self.favorites_operations_index = None
+
+        render_cache_size = self.options.render_cache_size * 1024 * 1024
+        if not self.render_cache:
+            self.render_cache = RenderCache(
+                os.path.join(self.config_folder, "render_cache"), render_cache_size
+            )
+        else:
+            self.render_cache.set_max_size(render_cache_size)
 
         self.log_options()
 
@@ -537,14 +613,32 @@ class VarietyWindow(Gtk.Window):
         self.update_indicator(auto_changed=False)
 
         if self.previous_options is None or self.options.filters != self.previous_options.filters:
-            threading.Timer(0.1, self.refresh_wallpaper).start()
+            self.scheduler.schedule(0.1, "wallpaper", self.refresh_wallpaper)
         else:
-            threading.Timer(0.1, self.refresh_texts).start()
+            self.scheduler.schedule(0.1, "wallpaper", self.refresh_texts)
 
         if self.events:
             for e in self.events:
                 e.set()
 
+    def update_min_size(self):
+        self.min_width = 0
+        self.min_height = 0
+        if self.options.min_size_enabled:
+            width, height = display_geometry.get_total_size()
+            self.min_width = width * self.options.min_size // 100
+            self.min_height = height * self.options.min_size // 100
+
+    def on_display_geometry_changed(self, layout):
+        if not self.running:
+            return
+        self.update_min_size()
+        if self.options.min_size_enabled:
+            # the prepared images were checked against the old minimum size
+            self.clear_prepared_queue()
+        # re-render from the original image, everything rendered so far was sized for the old layout
+        self.scheduler.schedule(0.5, "wallpaper", self.refresh_wallpaper)
+
     def clear_prepared_queue(self):
         self.filters_warning_shown = False
         logger.info(lambda: "Clearing prepared queue")
@@ -648,8 +742,7 @@ class VarietyWindow(Gtk.Window):
             except Exception:
                 logger.exception(lambda: "Could not delete download folder contents " + folder)
             if self.current and Util.file_in(self.current, folder):
-                change_timer = threading.Timer(0, self.next_wallpaper)
-                change_timer.start()
+                self.scheduler.submit("wallpaper", self.next_wallpaper)
 
     def load_banned(self):
         self.banned = set()
@@ -982,6 +1075,27 @@ class VarietyWindow(Gtk.Window):
             except Exception:
                 logger.exception(lambda: "Exception in clock_thread")
 
+    def register_metrics_gauges(self):
+        metrics.register_gauge("prepared", lambda: len(self.prepared))
+        metrics.register_gauge("image_colors_cache", lambda: len(self.image_colors_cache))
+        metrics.register_gauge(
+            "render_cache_bytes", lambda: self.render_cache.get_size() if self.render_cache else 0
+        )
+        metrics.register_gauge("threads", threading.active_count)
+
+        def _queue_stat(queue, key):
+            return lambda: self.scheduler.get_stats()["queues"][queue][key]
+
+        for queue in Scheduler.QUEUES:
+            metrics.register_gauge("scheduler.depth", _queue_stat(queue, "depth"), label=queue)
+            metrics.register_gauge(
+                "scheduler.avg_wait_ms", _queue_stat(queue, "avg_wait_ms"), label=queue
+            )
+
+    def get_stats(self, as_json=False):
+        return metrics.format(as_json)
+
+    @metrics.timed("find_images")
     def find_images(self):
         self.prepared_cleared = False
         images = self.select_random_images(100 if not self.options.safe_mode else 30)
@@ -995,9 +1109,16 @@ class VarietyWindow(Gtk.Window):
                     # abandon this search
                     return
 
+                if img in found:
+                    continue
+
                 try:
-                    if not img in found and self.image_ok(img, fuzziness):
-                        # print "OK at fz %d: %s" % (fuzziness, img)
+                    ok = self.image_ok(img, fuzziness)
+                    metrics.inc(
+                        "image_ok.passed" if ok else "image_ok.rejected",
+                        label="fuzziness=%d" % fuzziness,
+                    )
+                    if ok:
                         found.add(img)
                         if len(self.prepared) < 3 and not self.prepared_cleared:
                             with self.prepared_lock:
@@ -1059,9 +1180,7 @@ class VarietyWindow(Gtk.Window):
                     )
 
                 # trigger download after some interval to reduce resource usage while the wallpaper changes
-                delay_dl_timer = threading.Timer(2, self.trigger_download)
-                delay_dl_timer.daemon = True
-                delay_dl_timer.start()
+                self.scheduler.schedule(2, "background", self.trigger_download)
             except Exception:
                 logger.exception(lambda: "Error in prepare thread:")
 
@@ -1166,6 +1285,9 @@ class VarietyWindow(Gtk.Window):
             logger.exception(lambda: "Could not download wallpaper:")
             file = None
 
+        metrics.inc(
+            "downloads" if file else "download_failures", label=downloader.get_source_type()
+        )
         if file:
             self.register_downloaded_file(file)
             downloader.state["last_download_success"] = time.time()
@@ -1250,10 +1372,29 @@ class VarietyWindow(Gtk.Window):
 
         self.thumbs_manager.mark_active(file=filename, position=self.position)
 
-        def _do_set_wp():
-            self.do_set_wp(filename, refresh_level)
-
-        threading.Timer(0, _do_set_wp).start()
+        # at most one do_set_wp task is queued or running: requests arriving meanwhile are merged
+        # into it, keeping the latest filename and the most complete (lowest) refresh level
+        with self.pending_wp_lock:
+            if self.pending_wp:
+                refresh_level = min(refresh_level, self.pending_wp[1])
+            self.pending_wp = (filename, refresh_level)
+            if self.wp_task_queued:
+                return
+            self.wp_task_queued = True
+        self.scheduler.submit("wallpaper", self.run_pending_wp)
+
+    def run_pending_wp(self):
+        while True:
+            with self.pending_wp_lock:
+                if not self.pending_wp:
+                    self.wp_task_queued = False
+                    return
+                filename, refresh_level = self.pending_wp
+                self.pending_wp = None
+            try:
+                self.do_set_wp(filename, refresh_level)
+            except Exception:
+                logger.exception(lambda: "Could not set wallpaper %s" % filename)
 
     def build_imagemagick_filter_cmd(self, filename, target_file):
         if not self.filters:
@@ -1269,7 +1410,7 @@ class VarietyWindow(Gtk.Window):
         logger.info(lambda: "Applying filter: " + filter)
         cmd += filter + " "
 
-        cmd += shlex.quote(target_file)
+        cmd += self.render_target_arg(target_file)
         cmd = cmd.replace("%FILEPATH%", shlex.quote(filename))
         cmd = cmd.replace("%FILENAME%", shlex.quote(os.path.basename(filename)))
 
@@ -1295,7 +1436,7 @@ class VarietyWindow(Gtk.Window):
 
         cmd += clock_filter
         cmd += " "
-        cmd += shlex.quote(target_file)
+        cmd += self.render_target_arg(target_file)
         logger.info(lambda: "ImageMagick clock cmd: " + cmd)
         return cmd.encode("utf-8")
 
@@ -1342,6 +1483,55 @@ class VarietyWindow(Gtk.Window):
         except Exception:
             logger.exception(lambda: "Cannot write wallpaper.jpg.txt")
 
+    def new_render_file(self, stage, final=False):
+        """
+        Returns a new file in the wallpaper folder for the output of a do_set_wp stage. With
+        render_lossless_intermediates the outputs of stages that may be followed by others are
+        kept as uncompressed PPM, and only the final image is encoded, see finalize_render.
+        """
+        if self.options.render_lossless_intermediates and not final:
+            extension = VarietyWindow.RENDER_INTERMEDIATE_EXTENSION
+        else:
+            extension = "." + self.options.render_output_format
+        target_file = os.path.join(
+            self.wallpaper_folder, "wallpaper-%s-%s%s" % (stage, Util.random_hash(), extension)
+        )
+        self.register_wallpaper_file(target_file)
+        return target_file
+
+    def render_output_options(self, target_file):
+        """ImageMagick options for writing target_file, i.e. the configured JPEG quality"""
+        if target_file.endswith(".jpg"):
+            return "-quality %d" % self.options.render_output_quality
+        return ""
+
+    def render_target_arg(self, target_file):
+        """ImageMagick output argument for target_file, with the configured JPEG quality"""
+        options = self.render_output_options(target_file)
+        return (options + " " if options else "") + shlex.quote(target_file)
+
+    def finalize_render(self, to_set):
+        """Encodes the last stage's output in the output format, if it is an intermediate"""
+        if not to_set.endswith(VarietyWindow.RENDER_INTERMEDIATE_EXTENSION):
+            return to_set
+        target_file = self.new_render_file("rendered", final=True)
+        try:
+            Image.open(to_set).save(
+                target_file, quality=self.options.render_output_quality, compress_level=1
+            )
+            return target_file
+        except Exception:
+            logger.exception(lambda: "Could not encode %s, trying ImageMagick" % to_set)
+        cmd = "convert %s %s" % (shlex.quote(to_set), self.render_target_arg(target_file))
+        tracer.annotate(spawned_process="convert")
+        result = os.system(cmd.encode("utf-8"))
+        if result == 0:
+            return target_file
+        logger.warning(
+            lambda: "Could not encode the wallpaper, missing ImageMagick? Resultcode: %d" % result
+        )
+        return to_set
+
     def apply_filters(self, to_set, refresh_level):
         try:
             if self.filters:
@@ -1356,11 +1546,10 @@ class VarietyWindow(Gtk.Window):
                     or not self.post_filter_filename
                 ):
                     self.post_filter_filename = to_set
-                    target_file = os.path.join(
-                        self.wallpaper_folder, "wallpaper-filter-%s.jpg" % Util.random_hash()
-                    )
+                    target_file = self.new_render_file("filter")
                     cmd = self.build_imagemagick_filter_cmd(to_set, target_file)
                     if cmd:
+                        tracer.annotate(spawned_process="convert")
                         result = os.system(cmd)
                         if result == 0:  # success
                             to_set = target_file
@@ -1380,13 +1569,15 @@ class VarietyWindow(Gtk.Window):
     def apply_auto_rotate(self, to_set):
         try:
             if self.options.wallpaper_auto_rotate:
-                target_file = os.path.join(
-                    self.wallpaper_folder, "wallpaper-auto-rotated-%s.jpg" % Util.random_hash()
+                target_file = self.new_render_file("auto-rotated")
+                cmd = "convert %s -auto-orient %s" % (
+                    shlex.quote(to_set),
+                    self.render_target_arg(target_file),
                 )
-                cmd = "convert %s -auto-orient %s" % (shlex.quote(to_set), shlex.quote(target_file))
                 logger.info(lambda: "ImageMagick auto-rotate cmd: " + cmd)
                 cmd = cmd.encode("utf-8")
 
+                tracer.annotate(spawned_process="convert")
                 result = os.system(cmd)
                 if result == 0:  # success
                     to_set = target_file
@@ -1410,7 +1601,11 @@ class VarietyWindow(Gtk.Window):
             self.display_modes_cache = [m[0] for m in modes]
         return getattr(self, "display_modes_cache")
 
-    def apply_display_mode(self, to_set):
+    def apply_display_mode(self, to_set, final=False):
+        """
+        :param final: whether no quote or clock stage follows, so the output can be written in
+        the output format directly
+        """
         try:
             mode = "os"
             modes = [
@@ -1419,21 +1614,27 @@ class VarietyWindow(Gtk.Window):
             if modes:
                 mode_data = modes[0].fn(to_set)
                 if mode_data.fixed_image_path:
+                    self.register_wallpaper_file(mode_data.fixed_image_path)
                     return mode_data.fixed_image_path, mode_data.set_wallpaper_param
+                elif mode_data.render:
+                    target_file = self.new_render_file("zoomed", final=final)
+                    if mode_data.render(target_file, self.render_output_options(target_file)):
+                        return target_file, mode_data.set_wallpaper_param
+                    logger.warning(lambda: "Could not render display mode %s" % modes[0].id)
+                    return to_set, "os"
                 elif not mode_data.imagemagick_cmd:
                     return to_set, mode_data.set_wallpaper_param
                 else:
-                    target_file = os.path.join(
-                        self.wallpaper_folder, "wallpaper-zoomed-%s.jpg" % Util.random_hash()
-                    )
+                    target_file = self.new_render_file("zoomed", final=final)
                     cmd = "convert %s %s %s" % (
                         shlex.quote(to_set),
                         mode_data.imagemagick_cmd,
-                        shlex.quote(target_file),
+                        self.render_target_arg(target_file),
                     )
                     logger.info(lambda: "ImageMagick display mode cmd: " + cmd)
                     cmd = cmd.encode("utf-8")
 
+                    tracer.annotate(spawned_process="convert")
                     result = os.system(cmd)
                     if result == 0:  # success
                         return target_file, mode
@@ -1451,15 +1652,15 @@ class VarietyWindow(Gtk.Window):
     def apply_quote(self, to_set):
         try:
             if self.options.quotes_enabled and self.quote:
-                quote_outfile = os.path.join(
-                    self.wallpaper_folder, "wallpaper-quote-%s.jpg" % Util.random_hash()
-                )
+                # the clock, when enabled, comes after the quote
+                quote_outfile = self.new_render_file("quote", final=not self.options.clock_enabled)
                 QuoteWriter.write_quote(
                     self.quote["quote"],
                     self.quote.get("author", None),
                     to_set,
                     quote_outfile,
                     self.options,
+                    quality=self.options.render_output_quality,
                 )
                 to_set = quote_outfile
             return to_set
@@ -1470,10 +1671,9 @@ class VarietyWindow(Gtk.Window):
     def apply_clock(self, to_set):
         try:
             if self.options.clock_enabled:
-                target_file = os.path.join(
-                    self.wallpaper_folder, "wallpaper-clock-%s.jpg" % Util.random_hash()
-                )
+                target_file = self.new_render_file("clock", final=True)
                 cmd = self.build_imagemagick_clock_cmd(to_set, target_file)
+                tracer.annotate(spawned_process="convert")
                 result = os.system(cmd)
                 if result == 0:  # success
                     to_set = target_file
@@ -1487,6 +1687,71 @@ class VarietyWindow(Gtk.Window):
             logger.exception(lambda: "Could not apply clock:")
             return to_set
 
+    def get_render_key(self, filename, should_apply_effects):
+        """
+        Returns the render cache key for filename with the current options, quote and display
+        layout, or None if the result should not be cached
+        """
+        if not self.render_cache or self.options.render_cache_size <= 0:
+            return None
+        if should_apply_effects and self.options.clock_enabled:
+            # a new render every minute, no point in caching it
+            return None
+        if should_apply_effects and len(set(f.strip() for f in self.filters)) > 1:
+            # build_imagemagick_filter_cmd picks a random filter on every render
+            return None
+        try:
+            state = {
+                "auto_rotate": self.options.wallpaper_auto_rotate,
+                "display_mode": self.options.wallpaper_display_mode,
+                "layout": display_geometry.get_layout(),
+                "filters": self.filters if should_apply_effects else [],
+                "output": [self.options.render_output_format, self.options.render_output_quality],
+            }
+            if should_apply_effects and self.options.quotes_enabled and self.quote:
+                state["quote"] = [
+                    self.quote["quote"],
+                    self.quote.get("author", None),
+                    self.options.quotes_font,
+                    self.options.quotes_text_color,
+                    self.options.quotes_bg_color,
+                    self.options.quotes_bg_opacity,
+                    self.options.quotes_text_shadow,
+                    self.options.quotes_width,
+                    self.options.quotes_hpos,
+                    self.options.quotes_vpos,
+                ]
+            return RenderCache.make_key(filename, state)
+        except Exception:
+            logger.exception(lambda: "Could not compute render cache key for %s" % filename)
+            return None
+
+    def get_cached_render(self, render_key):
+        """
+        Returns (file, display_mode_param) for a previously rendered wallpaper, linked into the
+        wallpaper folder so the cache can evict it independently, or None
+        """
+        if not render_key:
+            return None
+        try:
+            cached = self.render_cache.get(render_key)
+            if not cached:
+                return None
+            path, display_mode_param = cached
+            target_file = os.path.join(
+                self.wallpaper_folder,
+                "wallpaper-cached-%s%s" % (Util.random_hash(), os.path.splitext(path)[1]),
+            )
+            self.register_wallpaper_file(target_file)
+            link_or_copy(path, target_file)
+            logger.info(lambda: "Using cached render %s" % path)
+            # a later quote or clock refresh has to run the filters again
+            self.post_filter_filename = None
+            return target_file, display_mode_param or None
+        except Exception:
+            logger.exception(lambda: "Could not use cached render")
+            return None
+
     def apply_copyto_operation(self, to_set):
         if self.options.copyto_enabled:
             folder = self.get_actual_copyto_folder()
@@ -1496,6 +1761,7 @@ class VarietyWindow(Gtk.Window):
             )
             target_file = os.path.join(folder, target_fname)
             self.cleanup_old_wallpapers(folder, "variety-copied-wallpaper")
+            self.register_wallpaper_file(target_file)
             try:
                 shutil.copy(to_set, target_file)
                 os.chmod(
@@ -1524,7 +1790,8 @@ class VarietyWindow(Gtk.Window):
     @throttle(seconds=1, trailing_call=True)
     def do_set_wp(self, filename, refresh_level=RefreshLevel.ALL):
         logger.info(lambda: "Calling do_set_wp with %s, time: %s" % (filename, time.time()))
-        with self.do_set_wp_lock:
+        span = tracer.span("do_set_wp", cat="wallpaper", refresh_level=refresh_level)
+        with self.do_set_wp_lock, span as span_args:
             try:
                 if not os.access(filename, os.R_OK):
                     logger.info(
@@ -1532,6 +1799,11 @@ class VarietyWindow(Gtk.Window):
                     )
                     return
 
+                try:
+                    span_args["resolution"] = "%dx%d" % ImageLoader.get_size(filename)
+                except Exception:
+                    pass
+
                 self.write_filtered_wallpaper_origin(filename)
 
                 if filename != self.no_effects_on:
@@ -1540,28 +1812,59 @@ class VarietyWindow(Gtk.Window):
                 else:
                     should_apply_effects = False
 
-                to_set = filename
-                to_set = self.apply_auto_rotate(to_set)
+                render_key = self.get_render_key(filename, should_apply_effects)
+                with tracer.span("render_cache", cat="do_set_wp"):
+                    # a filters refresh is explicitly asking for the filters to run again
+                    cached = (
+                        self.get_cached_render(render_key)
+                        if refresh_level != VarietyWindow.RefreshLevel.FILTERS_AND_TEXTS
+                        else None
+                    )
+                if cached:
+                    to_set, display_mode_param = cached
+                else:
+                    to_set = filename
+                    with tracer.span("apply_auto_rotate", cat="do_set_wp"):
+                        to_set = self.apply_auto_rotate(to_set)
+
+                    if should_apply_effects:
+                        with tracer.span("apply_filters", cat="do_set_wp"):
+                            to_set = self.apply_filters(to_set, refresh_level)
+
+                    with tracer.span("apply_display_mode", cat="do_set_wp"):
+                        to_set, display_mode_param = self.apply_display_mode(
+                            to_set,
+                            final=not (
+                                should_apply_effects
+                                and (self.options.quotes_enabled or self.options.clock_enabled)
+                            ),
+                        )
 
-                if should_apply_effects:
-                    to_set = self.apply_filters(to_set, refresh_level)
+                    if should_apply_effects:
+                        with tracer.span("apply_quote", cat="do_set_wp"):
+                            to_set = self.apply_quote(to_set)
+                        with tracer.span("apply_clock", cat="do_set_wp"):
+                            to_set = self.apply_clock(to_set)
 
-                to_set, display_mode_param = self.apply_display_mode(to_set)
+                    with tracer.span("finalize_render", cat="do_set_wp"):
+                        to_set = self.finalize_render(to_set)
 
-                if should_apply_effects:
-                    to_set = self.apply_quote(to_set)
-                    to_set = self.apply_clock(to_set)
+                    if render_key and to_set != filename:
+                        self.render_cache.put(render_key, to_set, display_mode_param or "")
 
-                to_set = self.apply_copyto_operation(to_set)
+                with tracer.span("apply_copyto_operation", cat="do_set_wp"):
+                    to_set = self.apply_copyto_operation(to_set)
 
-                self.cleanup_old_wallpapers(self.wallpaper_folder, "wallpaper-", to_set)
+                with tracer.span("cleanup_old_wallpapers", cat="do_set_wp"):
+                    self.cleanup_old_wallpapers(self.wallpaper_folder, "wallpaper-", to_set)
 
                 def _update_inidicator():
                     self.update_indicator(filename)
 
                 Util.add_mainloop_task(_update_inidicator)
 
-                self.set_desktop_wallpaper(to_set, filename, refresh_level, display_mode_param)
+                with tracer.span("set_desktop_wallpaper", cat="do_set_wp"):
+                    self.set_desktop_wallpaper(to_set, filename, refresh_level, display_mode_param)
                 self.current = filename
 
                 if self.options.icon == "Current" and self.current:
@@ -1589,7 +1892,9 @@ class VarietyWindow(Gtk.Window):
         # otherwise albums will get an enormous part of the screentime, as they act as
         # "black holes" - once we start them, we stay there until done
         for album in self.albums:
-            all_images.append(album["images"][0])
+            first = album.first()
+            if first:
+                all_images.append(first)
 
         random.shuffle(all_images)
         return all_images[:count]
@@ -1690,10 +1995,9 @@ class VarietyWindow(Gtk.Window):
             # check if current is part of an album, and show next image in the album
             if self.current:
                 for album in self.albums:
-                    if os.path.normpath(self.current).startswith(album["path"]):
-                        index = album["images"].index(self.current)
-                        if 0 <= index < len(album["images"]) - 1:
-                            img = album["images"][index + 1]
+                    if album.contains_path(self.current):
+                        img = album.next_after(self.current)
+                        if img:
                             break
 
             if not img:
@@ -1759,9 +2063,7 @@ class VarietyWindow(Gtk.Window):
 
                 # trigger download after some interval to reduce resource usage while
                 # the wallpaper changes
-                delay_dl_timer = threading.Timer(2, self.trigger_download)
-                delay_dl_timer.daemon = True
-                delay_dl_timer.start()
+                self.scheduler.schedule(2, "background", self.trigger_download)
 
     def set_wallpaper(self, img, auto_changed=False):
         logger.info(lambda: "Calling set_wallpaper with " + img)
@@ -1789,11 +2091,9 @@ class VarietyWindow(Gtk.Window):
             if meta and "sourceType" in meta:
                 for image_source in Options.IMAGE_SOURCES:
                     if image_source.get_source_type() == meta["sourceType"]:
-
-                        def _do_hook():
-                            image_source.on_image_set_as_wallpaper(img, meta)
-
-                        threading.Timer(0, _do_hook).start()
+                        self.scheduler.submit(
+                            "hooks", image_source.on_image_set_as_wallpaper, img, meta
+                        )
         else:
             logger.warning(lambda: "set_wallpaper called with unaccessible image " + img)
 
@@ -1807,30 +2107,25 @@ class VarietyWindow(Gtk.Window):
                     self.thumbs_manager.show(self.used, type="history")
                     self.thumbs_manager.pin()
 
-            add_timer = threading.Timer(0, _add)
-            add_timer.start()
+            self.scheduler.submit("ui", _add)
 
     def refresh_thumbs_downloads(self, added_image):
         self.update_indicator(auto_changed=False)
 
+        folders = self.thumbs_manager.get_folders()
         should_show = added_image not in self.thumbs_manager.images and (
             self.thumbs_manager.is_showing("downloads")
-            or (
-                self.thumbs_manager.get_folders() is not None
-                and sum(
-                    1 for f in self.thumbs_manager.get_folders() if Util.file_in(added_image, f)
-                )
-                > 0
-            )
+            or (folders is not None and self.get_folders_index(folders).lookup(added_image))
         )
 
         if should_show:
+            self.scheduler.submit("ui", self.thumbs_manager.add_image, added_image)
 
-            def _add():
-                self.thumbs_manager.add_image(added_image)
-
-            add_timer = threading.Timer(0, _add)
-            add_timer.start()
+    def get_folders_index(self, folders):
+        key = tuple(folders)
+        if self.thumbs_folders_index is None or self.thumbs_folders_index[0] != key:
+            self.thumbs_folders_index = key, PathIndex.of_folders(folders)
+        return self.thumbs_folders_index[1]
 
     def on_rating_changed(self, file):
         with self.prepared_lock:
@@ -1849,6 +2144,7 @@ class VarietyWindow(Gtk.Window):
                     return False
 
             if self.options.use_landscape_enabled or self.options.min_size_enabled:
+                metrics.cache_access("image_colors_cache", img in self.image_colors_cache)
                 if img in self.image_colors_cache:
                     width = self.image_colors_cache[img][3]
                     height = self.image_colors_cache[img][4]
@@ -1859,6 +2155,7 @@ class VarietyWindow(Gtk.Window):
                     return False
 
             if self.options.desired_color_enabled or self.options.lightness_enabled:
+                metrics.cache_access("image_colors_cache", img in self.image_colors_cache)
                 if not img in self.image_colors_cache:
                     dom = DominantColors(img, False)
                     self.image_colors_cache[img] = dom.get_dominant_colors()
@@ -1948,50 +2245,40 @@ class VarietyWindow(Gtk.Window):
         if not file:
             return None
 
-        prioritized_sources = []
-        prioritized_sources.extend(
-            s for s in self.options.sources if s[0] and s[1] == Options.SourceType.IMAGE
-        )
-        prioritized_sources.extend(
-            s for s in self.options.sources if s[0] and s[1] == Options.SourceType.FOLDER
-        )
-        prioritized_sources.extend(
-            s
-            for s in self.options.sources
-            if s[0] and s[1] in Options.get_downloader_source_types()
-        )
-        prioritized_sources.extend(
-            s for s in self.options.sources if s[0] and s[1] == Options.SourceType.FETCHED
-        )
-        prioritized_sources.extend(
-            s for s in self.options.sources if s[0] and s[1] == Options.SourceType.FAVORITES
-        )
-        prioritized_sources.extend(s for s in self.options.sources if s not in prioritized_sources)
-
-        if len(prioritized_sources) != len(self.options.sources):
-            logger.error(
-                lambda: "len(prioritized_sources) != len(self.options.sources): %d, %d, %s, %s"
-                % (
-                    len(prioritized_sources),
-                    len(self.options.sources),
-                    prioritized_sources,
-                    self.options.sources,
-                )
-            )
+        source_index = self.source_index
+        if source_index is None:
+            source_index = self.source_index = self.build_source_index()
+        return source_index.lookup(file)
+
+    def build_source_index(self):
+        """
+        Indexes the folders of all sources (and the files of image sources) for get_source.
+        When several match, single images win over folders, folders over downloaders, those over
+        Fetched and Favorites, and enabled sources over disabled ones.
+        """
+        downloader_types = Options.get_downloader_source_types()
+        groups = [
+            lambda s: s[1] == Options.SourceType.IMAGE,
+            lambda s: s[1] == Options.SourceType.FOLDER,
+            lambda s: s[1] in downloader_types,
+            lambda s: s[1] == Options.SourceType.FETCHED,
+            lambda s: s[1] == Options.SourceType.FAVORITES,
+        ]
 
-        file_normpath = os.path.normpath(file)
-        for s in prioritized_sources:
+        index = PathIndex()
+        for position, s in enumerate(self.options.sources):
+            group = len(groups)
+            if s[0]:
+                group = next((i for i, g in enumerate(groups) if g(s)), group)
             try:
                 if s[1] == Options.SourceType.IMAGE:
-                    if os.path.normpath(s[2]) == file_normpath:
-                        return s
-                elif file_normpath.startswith(Util.folderpath(self.get_folder_of_source(s))):
-                    return s
+                    index.add(s[2], s, (group, position), exact=True)
+                else:
+                    index.add(self.get_folder_of_source(s), s, (group, position))
             except Exception:
-                # probably exception while creating the downloader, ignore, continue searching
+                # probably exception while creating the downloader, ignore, continue indexing
                 pass
-
-        return None
+        return index
 
     def focus_in_preferences(self, widget=None, file=None):
         if not file:
@@ -2165,11 +2452,7 @@ class VarietyWindow(Gtk.Window):
         if meta and "sourceType" in meta:
             for image_source in Options.IMAGE_SOURCES:
                 if image_source.get_source_type() == meta["sourceType"]:
-
-                    def _do_hook():
-                        image_source.on_image_favorited(img, meta)
-
-                    threading.Timer(0, _do_hook).start()
+                    self.scheduler.submit("hooks", image_source.on_image_favorited, img, meta)
 
     def determine_favorites_operation(self, file=None):
         if not file:
@@ -2183,24 +2466,25 @@ class VarietyWindow(Gtk.Window):
         if not os.access(file, os.W_OK):
             return "copy"
 
-        file_normpath = os.path.normpath(file)
-        for pair in self.options.favorites_operations:
-            folder = pair[0]
-            folder_lower = folder.lower().strip()
-            if folder_lower == "downloaded":
-                folder = self.real_download_folder
-            elif folder_lower == "fetched":
-                folder = self.options.fetched_folder
-            elif folder_lower == "others":
-                folder = "/"
-
-            folder = Util.folderpath(folder)
+        favorites_operations_index = self.favorites_operations_index
+        if favorites_operations_index is None:
+            favorites_operations_index = PathIndex()
+            for position, pair in enumerate(self.options.favorites_operations):
+                folder = pair[0]
+                folder_lower = folder.lower().strip()
+                if folder_lower == "downloaded":
+                    folder = self.real_download_folder
+                elif folder_lower == "fetched":
+                    folder = self.options.fetched_folder
+                elif folder_lower == "others":
+                    folder = "/"
 
-            if file_normpath.startswith(folder):
                 op = pair[1].lower().strip()
-                return op if op in ("copy", "move", "both") else "copy"
+                op = op if op in ("copy", "move", "both") else "copy"
+                favorites_operations_index.add(folder, op, position)
+            self.favorites_operations_index = favorites_operations_index
 
-        return "copy"
+        return favorites_operations_index.lookup(file) or "copy"
 
     @on_gtk
     def on_quit(self, widget=None):
@@ -2234,6 +2518,12 @@ class VarietyWindow(Gtk.Window):
                     logger.debug(lambda: "Cleaning up clock & quotes")
                     self.do_set_wp(self.current, VarietyWindow.RefreshLevel.TEXTS)
 
+            logger.debug(lambda: "Scheduler stats: %s" % self.scheduler.get_stats())
+            self.scheduler.stop()
+
+            if isinstance(self.wallpaper_setter, WallpaperHelper):
+                self.wallpaper_setter.close()
+
             Util.start_force_exit_thread(15)
             logger.debug(lambda: "OK, waiting for other loops to finish")
             logger.debug(lambda: "Remaining threads: ")
@@ -2532,6 +2822,24 @@ class VarietyWindow(Gtk.Window):
 
             GObject.timeout_add(3000 if initial_run else 1, _process_command)
 
+            if options.dump_trace and not initial_run:
+                try:
+                    tracer.dump(options.dump_trace)
+                    return _("Trace written to %s") % options.dump_trace
+                except Exception:
+                    logger.exception(lambda: "Could not write trace to " + options.dump_trace)
+                    return _("Could not write trace to %s") % options.dump_trace
+
+            if options.profile_dump and not initial_run:
+                if not sampling_profiler.is_running():
+                    return _("Sampling profiler is not running, start with --profile-sampling")
+                try:
+                    sampling_profiler.dump(options.profile_dump)
+                    return _("Profile written to %s") % options.profile_dump
+                except Exception:
+                    logger.exception(lambda: "Could not write profile to " + options.profile_dump)
+                    return _("Could not write profile to %s") % options.profile_dump
+
             return self.current if options.show_current else ""
         except Exception:
             logger.exception(lambda: "Could not process passed command")
@@ -2700,7 +3008,18 @@ class VarietyWindow(Gtk.Window):
             )
             logger.exception(lambda: "Exception in process_variety_url")
 
-    def get_desktop_wallpaper(self):
+    @staticmethod
+    def _wallpaper_uri_to_path(uri):
+        if not uri:
+            return None
+        if uri[0] == uri[-1] == "'" or uri[0] == uri[-1] == '"':
+            uri = uri[1:-1]
+        if uri.startswith("file://"):
+            uri = urllib.parse.unquote(uri[len("file://") :])
+        return uri
+
+    def read_desktop_wallpaper(self):
+        """Asks the get_wallpaper script (or GSettings) what the desktop wallpaper is"""
         try:
             script = self.options.get_wallpaper_script
 
@@ -2708,6 +3027,7 @@ class VarietyWindow(Gtk.Window):
 
             if os.access(script, os.X_OK):
                 logger.debug(lambda: "Running get_wallpaper script")
+                tracer.annotate(spawned_process="get_wallpaper")
                 try:
                     output = subprocess.check_output(script).decode().strip()
                     if output:
@@ -2725,33 +3045,143 @@ class VarietyWindow(Gtk.Window):
             if not file:
                 return None
 
-            if file[0] == file[-1] == "'" or file[0] == file[-1] == '"':
-                file = file[1:-1]
-
-            file = file.replace("file://", "")
-            return file
+            return VarietyWindow._wallpaper_uri_to_path(file)
         except Exception:
             logger.exception(lambda: "Could not get current wallpaper")
             return None
 
+    def get_desktop_wallpaper(self):
+        """
+        Returns the current desktop wallpaper. This is tracked as Variety sets it - the
+        get_wallpaper script is only run on first use, after a change of the wallpaper by someone
+        else was detected, and every DESKTOP_WALLPAPER_RECHECK seconds.
+        """
+        if time.time() - self.desktop_wallpaper_checked > VarietyWindow.DESKTOP_WALLPAPER_RECHECK:
+            self.desktop_wallpaper = self.read_desktop_wallpaper()
+            self.desktop_wallpaper_checked = time.time()
+        return self.desktop_wallpaper
+
+    def on_desktop_wallpaper_changed(self, settings, key):
+        wallpaper = VarietyWindow._wallpaper_uri_to_path(settings.get_string(key))
+        if wallpaper != self.desktop_wallpaper:
+            logger.info(lambda: "Desktop wallpaper changed externally to %s" % wallpaper)
+            # read it again with get_wallpaper when next needed, the GSettings key may not be
+            # what the current desktop actually uses
+            self.desktop_wallpaper_checked = 0
+
+    def register_wallpaper_file(self, file):
+        """Records a file Variety creates in a wallpaper folder, for cleanup_old_wallpapers"""
+        files = self.wallpaper_files.get(os.path.dirname(file))
+        if files is not None:
+            files.add(file)
+
     def cleanup_old_wallpapers(self, folder, prefix, new_wallpaper=None):
         try:
             current_wallpaper = self.get_desktop_wallpaper()
-            for name in os.listdir(folder):
-                file = os.path.join(folder, name)
+            files = self.wallpaper_files.get(folder)
+            if files is None:
+                # list the folder only the first time, to remove leftovers of previous runs,
+                # afterwards we know which files we created there
+                files = self.wallpaper_files[folder] = set(
+                    os.path.join(folder, name) for name in os.listdir(folder)
+                )
+            for file in list(files):
+                name = os.path.basename(file)
                 if (
                     file != current_wallpaper
                     and file != new_wallpaper
                     and file != self.post_filter_filename
                     and name.startswith(prefix)
-                    and Util.is_image(name)
+                    and (
+                        Util.is_image(name)
+                        or name.endswith(VarietyWindow.RENDER_INTERMEDIATE_EXTENSION)
+                    )
                 ):
                     logger.debug(lambda: "Removing old wallpaper %s" % file)
                     Util.safe_unlink(file)
+                    files.discard(file)
         except Exception:
             logger.exception(lambda: "Cannot remove all old wallpaper files from %s:" % folder)
 
+    def get_wallpaper_setter(self):
+        """
+        Returns the native wallpaper setter to use according to the options and the current
+        desktop, or None if the set_wallpaper script should be used
+        """
+        desktop = get_desktop()
+        key = (self.options.wallpaper_setter, desktop)
+        if key != self.wallpaper_setter_key:
+            if isinstance(self.wallpaper_setter, WallpaperHelper):
+                self.wallpaper_setter.close()
+            if self.options.wallpaper_setter == "script" or not desktop:
+                self.wallpaper_setter = None
+            elif self.options.wallpaper_setter == "helper":
+                self.wallpaper_setter = WallpaperHelper(desktop)
+            else:
+                self.wallpaper_setter = create_native_setter(desktop)
+            self.wallpaper_setter_key = key
+            logger.info(
+                lambda: "Wallpaper setter for desktop %s: %s"
+                % (desktop, self.wallpaper_setter.name if self.wallpaper_setter else "script")
+            )
+        return self.wallpaper_setter
+
+    def is_set_wallpaper_script_customized(self):
+        """Whether the set_wallpaper script differs from the one bundled with Variety"""
+        script = self.options.set_wallpaper_script
+        try:
+            state = (script, os.path.getmtime(script))
+        except OSError:
+            return False
+        if not self.script_customized or self.script_customized[0] != state:
+            bundled = varietyconfig.get_data_file("scripts", "set_wallpaper")
+            customized = VarietyWindow.differs_from_bundled_script(
+                script, bundled, VarietyWindow.get_script_replacements()
+            )
+            self.script_customized = (state, customized)
+        return self.script_customized[1]
+
+    @staticmethod
+    def get_script_replacements():
+        """The replacements prepare_config_folder applies to the scripts it copies"""
+        return {DEFAULT_PROFILE_PATH.replace("~", "$HOME"): get_profile_path(expanded=True)}
+
+    @staticmethod
+    def differs_from_bundled_script(script, bundled, replacements):
+        """Whether script differs from the copy of bundled that prepare_config_folder writes"""
+        try:
+            with open(script, "r") as f:
+                return f.read() != Util.read_with_replace(bundled, replacements)
+        except (OSError, UnicodeDecodeError):
+            return True
+
     def set_desktop_wallpaper(self, wallpaper, original_file, refresh_level, display_mode):
+        self.desktop_wallpaper = wallpaper
+        self.desktop_wallpaper_checked = time.time()
+
+        setter = self.get_wallpaper_setter()
+        if setter:
+            try:
+                tracer.annotate(wallpaper_setter=setter.name)
+                setter.set_wallpaper(wallpaper, display_mode)
+            except Exception:
+                logger.exception(
+                    lambda: "Native wallpaper setter %s failed, using the set_wallpaper script"
+                    % setter.name
+                )
+            else:
+                if (
+                    self.options.set_wallpaper_script_hook
+                    or self.is_set_wallpaper_script_customized()
+                ):
+                    self.run_set_wallpaper_script(
+                        wallpaper, original_file, refresh_level, display_mode
+                    )
+                return
+
+        self.run_set_wallpaper_script(wallpaper, original_file, refresh_level, display_mode)
+
+    def run_set_wallpaper_script(self, wallpaper, original_file, refresh_level, display_mode):
         script = self.options.set_wallpaper_script
         if os.access(script, os.X_OK):
             auto = (
@@ -2763,6 +3193,7 @@ class VarietyWindow(Gtk.Window):
                 lambda: "Running set_wallpaper script with parameters: %s, %s, %s, %s"
                 % (wallpaper, auto, original_file, display_mode)
             )
+            tracer.annotate(spawned_process="set_wallpaper")
             try:
                 subprocess.check_call(
                     [script, wallpaper, auto, original_file, display_mode], timeout=10
@@ -2814,7 +3245,7 @@ class VarietyWindow(Gtk.Window):
             def _go():
                 pref_dialog.show_thumbs(rows, pin=True, thumbs_type="selector")
 
-            threading.Timer(0, _go).start()
+            self.scheduler.submit("ui", _go)
 
     def save_last_change_time(self):
         with open(os.path.join(self.config_folder, ".last_change_time"), "w") as f:
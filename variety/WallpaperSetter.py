@@ -0,0 +1,266 @@
+# -*- Mode: Python; coding: utf-8; indent-tabs-mode: nil; tab-width: 4 -*-
+### BEGIN LICENSE
+# Copyright (c) 2012, Peter Levi <peterlevi@peterlevi.com>
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 3, as published
+# by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranties of
+# MERCHANTABILITY, SATISFACTORY QUALITY, or FITNESS FOR A PARTICULAR
+# PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+### END LICENSE
+
+"""
+Native wallpaper setters for the common desktops, used instead of forking the set_wallpaper
+script (and the gsettings/xfconf-query processes it forks) on every wallpaper change.
+
+This module only depends on the standard library and Gio, because it is also run as a
+standalone program: the persistent helper process that applies wallpapers out of process
+when the "helper" setter is configured. The helper reads one JSON request per line from stdin
+and answers each with one JSON line on stdout.
+"""
+
+import json
+import logging
+import os
+import re
+import select
+import subprocess
+import sys
+import threading
+
+from gi.repository import Gio, GLib  # pylint: disable=E0611
+
+logger = logging.getLogger("variety")
+
+# display modes that map directly to the picture-options of the GNOME-derived desktops
+PICTURE_OPTIONS = {"wallpaper", "centered", "scaled", "stretched", "zoom", "spanned"}
+
+
+class GSettingsSetter:
+    """Sets the wallpaper through the GSettings background schemas of a GNOME-derived desktop"""
+
+    def __init__(self, name, schemas):
+        """
+        :param schemas: list of (schema, key, is_uri) - the wallpaper keys to write. The
+        picture-options key of each schema is written too, when it has one.
+        """
+        self.name = name
+        self.schemas = schemas
+        self.settings = {}
+
+    def _get_settings(self, schema):
+        if schema not in self.settings:
+            source = Gio.SettingsSchemaSource.get_default()
+            found = source.lookup(schema, True) if source else None
+            self.settings[schema] = (Gio.Settings.new(schema), found) if found else (None, None)
+        return self.settings[schema]
+
+    def is_available(self):
+        return self._get_settings(self.schemas[0][0])[0] is not None
+
+    def set_wallpaper(self, wallpaper, display_mode):
+        uri = GLib.filename_to_uri(wallpaper, None)
+        for schema, key, is_uri in self.schemas:
+            settings, schema_info = self._get_settings(schema)
+            if settings and schema_info.has_key(key):
+                settings.set_string(key, uri if is_uri else wallpaper)
+
+        for schema in set(schema for schema, _key, _is_uri in self.schemas):
+            settings, schema_info = self._get_settings(schema)
+            if settings and schema_info.has_key("picture-options"):
+                if display_mode in PICTURE_OPTIONS:
+                    settings.set_string("picture-options", display_mode)
+                elif settings.get_string("picture-options") == "none":
+                    settings.set_string("picture-options", "zoom")
+
+        # make sure the writes reach dconf before we return, the helper may be killed right after
+        Gio.Settings.sync()
+
+
+class XfconfSetter:
+    """Sets the wallpaper of every XFCE monitor and workspace through xfconfd's DBus interface"""
+
+    CHANNEL = "xfce4-desktop"
+    IMAGE_PROPERTY = re.compile(r"^/backdrop/screen.*/monitor.*(image-path|/last-image)$")
+    TIMEOUT_MS = 5000
+
+    def __init__(self):
+        self.name = "xfce"
+        self.proxy = None
+
+    def _call(self, method, args):
+        if self.proxy is None:
+            self.proxy = Gio.DBusProxy.new_for_bus_sync(
+                Gio.BusType.SESSION,
+                Gio.DBusProxyFlags.DO_NOT_LOAD_PROPERTIES,
+                None,
+                "org.xfce.Xfconf",
+                "/org/xfce/Xfconf",
+                "org.xfce.Xfconf",
+                None,
+            )
+        return self.proxy.call_sync(
+            method, args, Gio.DBusCallFlags.NONE, XfconfSetter.TIMEOUT_MS, None
+        ).unpack()
+
+    def is_available(self):
+        try:
+            self._call(
+                "GetAllProperties", GLib.Variant("(ss)", (XfconfSetter.CHANNEL, "/backdrop"))
+            )
+            return True
+        except Exception:
+            return False
+
+    def set_wallpaper(self, wallpaper, display_mode):
+        properties = self._call(
+            "GetAllProperties", GLib.Variant("(ss)", (XfconfSetter.CHANNEL, "/backdrop"))
+        )[0]
+        for prop in properties:
+            if XfconfSetter.IMAGE_PROPERTY.match(prop):
+                # xfdesktop does not reload an image whose path did not change, reset it first
+                for value in ("", wallpaper):
+                    self._call(
+                        "SetProperty",
+                        GLib.Variant(
+                            "(ssv)", (XfconfSetter.CHANNEL, prop, GLib.Variant("s", value))
+                        ),
+                    )
+
+
+def _gnome():
+    return GSettingsSetter(
+        "gnome",
+        [
+            ("org.gnome.desktop.background", "picture-uri", True),
+            ("org.gnome.desktop.background", "picture-uri-dark", True),
+            ("org.gnome.desktop.screensaver", "picture-uri", True),
+        ],
+    )
+
+
+def _cinnamon():
+    return GSettingsSetter("cinnamon", [("org.cinnamon.desktop.background", "picture-uri", True)])
+
+
+def _mate():
+    return GSettingsSetter("mate", [("org.mate.background", "picture-filename", False)])
+
+
+# lowercased XDG_CURRENT_DESKTOP entry -> native setter factory
+DESKTOP_SETTERS = {
+    "gnome": _gnome,
+    "unity": _gnome,
+    "budgie": _gnome,
+    "x-cinnamon": _cinnamon,
+    "cinnamon": _cinnamon,
+    "mate": _mate,
+    "xfce": XfconfSetter,
+}
+
+
+def get_desktop():
+    """Returns the first entry of XDG_CURRENT_DESKTOP that has a native setter, or None"""
+    for desktop in os.getenv("XDG_CURRENT_DESKTOP", "").lower().split(":"):
+        if desktop in DESKTOP_SETTERS:
+            return desktop
+    return None
+
+
+def create_native_setter(desktop):
+    """Returns the native setter for the given desktop, or None if it is not usable here"""
+    factory = DESKTOP_SETTERS.get(desktop)
+    if not factory:
+        return None
+    try:
+        setter = factory()
+        return setter if setter.is_available() else None
+    except Exception:
+        # plain message formatting, this also runs in the helper process
+        logger.exception("Could not create the native wallpaper setter for %s", desktop)
+        return None
+
+
+class WallpaperHelper:
+    """
+    Client of the persistent helper process. The process is started on first use and restarted
+    if it dies or does not answer in time.
+    """
+
+    TIMEOUT = 10
+
+    def __init__(self, desktop):
+        self.name = "helper:" + desktop
+        self.desktop = desktop
+        self.process = None
+        self.lock = threading.Lock()
+
+    def _start(self):
+        logger.info(lambda: "Starting the wallpaper setter helper for " + self.desktop)
+        self.process = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "--helper", self.desktop],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            universal_newlines=True,
+            bufsize=1,
+        )
+
+    def close(self):
+        with self.lock:
+            self._kill()
+
+    def _kill(self):
+        if self.process:
+            try:
+                self.process.kill()
+                self.process.wait()
+            except Exception:
+                pass
+            self.process = None
+
+    def _request(self, request):
+        if self.process is None or self.process.poll() is not None:
+            self._start()
+        self.process.stdin.write(json.dumps(request) + "\n")
+        self.process.stdin.flush()
+        ready, _, _ = select.select([self.process.stdout], [], [], WallpaperHelper.TIMEOUT)
+        if not ready:
+            self._kill()
+            raise Exception("Wallpaper setter helper did not answer in time, killed")
+        line = self.process.stdout.readline()
+        if not line:
+            self._kill()
+            raise Exception("Wallpaper setter helper exited")
+        response = json.loads(line)
+        if not response.get("ok"):
+            raise Exception("Wallpaper setter helper failed: %s" % response.get("error"))
+
+    def set_wallpaper(self, wallpaper, display_mode):
+        with self.lock:
+            self._request({"cmd": "set", "wallpaper": wallpaper, "display_mode": display_mode})
+
+
+def run_helper(desktop):
+    setter = create_native_setter(desktop)
+    for line in sys.stdin:
+        try:
+            request = json.loads(line)
+            if not setter:
+                raise Exception("No native wallpaper setter for desktop %s" % desktop)
+            if request.get("cmd") != "set":
+                raise Exception("Unknown command %s" % request.get("cmd"))
+            setter.set_wallpaper(request["wallpaper"], request.get("display_mode"))
+            response = {"ok": True}
+        except Exception as e:
+            response = {"ok": False, "error": str(e)}
+        sys.stdout.write(json.dumps(response) + "\n")
+        sys.stdout.flush()
+
+
+if __name__ == "__main__" and len(sys.argv) == 3 and sys.argv[1] == "--helper":
+    run_helper(sys.argv[2])
@@ -15,11 +15,19 @@
 # with this program.  If not, see <http://www.gnu.org/licenses/>.
 ### END LICENSE
 
-import dbus, dbus.service, dbus.glib
 import logging
 import os
 import signal
 import sys
+import time
+
+# must be first, so that all other imports are timed when --profile-startup is used
+from variety.StartupProfiler import startup_profiler  # isort:skip
+
+if "--profile-startup" in sys.argv:
+    startup_profiler.start()
+
+import dbus, dbus.service, dbus.glib  # isort:skip
 
 import gi
 
@@ -61,6 +69,7 @@ logging.setLoggerClass(SafeLogger)
 # these must be after the setLoggerClass call, as they obtain the variety logger
 from variety import VarietyWindow, ThumbsManager, ThumbsWindow
 from variety.profile import set_profile_path, get_profile_path, is_default_profile, get_profile_id
+from variety.SamplingProfiler import sampling_profiler
 from variety.Util import Util, _, ModuleProfiler, safe_print
 
 
@@ -99,6 +108,10 @@ class VarietyService(dbus.service.Object):
         result = self.variety_window.process_command(arguments, initial_run=False)
         return "" if result is None else result
 
+    @dbus.service.method(dbus_interface=_get_dbus_key(), in_signature="b", out_signature="s")
+    def get_stats(self, as_json):
+        return self.variety_window.get_stats(as_json=bool(as_json))
+
 
 VARIETY_WINDOW = None
 
@@ -129,6 +142,17 @@ def _check_quit():
     Util.start_force_exit_thread(10)
 
 
+def _profile_dump_handler(*args):
+    if not sampling_profiler.is_running():
+        logging.getLogger("variety").warning("SIGUSR1 received, but --profile-sampling is not on")
+        return
+    path = os.path.join(get_profile_path(), time.strftime("profile-%Y%m%d-%H%M%S.collapsed"))
+    try:
+        sampling_profiler.dump(path)
+    except Exception:
+        logging.getLogger("variety").exception("Could not write profile to %s", path)
+
+
 def _set_up_logging(verbose):
     # add a handler to prevent basicConfig
     root = logging.getLogger()
@@ -189,6 +213,10 @@ def main():
     bus = dbus.SessionBus()
     dbus_key = _get_dbus_key()
     if bus.request_name(dbus_key) != dbus.bus.REQUEST_NAME_REPLY_PRIMARY_OWNER:
+        if options.stats:
+            method = bus.get_object(dbus_key, DBUS_PATH).get_dbus_method("get_stats")
+            safe_print(method(bool(options.json)))
+            return
         if not arguments or (options.profile and len(arguments) <= 2):
             arguments = ["--preferences"]
         safe_print(
@@ -202,6 +230,10 @@ def main():
             safe_print(result)
         return
 
+    if options.stats:
+        safe_print(_("Variety is not running"), "Variety is not running", file=sys.stderr)
+        return
+
     # set up logging
     # set_up_logging must be called after the DBus checks, only by one running instance,
     # or the log file can be corrupted
@@ -228,14 +260,23 @@ def main():
 
         profiler.start()
 
+    if options.profile_sampling:
+        sampling_profiler.start(options.profile_sampling)
+    signal.signal(signal.SIGUSR1, _profile_dump_handler)
+
     # Run the application.
-    window = VarietyWindow.VarietyWindow()
+    with startup_profiler.phase("VarietyWindow()"):
+        window = VarietyWindow.VarietyWindow()
     global VARIETY_WINDOW
     VARIETY_WINDOW = window
     service = VarietyService(window)
 
     bus.call_on_disconnection(window.on_quit)
 
-    window.start(arguments)
+    with startup_profiler.phase("VarietyWindow.start"):
+        window.start(arguments)
     GObject.timeout_add(2000, _check_quit)
+
+    # report once the main loop has processed the initial events and the indicator is shown
+    GObject.idle_add(startup_profiler.finish)
     Gtk.main()
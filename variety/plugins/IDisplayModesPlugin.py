@@ -27,6 +27,9 @@ class DisplayModeData:
     set_wallpaper_param - what do we send to the set_wallpaper script, affects OS background options
     imagemagick_cmd - optional, what command do we run over the image in order to resize it
     fixed_image_path - optional, if more complex logic needed, generate the image and give its path
+    render - optional, like fixed_image_path, but Variety picks the output file:
+    render(target_file, output_options) writes the image to target_file, passing output_options
+    (e.g. the JPEG quality) to ImageMagick, and returns True on success
     """
 
     def __init__(
@@ -34,10 +37,12 @@ class DisplayModeData:
         set_wallpaper_param: str,
         imagemagick_cmd: Optional[str] = None,
         fixed_image_path: Optional[str] = None,
+        render: Optional[Callable[[str, str], bool]] = None,
     ):
         self.set_wallpaper_param = set_wallpaper_param
         self.imagemagick_cmd = imagemagick_cmd
         self.fixed_image_path = fixed_image_path
+        self.render = render
 
 
 class DisplayMode:
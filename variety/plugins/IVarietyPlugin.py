@@ -26,6 +26,6 @@ class IVarietyPlugin(IPlugin, metaclass=abc.ABCMeta):
     def on_variety_start_complete(self):
         """
         Called towards the end of VarietyWindow.start, when options are loaded and
-        caches - created
+        caches - created. Plugins that are loaded lazily after that get it right after loading.
         """
         pass
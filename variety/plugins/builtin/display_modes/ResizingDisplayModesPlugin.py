@@ -1,5 +1,8 @@
+import logging
 from typing import List
 
+from variety.DisplayGeometry import display_geometry
+from variety.MonitorRenderer import render_per_monitor
 from variety.plugins.IDisplayModesPlugin import (
     DisplayMode,
     DisplayModeData,
@@ -8,6 +11,8 @@ from variety.plugins.IDisplayModesPlugin import (
 )
 from variety.Util import Util, _
 
+logger = logging.getLogger("variety")
+
 IMAGEMAGICK_ZOOM = "-scale %Wx%H^ "
 IMAGEMAGICK_FIT_WITH_BLACK = "-resize %Wx%H -size %Wx%H xc:black +swap -gravity center -composite"
 IMAGEMAGICK_FIT_WITH_BLUR = (
@@ -44,6 +49,23 @@ def _smart_fn(filename):
         return DisplayModeData(set_wallpaper_param="zoom")
 
 
+def _ratio_close(image_w, image_h, w, h):
+    image_ratio = image_w / image_h
+    ratio = w / h
+    return 2 * abs(image_ratio - ratio) / (image_ratio + ratio) < 0.2
+
+
+def _per_monitor_cmd(image_size):
+    def get_cmd(w, h):
+        if _ratio_close(image_size[0], image_size[1], w, h):
+            cmd = IMAGEMAGICK_ZOOM
+        else:
+            cmd = IMAGEMAGICK_FIT_WITH_BLUR
+        return cmd.replace("%W", str(w)).replace("%H", str(h))
+
+    return get_cmd
+
+
 class ResizingDisplayModesPlugin(IDisplayModesPlugin):
     @classmethod
     def get_info(cls):
@@ -54,6 +76,19 @@ class ResizingDisplayModesPlugin(IDisplayModesPlugin):
             "author": "Peter Levi",
         }
 
+    def _per_monitor_fn(self, filename):
+        try:
+            layout = display_geometry.get_layout()
+            get_cmd = _per_monitor_cmd(Util.get_size(filename))
+        except Exception:
+            logger.exception(lambda: "Could not render the wallpaper per monitor")
+            return DisplayModeData(set_wallpaper_param="zoom")
+
+        def render(target_file, output_options):
+            return render_per_monitor(filename, layout, target_file, get_cmd, output_options)
+
+        return DisplayModeData(set_wallpaper_param="spanned", render=render)
+
     def display_modes(self) -> List[DisplayMode]:
         return [
             DisplayMode(
@@ -100,6 +135,17 @@ class ResizingDisplayModesPlugin(IDisplayModesPlugin):
                 set_wallpaper_param="zoom",
                 imagemagick_cmd=IMAGEMAGICK_FIT_WITH_BLUR,
             ),
+            DisplayMode(
+                id="per-monitor",
+                title=_("Multiple monitors: fit the image to every monitor separately. Slower."),
+                description=_(
+                    "The image is rendered separately for each monitor at its own resolution: "
+                    "zoomed to fill monitors of similar proportions and padded with a blurred "
+                    "background on the others. The monitors are rendered in parallel and "
+                    "combined into one image spanning all of them."
+                ),
+                fn=self._per_monitor_fn,
+            ),
         ]
 
     def order(self):
@@ -19,7 +19,12 @@
 # Based on gist: https://gist.github.com/goodevilgenius/3878ce0f3e232e3daf5c
 #
 
+import codecs
+import logging
+import os
+import random
 import re
+import struct
 import subprocess
 from locale import gettext as _
 
@@ -27,6 +32,15 @@ from variety.plugins.IQuoteSource import IQuoteSource
 
 ANSI_ESCAPE_RE = re.compile(r"(\x9B|\x1B\[)[0-?]*[ -/]*[@-~]", flags=re.IGNORECASE)
 
+# Where distributions install the fortune databases
+FORTUNE_FOLDERS = ["/usr/share/games/fortunes", "/usr/share/fortune", "/usr/share/fortunes"]
+
+# strfile(8) header: version, numstr, longlen, shortlen, flags, delimiter + 3 padding bytes
+STRFILE_HEADER = struct.Struct(">IIIII4s")
+STR_ROTATED = 0x4
+
+logger = logging.getLogger("variety")
+
 
 class FortuneSource(IQuoteSource):
     @classmethod
@@ -41,15 +55,115 @@ class FortuneSource(IQuoteSource):
             "version": "0.1",
         }
 
+    # How many fortunes to return per get_random call when reading the databases directly
+    BATCH_SIZE = 20
+
+    def __init__(self):
+        super(FortuneSource, self).__init__()
+        self.databases = []
+
     def needs_internet(self):
         return False
 
-    def get_random(self):
-        fortune = subprocess.check_output(["fortune"]).decode().strip()
-        fortune = ANSI_ESCAPE_RE.sub("", fortune)
+    def activate(self):
+        if self.active:
+            return
+        super(FortuneSource, self).activate()
+        self.databases = FortuneSource.find_databases(FORTUNE_FOLDERS)
+        logger.info(
+            lambda: "FortuneSource: found %d fortune databases with %d fortunes"
+            % (len(self.databases), sum(db["count"] for db in self.databases))
+        )
+
+    def deactivate(self):
+        super(FortuneSource, self).deactivate()
+        self.databases = []
+
+    @staticmethod
+    def find_databases(folders):
+        """
+        Finds the strfile-indexed fortune files (the ones fortune uses by default, so no offensive ones)
+        """
+        databases = []
+        for folder in folders:
+            if not os.path.isdir(folder):
+                continue
+            for f in sorted(os.listdir(folder)):
+                dat = os.path.join(folder, f)
+                text = dat[: -len(".dat")]
+                if not f.endswith(".dat") or not os.path.isfile(text):
+                    continue
+                try:
+                    with open(dat, "rb") as fp:
+                        header = STRFILE_HEADER.unpack(fp.read(STRFILE_HEADER.size))
+                    count, flags, delim = header[1], header[4], header[5]
+                    if count > 0:
+                        databases.append(
+                            {
+                                "dat": dat,
+                                "text": text,
+                                "count": count,
+                                "rotated": bool(flags & STR_ROTATED),
+                                "delim": delim[:1].decode("latin-1"),
+                            }
+                        )
+                except Exception:
+                    logger.warning(lambda: "FortuneSource: could not read fortune index %s" % dat)
+            if databases:
+                break
+        return databases
+
+    @staticmethod
+    def read_fortune(db, index):
+        with open(db["dat"], "rb") as fp:
+            fp.seek(STRFILE_HEADER.size + 4 * index)
+            (start,) = struct.unpack(">I", fp.read(4))
+
+        # the entry ends with the next delimiter line: the offsets are not necessarily in file
+        # order, strfile -r shuffles them and strfile -o sorts them by the text of the entries
+        delim = db["delim"].encode("latin-1")
+        lines = []
+        with open(db["text"], "rb") as fp:
+            fp.seek(start)
+            for line in fp:
+                if line.rstrip(b"\r\n") == delim:
+                    break
+                lines.append(line)
+
+        lines = b"".join(lines).decode("utf-8", errors="ignore").split("\n")
+        while lines and not lines[-1].strip():
+            lines.pop()
+        text = "\n".join(lines)
+        return codecs.decode(text, "rot13") if db["rotated"] else text
+
+    @staticmethod
+    def to_quote(fortune):
+        fortune = ANSI_ESCAPE_RE.sub("", fortune.strip())
         q = fortune.split("--")
         quote = q[0].strip()
         author = q[1].strip() if len(q) > 1 else None
-        return [
-            {"quote": quote, "author": author, "sourceName": "UNIX fortune program", "link": None}
-        ]
+        return {
+            "quote": quote,
+            "author": author,
+            "sourceName": "UNIX fortune program",
+            "link": None,
+        }
+
+    def get_random(self):
+        if not self.databases:
+            # no databases found where we expect them - fallback to one fork per fortune
+            return [FortuneSource.to_quote(subprocess.check_output(["fortune"]).decode())]
+
+        # pick uniformly among all fortunes, i.e. databases weighted by their size
+        dbs = random.choices(
+            self.databases, weights=[db["count"] for db in self.databases], k=self.BATCH_SIZE
+        )
+        quotes = []
+        for db in dbs:
+            try:
+                fortune = FortuneSource.read_fortune(db, random.randrange(db["count"]))
+                if fortune.strip():
+                    quotes.append(FortuneSource.to_quote(fortune))
+            except Exception:
+                logger.exception(lambda: "FortuneSource: could not read from %s" % db["text"])
+        return quotes
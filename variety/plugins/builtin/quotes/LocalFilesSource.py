@@ -13,9 +13,17 @@
 # You should have received a copy of the GNU General Public License along
 # with this program.  If not, see <http://www.gnu.org/licenses/>.
 ### END LICENSE
+import array
+import bisect
+import hashlib
+import json
 import logging
+import mmap
 import os
+import random
 import re
+import struct
+import sys
 
 from variety.plugins.IQuoteSource import IQuoteSource
 from variety.profile import get_profile_path
@@ -24,10 +32,121 @@ from variety.Util import _
 logger = logging.getLogger("variety")
 
 
+class QuoteIndex:
+    """
+    Tokenized inverted index: maps each lowercased word to the sorted list of quote ids containing it.
+    """
+
+    TOKEN_RE = re.compile(r"\w+")
+
+    def __init__(self, postings=None):
+        self.postings = postings or {}
+        self.sorted_tokens = None
+
+    @staticmethod
+    def tokenize(text):
+        return QuoteIndex.TOKEN_RE.findall(text.lower()) if text else []
+
+    def add(self, quote_id, text):
+        for token in set(QuoteIndex.tokenize(text)):
+            self.postings.setdefault(token, []).append(quote_id)
+        self.sorted_tokens = None
+
+    def _ids_for_token(self, token, prefix):
+        if not prefix:
+            return set(self.postings.get(token, ()))
+
+        if self.sorted_tokens is None:
+            self.sorted_tokens = sorted(self.postings)
+        ids = set()
+        i = bisect.bisect_left(self.sorted_tokens, token)
+        while i < len(self.sorted_tokens) and self.sorted_tokens[i].startswith(token):
+            ids.update(self.postings[self.sorted_tokens[i]])
+            i += 1
+        return ids
+
+    def search(self, query, prefix=False):
+        """
+        Returns the sorted ids of the quotes containing all words of query.
+        With prefix=True query words also match longer words starting with them.
+        """
+        result = None
+        for token in sorted(set(QuoteIndex.tokenize(query)), key=len, reverse=True):
+            ids = self._ids_for_token(token, prefix)
+            result = ids if result is None else result & ids
+            if not result:
+                return []
+        return sorted(result) if result else []
+
+
+class QuoteCorpus:
+    """
+    Read-only, memory-mapped quote collection. Quotes are parsed only when accessed.
+
+    File layout: MAGIC, then the UTF-8 records (quote, author and source name separated by NUL),
+    then an offset table of count + 1 little-endian uint64 record boundaries, then count as uint64.
+    """
+
+    MAGIC = b"VQC1"
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.mm[: len(QuoteCorpus.MAGIC)] != QuoteCorpus.MAGIC:
+            self.mm.close()
+            raise ValueError("Not a quotes corpus file: %s" % path)
+        (self.count,) = struct.unpack_from("<Q", self.mm, len(self.mm) - 8)
+        self.table_offset = len(self.mm) - 8 - 8 * (self.count + 1)
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        if not 0 <= i < self.count:
+            raise IndexError(i)
+        start, end = struct.unpack_from("<QQ", self.mm, self.table_offset + 8 * i)
+        quote, author, source_name = self.mm[start:end].decode("utf-8").split("\0")
+        return {"quote": quote, "author": author or None, "sourceName": source_name}
+
+    def close(self):
+        self.mm.close()
+
+    @staticmethod
+    def write(path, quotes):
+        offsets = array.array("Q")
+        with open(path + ".partial", "wb") as f:
+            f.write(QuoteCorpus.MAGIC)
+            for q in quotes:
+                offsets.append(f.tell())
+                fields = (q["quote"], q["author"] or "", q["sourceName"] or "")
+                f.write("\0".join(x.replace("\0", "") for x in fields).encode("utf-8"))
+            count = len(offsets)
+            offsets.append(f.tell())
+            if sys.byteorder != "little":
+                offsets.byteswap()
+            offsets.tofile(f)
+            f.write(struct.pack("<Q", count))
+        os.rename(path + ".partial", path)
+        return count
+
+
 class LocalFilesSource(IQuoteSource):
+    CORPUS_FILE = "quotes_corpus.bin"
+    INDEX_FILE = "quotes_index.json"
+    INDEX_VERSION = 2
+
+    # Random and search results materialize at most this many quotes per call
+    MAX_RESULTS = 100
+
+    # Searching for "love" also finds "lovely", closer to plain substring search
+    PREFIX_MATCHING = True
+
     def __init__(self):
         super(IQuoteSource, self).__init__()
         self.quotes = []
+        self.quotes_folder = None
+        self.author_index = None
+        self.text_index = None
 
     @classmethod
     def get_info(cls):
@@ -54,57 +173,174 @@ class LocalFilesSource(IQuoteSource):
             return
 
         super(LocalFilesSource, self).activate()
+        self.load_quotes()
 
-        self.quotes = []
-
+    def load_quotes(self):
         # prefer files in the pluginconfig
-        for f in os.listdir(self.get_config_folder()):
-            if f.endswith(".txt"):
-                self.load(os.path.join(self.get_config_folder(), f))
+        self.load_corpus(self.get_config_folder())
 
         # use the defaults if nothing useful in pluginconfig
         if not self.quotes:
-            for f in os.listdir(self.folder):
-                if f.endswith(".txt"):
-                    self.load(os.path.join(self.folder, f))
+            if isinstance(self.quotes, QuoteCorpus):
+                # an empty corpus, not handed out to anyone yet
+                self.quotes.close()
+            self.quotes = []
+            self.load_corpus(self.folder)
 
     def deactivate(self):
+        # not closed explicitly: a quotes engine fetch that timed out may still be reading the
+        # corpus, the mmap is closed when the last reference to it is dropped
         self.quotes = []
+        self.author_index = None
+        self.text_index = None
+
+    @staticmethod
+    def list_quote_files(folder):
+        # sorted, so that quote ids are stable between runs and the persisted files stay valid
+        return sorted(os.path.join(folder, f) for f in os.listdir(folder) if f.endswith(".txt"))
+
+    def get_cache_file(self, name):
+        """
+        The corpus and index files are kept per quotes folder, so that loading the pluginconfig
+        files and the bundled defaults one after the other does not overwrite the other set's
+        files and force a rebuild on every start
+        """
+        folder_hash = hashlib.md5(os.path.realpath(self.quotes_folder).encode("utf-8")).hexdigest()
+        base, ext = os.path.splitext(name)
+        return os.path.join(self.get_config_folder(), "%s-%s%s" % (base, folder_hash[:12], ext))
+
+    def get_corpus_file(self):
+        return self.get_cache_file(LocalFilesSource.CORPUS_FILE)
+
+    def get_index_file(self):
+        return self.get_cache_file(LocalFilesSource.INDEX_FILE)
+
+    def get_signature(self, paths):
+        return {
+            "version": LocalFilesSource.INDEX_VERSION,
+            "files": {path: os.path.getmtime(path) for path in paths},
+        }
+
+    def load_corpus(self, folder):
+        """
+        Maps the compact corpus built from the quote files in folder, (re)building it and the search
+        index first if the files changed since they were last built.
+        """
+        paths = self.list_quote_files(folder)
+        if not paths:
+            return
+
+        self.quotes_folder = folder
+        signature = self.get_signature(paths)
+        try:
+            with open(self.get_index_file(), encoding="utf8") as f:
+                stored_signature = json.loads(f.readline())
+            if stored_signature == signature:
+                self.quotes = QuoteCorpus(self.get_corpus_file())
+                self.author_index = None  # loaded lazily, only needed when searching
+                self.text_index = None
+                logger.info(
+                    lambda: "Mapped %d quotes from %s" % (len(self.quotes), self.get_corpus_file())
+                )
+                return
+        except Exception:
+            pass
+
+        self.build_corpus(paths, signature)
+
+    def build_corpus(self, paths, signature):
+        logger.info(lambda: "Building quotes corpus and index for %s" % paths)
+        self.author_index = QuoteIndex()
+        self.text_index = QuoteIndex()
+
+        def _quotes():
+            for i, q in enumerate(q for path in paths for q in self.load(path)):
+                self.author_index.add(i, q["author"])
+                self.text_index.add(i, q["quote"])
+                yield q
+
+        corpus_file = self.get_corpus_file()
+        QuoteCorpus.write(corpus_file, _quotes())
+        self.quotes = QuoteCorpus(corpus_file)
+
+        try:
+            # the first line is the signature, so that validating does not need parsing the postings
+            index_file = self.get_index_file()
+            with open(index_file + ".partial", "w", encoding="utf8") as f:
+                f.write(json.dumps(signature) + "\n")
+                json.dump(
+                    {"author": self.author_index.postings, "text": self.text_index.postings}, f
+                )
+            os.rename(index_file + ".partial", index_file)
+        except Exception:
+            logger.exception(lambda: "Could not save quotes index")
+            return
+
+        self.remove_legacy_files()
+
+    def remove_legacy_files(self):
+        """Removes the corpus and index of older versions, which kept them in a single set"""
+        for name in (LocalFilesSource.CORPUS_FILE, LocalFilesSource.INDEX_FILE):
+            path = os.path.join(self.get_config_folder(), name)
+            try:
+                if os.path.exists(path):
+                    os.unlink(path)
+            except OSError:
+                logger.warning(lambda: "Could not remove legacy quotes file %s" % path)
+
+    def get_indexes(self):
+        if self.author_index is None or self.text_index is None:
+            try:
+                with open(self.get_index_file(), encoding="utf8") as f:
+                    f.readline()
+                    data = json.load(f)
+                self.author_index = QuoteIndex(data["author"])
+                self.text_index = QuoteIndex(data["text"])
+            except Exception:
+                logger.exception(lambda: "Could not load quotes index, searching is disabled")
+                self.author_index = QuoteIndex()
+                self.text_index = QuoteIndex()
+        return self.author_index, self.text_index
 
     def load(self, path):
+        """Parses the given quotes file, yielding the quotes in it one by one"""
         try:
             logger.info(lambda: "Loading quotes file %s" % path)
             with open(path, "r", encoding="utf-8", errors="ignore") as f:
                 s = f.read()
-                for q in re.split(r"(^\.$|^%$)", s, flags=re.MULTILINE):
-                    try:
-                        if q.strip() and len(q.strip()) > 5:
-                            parts = q.split("-- ")
-                            quote = parts[0]
-                            if quote[0] == quote[-1] == '"':
-                                quote = "\u201C%s\u201D" % quote[1:-1]
-                            author = parts[1].strip() if len(parts) > 1 else None
-                            self.quotes.append(
-                                {
-                                    "quote": quote,
-                                    "author": author,
-                                    "sourceName": os.path.basename(path),
-                                }
-                            )
-                    except Exception:
-                        logger.debug(lambda: "Could not process local quote %s" % q)
         except Exception:
             logger.exception(lambda: "Could not load quotes file %s" % path)
+            return
+
+        for q in re.split(r"(^\.$|^%$)", s, flags=re.MULTILINE):
+            try:
+                if q.strip() and len(q.strip()) > 5:
+                    parts = q.split("-- ")
+                    quote = parts[0]
+                    if quote[0] == quote[-1] == '"':
+                        quote = "\u201C%s\u201D" % quote[1:-1]
+                    author = parts[1].strip() if len(parts) > 1 else None
+                    yield {"quote": quote, "author": author, "sourceName": os.path.basename(path)}
+            except Exception:
+                logger.debug(lambda: "Could not process local quote %s" % q)
+
+    def pick(self, ids):
+        """Materializes at most MAX_RESULTS random quotes among the given ids"""
+        quotes = self.quotes
+        if len(ids) > LocalFilesSource.MAX_RESULTS:
+            ids = random.sample(ids, LocalFilesSource.MAX_RESULTS)
+        return [quotes[i] for i in ids]
 
     def get_random(self):
-        return self.quotes
+        return self.pick(range(len(self.quotes)))
 
     def get_for_author(self, author):
-        return [
-            q for q in self.quotes if q["author"] and q["author"].lower().find(author.lower()) >= 0
-        ]
+        author_index = self.get_indexes()[0]
+        return self.pick(author_index.search(author, prefix=LocalFilesSource.PREFIX_MATCHING))
 
     def get_for_keyword(self, keyword):
-        return self.get_for_author(keyword) + [
-            q for q in self.quotes if q["quote"].lower().find(keyword.lower()) >= 0
-        ]
+        author_index, text_index = self.get_indexes()
+        author_ids = author_index.search(keyword, prefix=LocalFilesSource.PREFIX_MATCHING)
+        text_ids = text_index.search(keyword, prefix=LocalFilesSource.PREFIX_MATCHING)
+        found = set(author_ids)
+        return self.pick(author_ids + [i for i in text_ids if i not in found])
@@ -18,11 +18,13 @@ import logging
 import random
 import re
 
-import bs4
 from httplib2 import iri2uri
+from variety.LazyModule import LazyModule
 from variety.plugins.IQuoteSource import IQuoteSource
 from variety.Util import Util, _
 
+bs4 = LazyModule("bs4")
+
 logger = logging.getLogger("variety")
 
 
@@ -18,6 +18,7 @@ import collections
 import logging
 import os
 
+from variety.Metrics import metrics
 from variety.plugins.downloaders.Downloader import Downloader
 from variety.Util import Util
 
@@ -250,6 +251,7 @@ class DefaultDownloader(Downloader, metaclass=abc.ABCMeta):
 
         # file rename is an atomic operation, so we should never end up with partial downloads
         os.rename(local_filepath_partial, local_filepath)
+        metrics.inc("downloaded_bytes", os.path.getsize(local_filepath), label=source_type)
 
         metadata = {
             "sourceType": source_type,